@@ -1,7 +1,10 @@
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from poisson import Poisson
+from banc import Banc
+from observables import suivre_animation
+from profilage import instrumenter_animation
+from rendu import RenduFleches
 
 """ Partie 1 : Mouvement Aleatoire
 
@@ -13,10 +16,17 @@ n = 20           # Nombre de poissons
 xmin, xmax = 0, 10 
 ymin, ymax = 0, 10
 dt = 0.05       # pas de temps
+sous_pas = 1  # Nombre de pas de simulation par image affichée
+afficher_profil = False  # Si True, affiche sur l'animation le temps passé dans chaque phase du pas
+afficher_observables = False  # Si True, affiche les observables d'ordre collectif (valeur courante et moyenne)
+bords_periodiques = False  # Si True, le bassin est un tore : un poisson qui sort d'un côté rentre de l'autre
 
 #---------------- Initialisation des poissons ---------------------
 
-poissons = Poisson.creer_banc(n,  xmin, xmax, ymin, ymax)
+banc = Banc.aleatoire(n, (xmin, ymin), (xmax, ymax))
+if bords_periodiques:
+    banc.rendre_periodique((xmin, ymin), (xmax, ymax))
+poissons = Poisson.depuis_banc(banc)
 
 #----------------- Configuration du graphique -------------------
 
@@ -31,18 +41,9 @@ for spine in ax.spines.values():
     spine.set_visible(True)
     spine.set_color('black')
 
-# Données initiales
-positions = np.array([[p.x, p.y] for p in poissons])
-vitesses_x, vitesses_y = np.array([p.Vx for p in poissons]), np.array([p.Vy for p in poissons])
-
-# fléche
-normes = np.sqrt(vitesses_x**2 + vitesses_y**2)
-normes[normes == 0] = 1  # Éviter la division par zéro
-vitesses_x_norm = vitesses_x / normes
-vitesses_y_norm = vitesses_y / normes
-
-fleches = ax.quiver(positions[:, 0], positions[:, 1], vitesses_x_norm, vitesses_y_norm, 
-                   color='blue', width=0.005, scale=30, pivot='mid')
+# Flèches lues directement dans les tableaux du banc
+rendu = RenduFleches(ax, banc)
+fleches = rendu.fleches
 
 #----------------- Fonctions pour l'animation ----------------------
 
@@ -51,29 +52,26 @@ def init():
 
 def update(frame):
     """Mise à jour des positions, vitesses et affichage à chaque frame."""
-     
-    for poisson in poissons:
-        poisson.deplacer(dt) 
-        poisson.verifier_bords(xmin, xmax, ymin, ymax)
-    
-    # Mise à jour des positions dans le graphique
-    positions = np.array([[p.x, p.y] for p in poissons])
-    vitesses_x = np.array([p.Vx for p in poissons])
-    vitesses_y = np.array([p.Vy for p in poissons])
     
-    # fléche
-    normes = np.sqrt(vitesses_x**2 + vitesses_y**2)
-    normes[normes == 0] = 1 
-    vitesses_x_norm = vitesses_x / normes
-    vitesses_y_norm = vitesses_y / normes
+    for _ in range(sous_pas):
+        banc.deplacer(dt)
+        banc.verifier_bords((xmin, ymin), (xmax, ymax))
     
-    fleches.set_offsets(positions)
-    fleches.set_UVC(vitesses_x_norm, vitesses_y_norm)
+    # Mise à jour des flèches dans le graphique
+    rendu.mettre_a_jour()
     
     return (fleches,)
 
 #------------------ Animation ------------------------------------
 
+# Observables d'ordre collectif mesurées à chaque image (polarisation, rotation, cohésion...)
+if afficher_observables:
+    update = suivre_animation(ax, update, banc)
+
+# Chronométrage des phases du pas affiché sur le graphique
+if afficher_profil:
+    update = instrumenter_animation(ax, update)
+
 # Création de l'animation
 ani = FuncAnimation(fig, update, frames=500, init_func=init, blit=True, interval=20)
 
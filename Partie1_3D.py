@@ -1,8 +1,11 @@
-import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from mpl_toolkits.mplot3d import Axes3D
 from poisson_3D import Poisson3D
+from banc import Banc
+from observables import suivre_animation
+from profilage import instrumenter_animation
+from rendu import RenduPoints3D
 
 """ Partie 1 : Mouvement Aléatoire en 3D
 
@@ -20,9 +23,17 @@ xmin, xmax = 0, largeur_bassin
 ymin, ymax = 0, hauteur_bassin
 zmin, zmax = 0, profondeur_bassin
 dt = 0.1
+sous_pas = 1  # Nombre de pas de simulation par image affichée
+max_points = None  # Nombre maximal de poissons dessinés (None : tous)
+afficher_profil = False  # Si True, affiche sur l'animation le temps passé dans chaque phase du pas
+afficher_observables = False  # Si True, affiche les observables d'ordre collectif (valeur courante et moyenne)
+bords_periodiques = False  # Si True, le bassin est un tore : un poisson qui sort d'un côté rentre de l'autre
 
 # Initialisation des poissons
-poissons = Poisson3D.creer_banc(nombre_poissons, xmin, xmax, ymin, ymax, zmin, zmax, Vmin=-10, Vmax=10)
+banc = Banc.aleatoire(nombre_poissons, (xmin, ymin, zmin), (xmax, ymax, zmax), Vmin=-10, Vmax=10)
+if bords_periodiques:
+    banc.rendre_periodique((xmin, ymin, zmin), (xmax, ymax, zmax))
+poissons = Poisson3D.depuis_banc(banc)
 
 # Configuration du graphique
 fig = plt.figure(figsize=(10, 8))
@@ -35,8 +46,9 @@ ax.set_xlabel('X')
 ax.set_ylabel('Y')
 ax.set_zlabel('Z')
 
-# Création des points pour l'affichage
-scatter = ax.scatter([], [], [], c='blue', marker='o', s=50)
+# Création des points pour l'affichage (projetés et dessinés en 2D au-dessus de l'axe 3D)
+rendu = RenduPoints3D(ax, banc, max_points=max_points)
+scatter = rendu.points
 
 # Fonction d'initialisation pour l'animation
 def init():
@@ -45,21 +57,27 @@ def init():
 # Fonction de mise à jour
 def update(frame):
     # Déplacer chaque poisson 
-    for poisson in poissons:
-        poisson.deplacer(dt)
-        poisson.verifier_bords(xmin, xmax, ymin, ymax, zmin, zmax)
+    for _ in range(sous_pas):
+        banc.deplacer(dt)
+        banc.verifier_bords((xmin, ymin, zmin), (xmax, ymax, zmax))
     
     #  l'affichage
-    positions = np.array([p.get_position() for p in poissons])
-    scatter._offsets3d = (positions[:, 0], positions[:, 1], positions[:, 2])
-    fig.canvas.draw_idle()
+    rendu.mettre_a_jour()
     
     return scatter,
 
+# Observables d'ordre collectif mesurées à chaque image (polarisation, rotation, cohésion...)
+if afficher_observables:
+    update = suivre_animation(ax, update, banc)
+
+# Chronométrage des phases du pas affiché sur le graphique
+if afficher_profil:
+    update = instrumenter_animation(ax, update)
+
 # Création de l'animation 
 ani = animation.FuncAnimation(fig, update, frames=200, 
                              init_func=init, interval=50, 
-                             blit=False)
+                             blit=True)
 
 # Affichage
 plt.show()
@@ -2,8 +2,12 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from matplotlib.patches import Circle
-import random
 from poisson import Poisson
+from banc import Banc
+from contamination import Cascade, bilan_cascade, contaminer_banc
+from observables import suivre_animation
+from profilage import instrumenter_animation
+from rendu import RenduFleches
 
 """ Partie 2 : Propagation des Mouvements - L'effet Trafalgar
 
@@ -15,23 +19,31 @@ n = 20           # Nombre de poissons
 xmin, xmax = 0, 10 
 ymin, ymax = 0, 10
 dt = 0.05
-<<<<<<< HEAD
+sous_pas = 1  # Nombre de pas de simulation par image affichée
+afficher_profil = False  # Si True, affiche sur l'animation le temps passé dans chaque phase du pas
+afficher_observables = False  # Si True, affiche les observables d'ordre collectif (valeur courante et moyenne)
+afficher_cascade = False  # Si True, affiche sous le compteur l'arbre de transmission (générations, R0, vitesse du front)
+bords_periodiques = False  # Si True, le bassin est un tore : un poisson qui sort d'un côté rentre de l'autre
 distance_contamination = 0.7# Distance à laquelle un poisson peut être contaminé
 variation_norme = True # Si True, la norme de la vitesse du poisson contaminé est modifiée sinon chaque composante de la vitesse est modifiée
-=======
-distance_contamination = 0.5  # Distance à laquelle un poisson peut être contaminé
-variation_norme = False # Si False, la norme de la vitesse du poisson contaminé est modifiée sinon chaque composante de la vitesse est modifiée
->>>>>>> 9533e35ed2bbaeab188e0767de8f2601046f9b14
 pas_de_variation_norme = 0.05 # le variation de la norme ou de chaque composante de la vitesse
+graine = None # Graine du générateur aléatoire (None : tirage différent à chaque exécution)
 
 #---------------- Initialisation des poissons ---------------------
-poissons = Poisson.creer_banc(n, xmin, xmax, ymin, ymax)
+generateur = np.random.default_rng(graine)
+banc = Banc.aleatoire(n, (xmin, ymin), (xmax, ymax), generateur=generateur)
+if bords_periodiques:
+    banc.rendre_periodique((xmin, ymin), (xmax, ymax))
+poissons = Poisson.depuis_banc(banc)
 
 # Sélection aléatoire du leader
-leader = random.choice(poissons)
+leader = poissons[generateur.integers(len(poissons))]
 leader.is_contaminated = True
 leader.color = 'red'  # Le leader est rouge
 
+# Registre de la cascade : qui a contaminé qui, à quel pas et à quelle distance
+cascade = Cascade(banc.contamines)
+
 #----------------- Configuration du graphique -------------------
 fig, ax = plt.subplots(figsize=(10, 10), facecolor='white')
 ax.set_xlim(xmin, xmax)
@@ -44,25 +56,9 @@ for spine in ax.spines.values():
     spine.set_visible(True)
     spine.set_color('black')
 
-# Données initiales
-positions = np.array([[p.x, p.y] for p in poissons])
-directions_x, directions_y = [], []
-
-# fleche 
-for p in poissons:
-    vx, vy = p.Vx, p.Vy
-    norme = np.sqrt(vx**2 + vy**2)
-    if norme == 0:
-        norme = 1  # Éviter la division par zéro
-    directions_x.append(vx / norme)
-    directions_y.append(vy / norme)
-
-# Couleurs des poissons (leader=rouge, contaminés=vert, non-contaminés=bleu)
-colors = ['red' if p == leader else 'blue' for p in poissons]
-
-# Affichage des flèches 
-fleches = ax.quiver(positions[:, 0], positions[:, 1], directions_x, directions_y, 
-                   color=colors, width=0.005, scale=30, pivot='mid')
+# Affichage des flèches, colorées selon l'état (leader=rouge, contaminés=vert, non-contaminés=bleu)
+rendu = RenduFleches(ax, banc, leader=leader._i)
+fleches = rendu.fleches
 
 # Cercle de contamination autour du leader
 cercle_contamination = Circle((leader.x, leader.y), distance_contamination, 
@@ -79,57 +75,43 @@ def init():
 def update(frame):
     global leader
     
-    # Vérifier les contaminations
-    for poisson in poissons:
-        if not poisson.is_contaminated:
-            # Vérifier si un poisson contaminé (leader ou autre) est à proximité
-            for contaminateur in [p for p in poissons if p.is_contaminated]:
-                if Poisson.distance_euclidienne(poisson, contaminateur) < distance_contamination:
-                    # Contaminer avec la vitesse du leader
-                    poisson.contaminer(contaminateur.Vx, contaminateur.Vy, dV=pas_de_variation_norme, norm = variation_norme)
-                    break
-    
-    # Déplacer tous les poissons
-    for poisson in poissons:
-        poisson.deplacer(dt)
-        poisson.verifier_bords(xmin, xmax, ymin, ymax)
-    
-    # Mise à jour des positions et directions dans le graphique
-    positions = np.array([[p.x, p.y] for p in poissons])
-    
-    directions_x, directions_y = [], []
-    colors = []
-    
-    # Préparation des données pour l'affichage
-    for p in poissons:
-        vx, vy = p.Vx, p.Vy
-        norme = np.sqrt(vx**2 + vy**2)
-        if norme == 0:
-            norme = 1
-        directions_x.append(vx / norme)
-        directions_y.append(vy / norme)
+    for _ in range(sous_pas):
+        # Vérifier les contaminations : les poissons sains proches d'un poisson contaminé
+        # (leader ou autre) prennent sa vitesse
+        contaminer_banc(banc, distance_contamination, dV=pas_de_variation_norme, norm=variation_norme,
+                        generateur=generateur, cascade=cascade)
         
-        # Définir les couleurs: rouge pour le leader, vert pour les contaminés, bleu pour les non-contaminés
-        if p == leader:
-            colors.append('red')
-        elif p.is_contaminated:
-            colors.append('green')
-        else:
-            colors.append('blue')
+        # Déplacer tous les poissons
+        banc.deplacer(dt)
+        banc.verifier_bords((xmin, ymin), (xmax, ymax))
     
-    fleches.set_offsets(positions)
-    fleches.set_UVC(directions_x, directions_y)
-    fleches.set_color(colors)
+    # Mise à jour des positions, directions et couleurs dans le graphique
+    rendu.mettre_a_jour()
     
     # Mise à jour du cercle de contamination autour du leader seulement
     cercle_contamination.set_center((leader.x, leader.y))
     
     # Mise à jour du compteur de contamination
-    nb_contamines = sum(p.is_contaminated for p in poissons)
-    contamination_text.set_text(f'Poissons contaminés: {nb_contamines}/{len(poissons)}')
+    nb_contamines = np.count_nonzero(banc.contamines)
+    texte = f'Poissons contaminés: {nb_contamines}/{len(poissons)}'
+    if afficher_cascade:
+        # Arbre de transmission : nombre de générations, R0 du leader et vitesse du front depuis le leader
+        bilan = bilan_cascade(cascade, dt=dt)
+        if np.isfinite(bilan['vitesse_front'][0]):
+            texte += (f"\nGénérations: {bilan['profondeur'][0]}   R0: {bilan['R0'][0]:.2f}   "
+                      f"Vitesse du front: {bilan['vitesse_front'][0]:.2f}")
+    contamination_text.set_text(texte)
     
     return (fleches, cercle_contamination, contamination_text)
 
+# Observables d'ordre collectif mesurées à chaque image (polarisation, rotation, cohésion...)
+if afficher_observables:
+    update = suivre_animation(ax, update, banc)
+
+# Chronométrage des phases du pas affiché sur le graphique
+if afficher_profil:
+    update = instrumenter_animation(ax, update)
+
 #------------------ Animation ------------------------------------
 # Création de l'animation
 ani = FuncAnimation(fig, update, frames=500, init_func=init, blit=True, interval=20)
@@ -2,8 +2,12 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from mpl_toolkits.mplot3d import Axes3D
-import random
 from poisson_3D import Poisson3D
+from banc import Banc
+from contamination import Cascade, bilan_cascade, contaminer_banc
+from observables import suivre_animation
+from profilage import instrumenter_animation
+from rendu import RenduPoints3D
 
 """ Partie 2 : Propagation des Mouvements - L'effet Trafalgar en 3D
 
@@ -19,22 +23,33 @@ xmin, xmax = 0, largeur_bassin
 ymin, ymax = 0, hauteur_bassin
 zmin, zmax = 0, profondeur_bassin
 dt = 0.1
-<<<<<<< HEAD
+sous_pas = 1  # Nombre de pas de simulation par image affichée
+max_points = None  # Nombre maximal de poissons dessinés (None : tous)
+afficher_profil = False  # Si True, affiche sur l'animation le temps passé dans chaque phase du pas
+afficher_observables = False  # Si True, affiche les observables d'ordre collectif (valeur courante et moyenne)
+afficher_cascade = False  # Si True, affiche sous le compteur l'arbre de transmission (générations, R0, vitesse du front)
+bords_periodiques = False  # Si True, le bassin est un tore : un poisson qui sort d'un côté rentre de l'autre
 distance_contamination = 25  # Distance à laquelle un poisson peut être contaminé
-=======
-distance_contamination = 25.0  # Distance à laquelle un poisson peut être contaminé
->>>>>>> 9533e35ed2bbaeab188e0767de8f2601046f9b14
 variation_norme = True  # Si True, la norme de la vitesse du poisson contaminé est modifiée sinon chaque composante de la vitesse est modifiée
 pas_de_variation_norme = 0.05  # Variation de la norme ou de chaque composante de la vitesse
+graine = None  # Graine du générateur aléatoire (None : tirage différent à chaque exécution)
 
 # ---------------- Initialisation des poissons ---------------------
-poissons = Poisson3D.creer_banc(nombre_poissons, xmin, xmax, ymin, ymax, zmin, zmax, Vmin=-10, Vmax=10)
+generateur = np.random.default_rng(graine)
+banc = Banc.aleatoire(nombre_poissons, (xmin, ymin, zmin), (xmax, ymax, zmax), Vmin=-10, Vmax=10,
+                      generateur=generateur)
+if bords_periodiques:
+    banc.rendre_periodique((xmin, ymin, zmin), (xmax, ymax, zmax))
+poissons = Poisson3D.depuis_banc(banc)
 
 # Sélection aléatoire du leader
-leader = random.choice(poissons)
+leader = poissons[generateur.integers(len(poissons))]
 leader.is_contaminated = True
 leader.color = 'red'  # Le leader est rouge
 
+# Registre de la cascade : qui a contaminé qui, à quel pas et à quelle distance
+cascade = Cascade(banc.contamines)
+
 # ----------------- Configuration du graphique -------------------
 fig = plt.figure(figsize=(10, 8))
 ax = fig.add_subplot(111, projection='3d')
@@ -46,15 +61,10 @@ ax.set_xlabel('X')
 ax.set_ylabel('Y')
 ax.set_zlabel('Z')
 
-# Préparation des données pour l'affichage
-positions = np.array([p.get_position() for p in poissons])
-colors = ['red' if p is leader else 'blue' for p in poissons]
-
-# Affichage des poissons en 3D
-scatter = ax.scatter(
-    positions[:, 0], positions[:, 1], positions[:, 2],
-    c=colors, marker='o', s=50
-)
+# Affichage des poissons en 3D (leader=rouge, contaminés=vert, non-contaminés=bleu),
+# positions projetées et dessinées en 2D au-dessus de l'axe 3D
+rendu = RenduPoints3D(ax, banc, leader=leader._i, max_points=max_points)
+scatter = rendu.points
 
 # Texte d'information sur la contamination
 contamination_text = ax.text2D(0.05, 0.95, 'Poissons contaminés: 1', transform=ax.transAxes)
@@ -67,52 +77,44 @@ def init():
 def update(frame):
     global leader
     
-    # Vérifier les contaminations
-    for poisson in poissons:
-        if not poisson.is_contaminated:
-            # Vérifier si un poisson contaminé (leader ou autre) est à proximité
-            for contaminateur in [p for p in poissons if p.is_contaminated]:
-                if Poisson3D.distance_euclidienne(poisson, contaminateur) < distance_contamination:
-                    # Contaminer avec la vitesse du contaminateur
-                    poisson.contaminer(contaminateur.Vx, contaminateur.Vy, contaminateur.Vz, 
-                                      dV=pas_de_variation_norme, norm=variation_norme)
-                    break
-    
-    # Déplacer tous les poissons
-    for poisson in poissons:
-        poisson.deplacer(dt)
-        poisson.verifier_bords(xmin, xmax, ymin, ymax, zmin, zmax)
-    
-    # Mise à jour des positions pour l'affichage
-    positions = np.array([p.get_position() for p in poissons])
+    for _ in range(sous_pas):
+        # Vérifier les contaminations : les poissons sains proches d'un poisson contaminé
+        # (leader ou autre) prennent sa vitesse
+        contaminer_banc(banc, distance_contamination, dV=pas_de_variation_norme, norm=variation_norme,
+                        generateur=generateur, cascade=cascade)
+        
+        # Déplacer tous les poissons
+        banc.deplacer(dt)
+        banc.verifier_bords((xmin, ymin, zmin), (xmax, ymax, zmax))
     
-    # Mise à jour des couleurs
-    colors = []
-    for p in poissons:
-        if p is leader:
-            colors.append('red')
-        elif p.is_contaminated:
-            colors.append('green')
-        else:
-            colors.append('blue')
-    
-    # Mise à jour des données du scatter
-    scatter._offsets3d = (positions[:, 0], positions[:, 1], positions[:, 2])
-    scatter.set_color(colors)
+    # Mise à jour des positions et des couleurs pour l'affichage
+    rendu.mettre_a_jour()
     
     # Mise à jour du compteur de contamination
-    nb_contamines = sum(p.is_contaminated for p in poissons)
-    contamination_text.set_text(f'Poissons contaminés: {nb_contamines}/{len(poissons)}')
-    
-    # Forcer un rafraîchissement du graphique
-    fig.canvas.draw_idle()
+    nb_contamines = np.count_nonzero(banc.contamines)
+    texte = f'Poissons contaminés: {nb_contamines}/{len(poissons)}'
+    if afficher_cascade:
+        # Arbre de transmission : nombre de générations, R0 du leader et vitesse du front depuis le leader
+        bilan = bilan_cascade(cascade, dt=dt)
+        if np.isfinite(bilan['vitesse_front'][0]):
+            texte += (f"\nGénérations: {bilan['profondeur'][0]}   R0: {bilan['R0'][0]:.2f}   "
+                      f"Vitesse du front: {bilan['vitesse_front'][0]:.2f}")
+    contamination_text.set_text(texte)
     
     return scatter, contamination_text
 
-# Création de l'animation avec blit=False pour les animations 3D
+# Observables d'ordre collectif mesurées à chaque image (polarisation, rotation, cohésion...)
+if afficher_observables:
+    update = suivre_animation(ax, update, banc)
+
+# Chronométrage des phases du pas affiché sur le graphique
+if afficher_profil:
+    update = instrumenter_animation(ax, update)
+
+# Création de l'animation : seuls les points projetés sont redessinés (blit)
 ani = animation.FuncAnimation(fig, update, frames=200, 
                              init_func=init, interval=50, 
-                             blit=False)
+                             blit=True)
 
 # Affichage
 plt.show() 
\ No newline at end of file
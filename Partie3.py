@@ -1,7 +1,10 @@
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from poisson import Poisson
+from banc import Banc
+from rendu import RenduFleches
+from observables import suivre_animation
+from profilage import instrumenter_animation
 
 """ Partie 3 : Règles Comportementales de Aoki
 
@@ -14,6 +17,10 @@ n = 50
 xmin, xmax = 0, 100 
 ymin, ymax = 0, 100
 dt = 0.05
+sous_pas = 1  # Nombre de pas de simulation par image affichée
+afficher_profil = False  # Si True, affiche sur l'animation le temps passé dans chaque phase du pas
+afficher_observables = False  # Si True, affiche les observables d'ordre collectif (valeur courante et moyenne)
+bords_periodiques = False  # Si True, le bassin est un tore : un poisson qui sort d'un côté rentre de l'autre
 
 # Paramètres des rayons pour les règles d'Aoki
 rayon_repulsion = 1.5
@@ -29,7 +36,10 @@ k_attraction = 0.01
 vitesse_max = 1.5
 
 #---------------- Initialisation des poissons ---------------------
-poissons = Poisson.creer_banc(n, xmin, xmax, ymin, ymax, -0.5, 0.5)
+banc = Banc.aleatoire(n, (xmin, ymin), (xmax, ymax), -0.5, 0.5)
+if bords_periodiques:
+    banc.rendre_periodique((xmin, ymin), (xmax, ymax))
+poissons = Poisson.depuis_banc(banc)
 
 #----------------- Configuration du graphique -------------------
 fig, ax = plt.subplots(figsize=(10, 10), facecolor='white')
@@ -43,22 +53,9 @@ for spine in ax.spines.values():
     spine.set_visible(True)
     spine.set_color('black')
 
-# Données initiales
-positions = np.array([[p.x, p.y] for p in poissons])
-directions_x, directions_y = [], []
-
-#flèches
-for p in poissons:
-    vx, vy = p.Vx, p.Vy
-    norme = np.sqrt(vx**2 + vy**2)
-    if norme == 0:
-        norme = 1  
-    directions_x.append(vx / norme)
-    directions_y.append(vy / norme)
-
-# Affichage des flèches (poissons)
-fleches = ax.quiver(positions[:, 0], positions[:, 1], directions_x, directions_y, 
-                   color='blue', width=0.005, scale=30, pivot='mid')
+# Affichage des flèches (poissons), lues directement dans les tableaux du banc
+rendu = RenduFleches(ax, banc)
+fleches = rendu.fleches
 
 # Légende pour les règles d'Aoki
 ax.text(0.05, 0.95, f'Répulsion: R < {rayon_repulsion}', transform=ax.transAxes, color='red')
@@ -72,32 +69,29 @@ def init():
 def update(frame):
     """Mise à jour des positions, vitesses et affichage à chaque frame."""
     
-    # Application des règles d'Aoki
-    Poisson.appliquer_regles_aoki(poissons, rayon_repulsion, rayon_alignement, 
-                                 rayon_attraction, k_repulsion, k_alignement, 
-                                 k_attraction, vitesse_max)
-    
-    # Déplacement des poissons
-    for poisson in poissons:
-        poisson.deplacer(dt)
-        poisson.verifier_bords(xmin, xmax, ymin, ymax)
-    
-    # Mise à jour des positions dans le graphique
-    positions = np.array([[p.x, p.y] for p in poissons])
-    vitesses_x = np.array([p.Vx for p in poissons])
-    vitesses_y = np.array([p.Vy for p in poissons])
+    for _ in range(sous_pas):
+        # Application des règles d'Aoki
+        Poisson.appliquer_regles_aoki(poissons, rayon_repulsion, rayon_alignement, 
+                                     rayon_attraction, k_repulsion, k_alignement, 
+                                     k_attraction, vitesse_max)
+        
+        # Déplacement des poissons
+        banc.deplacer(dt)
+        banc.verifier_bords((xmin, ymin), (xmax, ymax))
     
-    # Normaliser les vecteurs de vitesse pour avoir des flèches de taille uniforme
-    normes = np.sqrt(vitesses_x**2 + vitesses_y**2)
-    normes[normes == 0] = 1  # Éviter la division par zéro
-    vitesses_x_norm = vitesses_x / normes
-    vitesses_y_norm = vitesses_y / normes
-    
-    fleches.set_offsets(positions)
-    fleches.set_UVC(vitesses_x_norm, vitesses_y_norm)
+    # Mise à jour des flèches (directions normalisées pour une taille uniforme)
+    rendu.mettre_a_jour()
     
     return (fleches,)
 
+# Observables d'ordre collectif mesurées à chaque image (polarisation, rotation, cohésion...)
+if afficher_observables:
+    update = suivre_animation(ax, update, banc)
+
+# Chronométrage des phases du pas affiché sur le graphique
+if afficher_profil:
+    update = instrumenter_animation(ax, update)
+
 #------------------ Animation ------------------------------------
 # Création de l'animation
 ani = FuncAnimation(fig, update, frames=500, init_func=init, blit=True, interval=20)
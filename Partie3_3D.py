@@ -1,8 +1,11 @@
-import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from mpl_toolkits.mplot3d import Axes3D
 from poisson_3D import Poisson3D
+from banc import Banc
+from observables import suivre_animation
+from profilage import instrumenter_animation
+from rendu import RenduPoints3D
 
 """ Partie 3 : Règles Comportementales de Aoki en 3D
 
@@ -20,6 +23,11 @@ xmin, xmax = 0, largeur_bassin
 ymin, ymax = 0, hauteur_bassin
 zmin, zmax = 0, profondeur_bassin
 dt = 0.1
+sous_pas = 1  # Nombre de pas de simulation par image affichée
+max_points = None  # Nombre maximal de poissons dessinés (None : tous)
+afficher_profil = False  # Si True, affiche sur l'animation le temps passé dans chaque phase du pas
+afficher_observables = False  # Si True, affiche les observables d'ordre collectif (valeur courante et moyenne)
+bords_periodiques = False  # Si True, le bassin est un tore : un poisson qui sort d'un côté rentre de l'autre
 
 # Paramètres des rayons pour les règles d'Aoki (adaptés à l'échelle 3D)
 rayon_repulsion = 30.0
@@ -35,7 +43,10 @@ k_attraction = 0.01
 vitesse_max = 20.0
 
 # ---------------- Initialisation des poissons ---------------------
-poissons = Poisson3D.creer_banc(nombre_poissons, xmin, xmax, ymin, ymax, zmin, zmax, Vmin=-15, Vmax=15)
+banc = Banc.aleatoire(nombre_poissons, (xmin, ymin, zmin), (xmax, ymax, zmax), Vmin=-15, Vmax=15)
+if bords_periodiques:
+    banc.rendre_periodique((xmin, ymin, zmin), (xmax, ymax, zmax))
+poissons = Poisson3D.depuis_banc(banc)
 
 # ----------------- Configuration du graphique -------------------
 fig = plt.figure(figsize=(10, 8))
@@ -48,14 +59,9 @@ ax.set_xlabel('X')
 ax.set_ylabel('Y')
 ax.set_zlabel('Z')
 
-# Préparation des données pour l'affichage initial
-positions = np.array([p.get_position() for p in poissons])
-
-# Affichage des poissons en 3D
-scatter = ax.scatter(
-    positions[:, 0], positions[:, 1], positions[:, 2],
-    c='blue', marker='o', s=50
-)
+# Affichage des poissons : positions projetées et dessinées en 2D au-dessus de l'axe 3D
+rendu = RenduPoints3D(ax, banc, max_points=max_points)
+scatter = rendu.points
 
 # Texte d'information sur les règles d'Aoki
 ax.text2D(0.05, 0.95, f'Répulsion: R < {rayon_repulsion}', transform=ax.transAxes, color='red')
@@ -68,31 +74,33 @@ def init():
 
 # Fonction de mise à jour pour l'animation
 def update(frame):
-    # Application des règles d'Aoki
-    Poisson3D.appliquer_regles_aoki(poissons, rayon_repulsion, rayon_alignement, 
-                                  rayon_attraction, k_repulsion, k_alignement, 
-                                  k_attraction, vitesse_max)
-    
-    # Déplacement des poissons
-    for poisson in poissons:
-        poisson.deplacer(dt)
-        poisson.verifier_bords(xmin, xmax, ymin, ymax, zmin, zmax)
-    
-    # Mise à jour des positions pour l'affichage
-    positions = np.array([p.get_position() for p in poissons])
+    for _ in range(sous_pas):
+        # Application des règles d'Aoki
+        Poisson3D.appliquer_regles_aoki(poissons, rayon_repulsion, rayon_alignement, 
+                                      rayon_attraction, k_repulsion, k_alignement, 
+                                      k_attraction, vitesse_max)
     
-    # Mise à jour des données du scatter
-    scatter._offsets3d = (positions[:, 0], positions[:, 1], positions[:, 2])
+        # Déplacement des poissons
+        banc.deplacer(dt)
+        banc.verifier_bords((xmin, ymin, zmin), (xmax, ymax, zmax))
     
-    # Forcer un rafraîchissement du graphique
-    fig.canvas.draw_idle()
+    # Projection des positions pour l'affichage (seuls les points sont redessinés)
+    rendu.mettre_a_jour()
     
     return scatter,
 
-# Création de l'animation avec blit=False pour les animations 3D
+# Observables d'ordre collectif mesurées à chaque image (polarisation, rotation, cohésion...)
+if afficher_observables:
+    update = suivre_animation(ax, update, banc)
+
+# Chronométrage des phases du pas affiché sur le graphique
+if afficher_profil:
+    update = instrumenter_animation(ax, update)
+
+# Création de l'animation : seuls les points projetés sont redessinés (blit)
 ani = animation.FuncAnimation(fig, update, frames=200, 
                              init_func=init, interval=50, 
-                             blit=False)
+                             blit=True)
 
 # Affichage
 plt.show() 
\ No newline at end of file
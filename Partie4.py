@@ -1,11 +1,18 @@
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from poisson import Poisson
+from banc import Banc
+from bassin import bassin_predefini
+from observables import suivre_animation
+from profilage import instrumenter_animation
+from perturbations import Perturbations
+from rendu import RenduFleches
 
 """ Partie 4 : Influence de la Densité
 
-Simulation d'un banc de poissons 2D avec les règles d'Aoki limitées aux 6 plus proches voisins.
+Simulation d'un banc de poissons 2D avec les règles d'Aoki limitées aux 6 plus proches voisins,
+perturbé par des prédateurs qui poursuivent le poisson le plus proche et par des
+obstacles fixes que le banc contourne.
 
 
 """
@@ -15,6 +22,14 @@ n = 50           # Nombre de poissons
 xmin, xmax = 0, 20 
 ymin, ymax = 0, 20
 dt = 0.05
+sous_pas = 1  # Nombre de pas de simulation par image affichée
+afficher_profil = False  # Si True, affiche sur l'animation le temps passé dans chaque phase du pas
+afficher_observables = False  # Si True, affiche les observables d'ordre collectif (valeur courante et moyenne)
+bords_periodiques = False  # Si True, le bassin est un tore : un poisson qui sort d'un côté rentre de l'autre
+forme_bassin = None  # 'disque', 'polygone' ou 'rochers' : parois de forme quelconque au lieu de la boîte
+
+# Nombre de plus proches voisins pris en compte par chaque poisson
+nb_voisins = 6
 
 # Coefficients de force pour chaque règle
 k_repulsion = 0.05
@@ -29,14 +44,39 @@ rayon_attraction = 5.0
 # Vitesse maximale des poissons
 vitesse_max = 1.5
 
+# Perturbations externes : prédateurs (flèches noires) et obstacles fixes (disques gris)
+nb_predateurs = 1
+nb_obstacles = 2
+rayon_fuite = 4.0  # Distance à laquelle un poisson fuit un prédateur
+k_fuite = 0.2
+rayon_obstacles = 2.0  # Distance à laquelle un poisson s'écarte d'un obstacle
+k_obstacles = 0.2
+k_poursuite = 0.05
+vitesse_max_predateurs = 1.2  # Plus lents que les poissons, qui peuvent leur échapper
+
 #---------------- Initialisation des poissons ---------------------
-poissons = Poisson.creer_banc(n, xmin, xmax, ymin, ymax, -0.5, 0.5)
+banc = Banc.aleatoire(n, (xmin, ymin), (xmax, ymax), -0.5, 0.5)
+if bords_periodiques:
+    banc.rendre_periodique((xmin, ymin), (xmax, ymax))
+poissons = Poisson.depuis_banc(banc)
+perturbations = Perturbations.aleatoire(nb_predateurs, nb_obstacles, (xmin, ymin), (xmax, ymax), -0.5, 0.5,
+                                        rayon_fuite=rayon_fuite, k_fuite=k_fuite,
+                                        rayon_obstacles=rayon_obstacles, k_obstacles=k_obstacles,
+                                        k_poursuite=k_poursuite, vitesse_max=vitesse_max_predateurs)
+if bords_periodiques:
+    perturbations.rendre_periodique((xmin, ymin), (xmax, ymax))
+if forme_bassin is not None:
+    # Grille de distance signée aux parois, mise en cache sur disque
+    bassin = bassin_predefini(forme_bassin, (xmin, ymin), (xmax, ymax), distance_evitement=1.0, k_evitement=0.1)
+    banc.positions[...] = bassin.tirer_positions(n)
+    banc.utiliser_bassin(bassin)
+    perturbations.predateurs.utiliser_bassin(bassin)
 
 #----------------- Configuration du graphique -------------------
 fig, ax = plt.subplots(figsize=(10, 10), facecolor='white')
 ax.set_xlim(xmin, xmax)
 ax.set_ylim(ymin, ymax)
-ax.set_title('Simulation avec 6 voisins les plus proches')
+ax.set_title(f'Simulation avec {nb_voisins} voisins les plus proches')
 ax.set_xlabel('X')
 ax.set_ylabel('Y')
 ax.set_facecolor('white')
@@ -44,59 +84,57 @@ for spine in ax.spines.values():
     spine.set_visible(True)
     spine.set_color('black')
 
-# Données initiales
-positions = np.array([[p.x, p.y] for p in poissons])
-directions_x, directions_y = [], []
+# Affichage des flèches (poissons), lues directement dans les tableaux du banc
+rendu = RenduFleches(ax, banc)
+fleches = rendu.fleches
 
-# flèches
-for p in poissons:
-    vx, vy = p.Vx, p.Vy
-    norme = np.sqrt(vx**2 + vy**2)
-    if norme == 0:
-        norme = 1  # Éviter la division par zéro
-    directions_x.append(vx / norme)
-    directions_y.append(vy / norme)
-
-# Affichage des flèches (poissons)
-fleches = ax.quiver(positions[:, 0], positions[:, 1], directions_x, directions_y, 
-                   color='blue', width=0.005, scale=30, pivot='mid')
+# Prédateurs et zones d'évitement des obstacles
+rendu_predateurs = RenduFleches(ax, perturbations.predateurs, couleurs=('black',) * 3, width=0.012)
+fleches_predateurs = rendu_predateurs.fleches
+for centre in perturbations.obstacles:
+    ax.add_patch(plt.Circle(centre, rayon_obstacles, color='gray', alpha=0.4))
+if forme_bassin is not None:
+    ax.contour(*bassin.axes_grille(), bassin.champ[..., 0].T, levels=[0], colors='black')
 
 # Information sur le modèle
-info_text = ax.text(0.05, 0.95, 'Modèle: 6 voisins les plus proches uniquement', 
+info_text = ax.text(0.05, 0.95, f'Modèle: {nb_voisins} voisins les plus proches, '
+                    f'{nb_predateurs} prédateur(s), {nb_obstacles} obstacle(s)', 
                     transform=ax.transAxes, fontsize=10)
 
 #----------------- Fonctions pour l'animation ----------------------
 def init():
-    return (fleches, info_text)
+    return (fleches, fleches_predateurs, info_text)
 
 def update(frame):
     """Mise à jour des positions, vitesses et affichage à chaque frame."""
     
-    # Application des règles d'Aoki avec seulement les 6 plus proches voisins
-    Poisson.appliquer_regles_aoki_six_voisins(poissons, rayon_repulsion, rayon_alignement, 
-                                             rayon_attraction, k_repulsion, k_alignement, 
-                                             k_attraction, vitesse_max)
-
-    # Déplacement des poissons
-    for poisson in poissons:
-        poisson.deplacer(dt)
-        poisson.verifier_bords(xmin, xmax, ymin, ymax)
-    
-    # Mise à jour des positions dans le graphique
-    positions = np.array([[p.x, p.y] for p in poissons])
-    vitesses_x = np.array([p.Vx for p in poissons])
-    vitesses_y = np.array([p.Vy for p in poissons])
+    for _ in range(sous_pas):
+        # Fuite devant les prédateurs et obstacles proches, poursuite par les prédateurs
+        perturbations.appliquer(banc, vitesse_max)
+        perturbations.avancer(dt, (xmin, ymin), (xmax, ymax))
+
+        # Application des règles d'Aoki avec seulement les nb_voisins plus proches voisins
+        Poisson.appliquer_regles_aoki_six_voisins(poissons, rayon_repulsion, rayon_alignement, 
+                                                 rayon_attraction, k_repulsion, k_alignement, 
+                                                 k_attraction, vitesse_max, nb_voisins)
+
+        # Déplacement des poissons
+        banc.deplacer(dt)
+        banc.verifier_bords((xmin, ymin), (xmax, ymax), vitesse_max)
     
-    # Normaliser les vecteurs de vitesse pour avoir des flèches de taille uniforme
-    normes = np.sqrt(vitesses_x**2 + vitesses_y**2)
-    normes[normes == 0] = 1  # Éviter la division par zéro
-    vitesses_x_norm = vitesses_x / normes
-    vitesses_y_norm = vitesses_y / normes
+    # Mise à jour des flèches (directions normalisées pour une taille uniforme)
+    rendu.mettre_a_jour()
+    rendu_predateurs.mettre_a_jour()
     
-    fleches.set_offsets(positions)
-    fleches.set_UVC(vitesses_x_norm, vitesses_y_norm)
-    
-    return (fleches, info_text)
+    return (fleches, fleches_predateurs, info_text)
+
+# Observables d'ordre collectif mesurées à chaque image (polarisation, rotation, cohésion...)
+if afficher_observables:
+    update = suivre_animation(ax, update, banc)
+
+# Chronométrage des phases du pas affiché sur le graphique
+if afficher_profil:
+    update = instrumenter_animation(ax, update)
 
 #------------------ Animation ------------------------------------
 # Création de l'animation
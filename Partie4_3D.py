@@ -1,12 +1,19 @@
-import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from mpl_toolkits.mplot3d import Axes3D
 from poisson_3D import Poisson3D
+from banc import Banc
+from bassin import bassin_predefini
+from observables import suivre_animation
+from profilage import instrumenter_animation
+from perturbations import Perturbations
+from rendu import RenduPoints3D
 
 """ Partie 4 : Influence de la Densité en 3D
 
-Simulation d'un banc de poissons 3D avec les règles d'Aoki limitées aux 6 plus proches voisins.
+Simulation d'un banc de poissons 3D avec les règles d'Aoki limitées aux 6 plus proches voisins,
+perturbé par des prédateurs qui poursuivent le poisson le plus proche et par des
+obstacles fixes que le banc contourne.
 
 
 """
@@ -20,6 +27,15 @@ xmin, xmax = 0, largeur_bassin
 ymin, ymax = 0, hauteur_bassin
 zmin, zmax = 0, profondeur_bassin
 dt = 0.1
+sous_pas = 1  # Nombre de pas de simulation par image affichée
+max_points = None  # Nombre maximal de poissons dessinés (None : tous)
+afficher_profil = False  # Si True, affiche sur l'animation le temps passé dans chaque phase du pas
+afficher_observables = False  # Si True, affiche les observables d'ordre collectif (valeur courante et moyenne)
+bords_periodiques = False  # Si True, le bassin est un tore : un poisson qui sort d'un côté rentre de l'autre
+forme_bassin = None  # 'disque', 'cylindre', 'polygone' ou 'rochers' : parois de forme quelconque au lieu de la boîte
+
+# Nombre de plus proches voisins pris en compte par chaque poisson
+nb_voisins = 6
 
 # Coefficients de force pour chaque règle
 k_repulsion = 0.05
@@ -29,8 +45,33 @@ k_attraction = 0.01
 # Vitesse maximale des poissons
 vitesse_max = 15.0
 
+# Perturbations externes : prédateurs (triangles noirs) et obstacles fixes (sphères grises)
+nb_predateurs = 1
+nb_obstacles = 2
+rayon_fuite = 40.0  # Distance à laquelle un poisson fuit un prédateur
+k_fuite = 2.0
+rayon_obstacles = 20.0  # Distance à laquelle un poisson s'écarte d'un obstacle
+k_obstacles = 2.0
+k_poursuite = 0.5
+vitesse_max_predateurs = 12.0  # Plus lents que les poissons, qui peuvent leur échapper
+
 # ---------------- Initialisation des poissons ---------------------
-poissons = Poisson3D.creer_banc(nombre_poissons, xmin, xmax, ymin, ymax, zmin, zmax, Vmin=-5, Vmax=5)
+banc = Banc.aleatoire(nombre_poissons, (xmin, ymin, zmin), (xmax, ymax, zmax), Vmin=-5, Vmax=5)
+if bords_periodiques:
+    banc.rendre_periodique((xmin, ymin, zmin), (xmax, ymax, zmax))
+poissons = Poisson3D.depuis_banc(banc)
+perturbations = Perturbations.aleatoire(nb_predateurs, nb_obstacles, (xmin, ymin, zmin), (xmax, ymax, zmax),
+                                        -5, 5, rayon_fuite=rayon_fuite, k_fuite=k_fuite,
+                                        rayon_obstacles=rayon_obstacles, k_obstacles=k_obstacles,
+                                        k_poursuite=k_poursuite, vitesse_max=vitesse_max_predateurs)
+if bords_periodiques:
+    perturbations.rendre_periodique((xmin, ymin, zmin), (xmax, ymax, zmax))
+if forme_bassin is not None:
+    # Grille de distance signée aux parois, mise en cache sur disque
+    bassin = bassin_predefini(forme_bassin, (xmin, ymin, zmin), (xmax, ymax, zmax), distance_evitement=10.0, k_evitement=1.0)
+    banc.positions[...] = bassin.tirer_positions(nombre_poissons)
+    banc.utiliser_bassin(bassin)
+    perturbations.predateurs.utiliser_bassin(bassin)
 
 # ----------------- Configuration du graphique -------------------
 fig = plt.figure(figsize=(10, 8))
@@ -38,53 +79,62 @@ ax = fig.add_subplot(111, projection='3d')
 ax.set_xlim(xmin, xmax)
 ax.set_ylim(ymin, ymax)
 ax.set_zlim(zmin, zmax)
-ax.set_title('Simulation avec 6 voisins les plus proches en 3D')
+ax.set_title(f'Simulation avec {nb_voisins} voisins les plus proches en 3D')
 ax.set_xlabel('X')
 ax.set_ylabel('Y')
 ax.set_zlabel('Z')
 
-# Préparation des données pour l'affichage initial
-positions = np.array([p.get_position() for p in poissons])
+# Affichage des poissons : positions projetées et dessinées en 2D au-dessus de l'axe 3D
+rendu = RenduPoints3D(ax, banc, max_points=max_points)
+scatter = rendu.points
 
-# Affichage des poissons en 3D
-scatter = ax.scatter(
-    positions[:, 0], positions[:, 1], positions[:, 2],
-    c='blue', marker='o', s=50
-)
+# Prédateurs, et obstacles dessinés une seule fois dans le fond
+rendu_predateurs = RenduPoints3D(ax, perturbations.predateurs, couleurs=('black',) * 3, ombrage=False,
+                                 marker='^', s=150)
+points_predateurs = rendu_predateurs.points
+ax.scatter(*perturbations.obstacles.T, c='gray', s=600, alpha=0.4)
 
 # Information sur le modèle
-info_text = ax.text2D(0.05, 0.95, 'Modèle: 6 voisins les plus proches uniquement', transform=ax.transAxes, fontsize=10)
+info_text = ax.text2D(0.05, 0.95, f'Modèle: {nb_voisins} voisins les plus proches, '
+                      f'{nb_predateurs} prédateur(s), {nb_obstacles} obstacle(s)', transform=ax.transAxes, fontsize=10)
 
 # Fonction d'initialisation pour l'animation
 def init():
-    return scatter, info_text
+    return scatter, points_predateurs, info_text
 
 # Fonction de mise à jour pour l'animation
 def update(frame):
-    # Application des règles d'Aoki avec seulement les 6 plus proches voisins
-    Poisson3D.appliquer_regles_aoki_six_voisins(poissons, k_repulsion, k_alignement, 
-                                             k_attraction, vitesse_max)
-    
-    # Déplacement des poissons
-    for poisson in poissons:
-        poisson.deplacer(dt)
-        poisson.verifier_bords(xmin, xmax, ymin, ymax, zmin, zmax)
+    for _ in range(sous_pas):
+        # Fuite devant les prédateurs et obstacles proches, poursuite par les prédateurs
+        perturbations.appliquer(banc, vitesse_max)
+        perturbations.avancer(dt, (xmin, ymin, zmin), (xmax, ymax, zmax))
+
+        # Application des règles d'Aoki avec seulement les nb_voisins plus proches voisins
+        Poisson3D.appliquer_regles_aoki_six_voisins(poissons, k_repulsion, k_alignement, 
+                                                 k_attraction, vitesse_max, nb_voisins)
     
-    # Mise à jour des positions pour l'affichage
-    positions = np.array([p.get_position() for p in poissons])
+        # Déplacement des poissons
+        banc.deplacer(dt)
+        banc.verifier_bords((xmin, ymin, zmin), (xmax, ymax, zmax), vitesse_max)
     
-    # Mise à jour des données du scatter
-    scatter._offsets3d = (positions[:, 0], positions[:, 1], positions[:, 2])
+    # Projection des positions pour l'affichage (seuls les points sont redessinés)
+    rendu.mettre_a_jour()
+    rendu_predateurs.mettre_a_jour()
     
-    # Forcer un rafraîchissement du graphique
-    fig.canvas.draw_idle()
-    
-    return scatter, info_text
+    return scatter, points_predateurs, info_text
+
+# Observables d'ordre collectif mesurées à chaque image (polarisation, rotation, cohésion...)
+if afficher_observables:
+    update = suivre_animation(ax, update, banc)
+
+# Chronométrage des phases du pas affiché sur le graphique
+if afficher_profil:
+    update = instrumenter_animation(ax, update)
 
-# Création de l'animation avec blit=False pour les animations 3D
+# Création de l'animation : seuls les points projetés sont redessinés (blit)
 ani = animation.FuncAnimation(fig, update, frames=200, 
                              init_func=init, interval=50, 
-                             blit=False)
+                             blit=True)
 
 # Affichage
 plt.show() 
\ No newline at end of file
@@ -1,7 +1,10 @@
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from poisson import Poisson
+from banc import Banc
+from observables import suivre_animation
+from profilage import instrumenter_animation
+from rendu import RenduFleches
 
 """ Partie 5 : Réseau d'Influence
 
@@ -14,6 +17,10 @@ n = 30          # Nombre de poissons
 xmin, xmax = 0, 20 
 ymin, ymax = 0, 20
 dt = 0.05
+sous_pas = 1  # Nombre de pas de simulation par image affichée
+afficher_profil = False  # Si True, affiche sur l'animation le temps passé dans chaque phase du pas
+afficher_observables = False  # Si True, affiche les observables d'ordre collectif (valeur courante et moyenne)
+bords_periodiques = False  # Si True, le bassin est un tore : un poisson qui sort d'un côté rentre de l'autre
 
 # Angle du cône de vision (en degrés)
 angle_cone = 60
@@ -30,18 +37,12 @@ R_attraction = 5.0
 
 vitesse_max = 1.5
 #---------------- Initialisation des poissons ---------------------
-poissons = Poisson.creer_banc(n, xmin, xmax, ymin, ymax, -1.5, 1.5)
+banc = Banc.aleatoire(n, (xmin, ymin), (xmax, ymax), -1.5, 1.5)
+if bords_periodiques:
+    banc.rendre_periodique((xmin, ymin), (xmax, ymax))
+poissons = Poisson.depuis_banc(banc)
 
 #----------------- Configuration du graphique -------------------
-# Initialisation du graphique
-positions = np.array([[p.x, p.y] for p in poissons])
-vitesses_x = np.array([p.Vx for p in poissons])
-vitesses_y = np.array([p.Vy for p in poissons])
-normes = np.sqrt(vitesses_x**2 + vitesses_y**2)
-normes[normes == 0] = 1
-vitesses_x_norm = vitesses_x / normes
-vitesses_y_norm = vitesses_y / normes
-
 fig, ax = plt.subplots(figsize=(10, 10), facecolor='white')
 ax.set_xlim(xmin, xmax)
 ax.set_ylim(ymin, ymax)
@@ -53,8 +54,9 @@ for spine in ax.spines.values():
     spine.set_visible(True)
     spine.set_color('black')
 
-fleches = ax.quiver(positions[:, 0], positions[:, 1], vitesses_x_norm, vitesses_y_norm,
-                   color='blue', width=0.005, scale=30, pivot='mid')
+# Flèches lues directement dans les tableaux du banc
+rendu = RenduFleches(ax, banc)
+fleches = rendu.fleches
 
 #----------------- Fonctions pour l'animation ----------------------
 
@@ -62,34 +64,34 @@ def init():
     return (fleches,)
 
 def update(frame):
-    # Application des règles d'influence visuelle
-    Poisson.appliquer_regles_influence_visuelle(
-        poissons,
-        vision_angle=angle_cone,
-        rayon_repulsion=R_repulsion,
-        rayon_alignement=R_alignement,
-        rayon_attraction=R_attraction,
-        k_repulsion=k_repulsion,
-        k_alignement=k_alignement,
-        k_attraction=k_attraction,
-        Vmax=vitesse_max
-    )
-    # Déplacement et rebond
-    for poisson in poissons:
-        poisson.deplacer(dt)
-        poisson.verifier_bords(xmin, xmax, ymin, ymax)
+    for _ in range(sous_pas):
+        # Application des règles d'influence visuelle
+        Poisson.appliquer_regles_influence_visuelle(
+            poissons,
+            vision_angle=angle_cone,
+            rayon_repulsion=R_repulsion,
+            rayon_alignement=R_alignement,
+            rayon_attraction=R_attraction,
+            k_repulsion=k_repulsion,
+            k_alignement=k_alignement,
+            k_attraction=k_attraction,
+            Vmax=vitesse_max
+        )
+        # Déplacement et rebond
+        banc.deplacer(dt)
+        banc.verifier_bords((xmin, ymin), (xmax, ymax))
     # Mise à jour de l'affichage
-    positions = np.array([[p.x, p.y] for p in poissons])
-    vitesses_x = np.array([p.Vx for p in poissons])
-    vitesses_y = np.array([p.Vy for p in poissons])
-    normes = np.sqrt(vitesses_x**2 + vitesses_y**2)
-    normes[normes == 0] = 1
-    vitesses_x_norm = vitesses_x / normes
-    vitesses_y_norm = vitesses_y / normes
-    fleches.set_offsets(positions)
-    fleches.set_UVC(vitesses_x_norm, vitesses_y_norm)
+    rendu.mettre_a_jour()
     return (fleches,)
 
+# Observables d'ordre collectif mesurées à chaque image (polarisation, rotation, cohésion...)
+if afficher_observables:
+    update = suivre_animation(ax, update, banc)
+
+# Chronométrage des phases du pas affiché sur le graphique
+if afficher_profil:
+    update = instrumenter_animation(ax, update)
+
 #------------------ Animation ------------------------------------
 # Création de l'animation
 ani = FuncAnimation(fig, update, frames=500, blit=True, interval=20)
@@ -0,0 +1,204 @@
+import argparse
+import csv
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from contamination import resume_cascade
+from simulation import (MODELES, PARAMETRES_BASSIN, PARAMETRES_PERTURBATIONS, Simulation,
+                        parametres_modele)
+
+""" Balayage de paramètres en parallèle
+
+Exécute des simulations sans affichage indépendantes pour une grille ou un
+échantillon aléatoire de paramètres (rayon_repulsion, k_alignement,
+vitesse_max, ...) et plusieurs graines, sur un ProcessPoolExecutor. Chaque
+résultat (paramètres, graine, polarisation, rayon de cohésion, distance au
+plus proche voisin, fraction contaminée, en moyenne sur les répliques et,
+pour le modèle contamination, vitesse du front et
+statistiques de branchement de la cascade) est rendu dès qu'il est prêt et
+mis en cache sur disque sous une clé calculée à partir de la configuration :
+relancer un balayage interrompu ne refait que les simulations manquantes. La graine numéro k d'un
+balayage est le k-ième enfant (SeedSequence.spawn) de la graine racine : les
+résultats sont identiques bit à bit quel que soit le nombre de processus.
+L'échantillon aléatoire de configurations est lui aussi tiré d'un enfant
+dédié de la graine racine : relancer un balayage --aleatoire interrompu
+retrouve les mêmes configurations, donc le même cache.
+
+    python balayage.py --modele aoki --param k_alignement=0.01,0.03,0.05 \\
+        --param rayon_repulsion=1.0,1.5 --graines 4 --pas 500 --sortie resultats.csv
+
+"""
+
+def grille_parametres(**valeurs):
+    """Retourne toutes les combinaisons (produit cartésien) des valeurs données pour chaque paramètre."""
+    noms = list(valeurs)
+    return [dict(zip(noms, combinaison)) for combinaison in itertools.product(*valeurs.values())]
+
+
+def echantillon_parametres(nb_configurations, graine=None, **intervalles):
+    """Tire nb_configurations jeux de paramètres uniformément dans les intervalles (min, max) donnés."""
+    generateur = np.random.default_rng(graine)
+    return [{nom: float(generateur.uniform(bas, haut)) for nom, (bas, haut) in intervalles.items()}
+            for _ in range(nb_configurations)]
+
+
+# À incrémenter quand le contenu d'un résultat change, pour ne pas relire d'anciens résultats
+VERSION_CACHE = 2
+
+
+def cle_configuration(configuration):
+    """Empreinte stable d'une configuration, utilisée comme nom de fichier du cache."""
+    texte = json.dumps(dict(configuration, version_cache=VERSION_CACHE), sort_keys=True)
+    return hashlib.sha1(texte.encode()).hexdigest()
+
+
+def flux_graine(graine_racine, graine):
+    """
+    Flux aléatoire de la graine numéro graine : enfant de rang graine de
+    SeedSequence(graine_racine), identique à SeedSequence(graine_racine).spawn(graine + 1)[graine].
+    """
+    return np.random.SeedSequence(graine_racine, spawn_key=(graine,))
+
+
+def flux_echantillon(graine_racine):
+    """
+    Flux aléatoire du tirage des configurations (--aleatoire) : enfant de
+    SeedSequence(graine_racine) de clé hors de la plage des numéros de graine.
+    """
+    return np.random.SeedSequence(graine_racine, spawn_key=(2 ** 32 - 1,))
+
+
+def verifier_parametres(noms, modele, dimension=2):
+    """Lève ValueError si un nom n'est ni un paramètre du modèle (parametres_modele) ni une option de Simulation."""
+    connus = set(parametres_modele(modele, dimension)) - {'modele', 'dimension', 'n'}
+    connus |= set(PARAMETRES_PERTURBATIONS[dimension]) | set(PARAMETRES_BASSIN[dimension])
+    connus |= set(inspect.signature(Simulation).parameters) - {'modele', 'dimension', 'n', 'graine', 'parametres'}
+    inconnus = [nom for nom in noms if nom not in connus]
+    if inconnus:
+        raise ValueError(f"paramètre(s) inconnu(s) pour le modèle {modele} : {', '.join(inconnus)} "
+                         f"(choix : {', '.join(sorted(connus))})")
+
+
+def executer_configuration(configuration):
+    """Exécute une simulation décrite par configuration et retourne ses observables finales (moyennes sur les répliques)."""
+    configuration = dict(configuration)
+    modele, dimension = configuration.pop('modele'), configuration.pop('dimension')
+    n, nb_pas, graine = configuration.pop('n'), configuration.pop('nb_pas'), configuration.pop('graine')
+    flux = flux_graine(configuration.pop('graine_racine', 0), graine)
+    simulation = Simulation(modele, dimension, n, graine=flux, **configuration)
+    debut = time.perf_counter()
+    simulation.executer(nb_pas)
+    # Moyenne sur les répliques d'observables mesurées réplique par réplique, avec la
+    # boîte périodique pour les distances au plus proche voisin
+    resultat = {nom: float(valeurs.mean()) for nom, valeurs in simulation.observables().items()}
+    if simulation.cascade is not None:
+        # Vitesse du front, profondeur et branchement de la cascade de contamination
+        resultat.update(resume_cascade(simulation.cascade, simulation.repliques, simulation.parametres['dt']))
+    resultat['duree'] = time.perf_counter() - debut
+    return resultat
+
+
+def executer_balayage(configurations, graines=(0,), modele='aoki', dimension=2, n=None,
+                      nb_pas=500, cache='balayage_cache', workers=None, graine_racine=0):
+    """
+    Exécute chaque configuration de paramètres pour chaque graine et rend les
+    résultats (dictionnaires à plat) au fur et à mesure qu'ils se terminent.
+    Les résultats déjà présents dans le dossier cache sont rendus sans recalcul.
+    """
+    if cache is not None:
+        os.makedirs(cache, exist_ok=True)
+
+    a_calculer = {}
+    for parametres in configurations:
+        for graine in graines:
+            configuration = dict(parametres, modele=modele, dimension=dimension, n=n,
+                                 nb_pas=nb_pas, graine=int(graine), graine_racine=graine_racine)
+            cle = cle_configuration(configuration)
+            chemin = os.path.join(cache, cle + '.json') if cache is not None else None
+            if chemin is not None and os.path.exists(chemin):
+                with open(chemin) as fichier:
+                    yield json.load(fichier)
+            else:
+                a_calculer[cle] = (configuration, chemin)
+
+    if not a_calculer:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executeur:
+        futurs = {executeur.submit(executer_configuration, configuration): cle
+                  for cle, (configuration, _) in a_calculer.items()}
+        for futur in as_completed(futurs):
+            configuration, chemin = a_calculer[futurs[futur]]
+            resultat = dict(configuration, **futur.result())
+            if chemin is not None:
+                with open(chemin + '.tmp', 'w') as fichier:
+                    json.dump(resultat, fichier)
+                os.replace(chemin + '.tmp', chemin)
+            yield resultat
+
+
+def ecrire_csv(resultats, chemin):
+    """Écrit la liste des résultats dans un fichier CSV (une ligne par simulation)."""
+    colonnes = []
+    for resultat in resultats:
+        colonnes += [cle for cle in resultat if cle not in colonnes]
+    with open(chemin, 'w', newline='') as fichier:
+        ecrivain = csv.DictWriter(fichier, fieldnames=colonnes)
+        ecrivain.writeheader()
+        ecrivain.writerows(resultats)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Balayage de paramètres en parallèle')
+    parser.add_argument('--modele', choices=MODELES, default='aoki')
+    parser.add_argument('--dimension', type=int, choices=(2, 3), default=2)
+    parser.add_argument('--n', type=int, default=None, help='nombre de poissons')
+    parser.add_argument('--pas', type=int, default=500, help='nombre de pas par simulation')
+    parser.add_argument('--param', action='append', default=[], metavar='NOM=V1,V2,...',
+                        help='valeurs de la grille pour un paramètre')
+    parser.add_argument('--intervalle', action='append', default=[], metavar='NOM=MIN:MAX',
+                        help='intervalle de tirage pour un paramètre (avec --aleatoire)')
+    parser.add_argument('--aleatoire', type=int, default=None, metavar='NB',
+                        help='tire NB configurations au hasard dans les intervalles')
+    parser.add_argument('--graines', type=int, default=1, help='nombre de graines par configuration')
+    parser.add_argument('--graine-racine', type=int, default=0, help='graine dont dérivent toutes les graines')
+    parser.add_argument('--workers', type=int, default=None, help='nombre de processus')
+    parser.add_argument('--cache', default='balayage_cache', help='dossier du cache des résultats')
+    parser.add_argument('--sortie', default='balayage.csv')
+    args = parser.parse_args(arguments)
+
+    if args.aleatoire is not None:
+        intervalles = {nom: tuple(float(x) for x in bornes.split(':'))
+                       for nom, bornes in (texte.split('=', 1) for texte in args.intervalle)}
+        noms = intervalles
+    else:
+        valeurs = {nom: [json.loads(x) for x in liste.split(',')]
+                   for nom, liste in (texte.split('=', 1) for texte in args.param)}
+        noms = valeurs
+    try:
+        verifier_parametres(noms, args.modele, args.dimension)
+    except ValueError as erreur:
+        parser.error(str(erreur))
+    if args.aleatoire is not None:
+        configurations = echantillon_parametres(args.aleatoire, flux_echantillon(args.graine_racine),
+                                                **intervalles)
+    else:
+        configurations = grille_parametres(**valeurs)
+
+    resultats = []
+    total = len(configurations) * args.graines
+    for resultat in executer_balayage(configurations, range(args.graines), args.modele, args.dimension,
+                                      args.n, args.pas, args.cache, args.workers,
+                                      args.graine_racine):
+        resultats.append(resultat)
+        print(f"[{len(resultats)}/{total}] " + json.dumps(resultat))
+    ecrire_csv(resultats, args.sortie)
+    return resultats
+
+
+if __name__ == '__main__':
+    main()
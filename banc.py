@@ -0,0 +1,183 @@
+import numpy as np
+import profilage
+
+""" Banc de poissons vectorisé
+
+Le banc stocke les positions et les vitesses de tous les poissons dans des
+tableaux numpy contigus de forme (N, D), avec D = 2 ou D = 3. Les opérations
+(déplacement, rebonds, limitation de vitesse) agissent sur le banc entier.
+
+Par défaut les bords du bassin sont des murs réfléchissants. Après
+rendre_periodique(mins, maxs), le bassin est un tore de côtés boite = maxs - mins :
+verifier_bords replie les positions par modulo et les règles mesurent les
+distances selon la convention de l'image minimale (voisinage.image_minimale).
+Après utiliser_bassin(bassin), les murs sont ceux d'un bassin de forme
+quelconque décrit par un champ de distance signée (bassin.Bassin).
+
+Tous les tirages aléatoires passent par un numpy.random.Generator explicite
+(argument generateur, tout ce qu'accepte np.random.default_rng) : une graine
+entière rend une simulation reproductible.
+
+"""
+
+class Banc:
+
+    def __init__(self, positions, vitesses):
+
+        self.positions = np.array(positions, dtype=float, ndmin=2)
+        self.vitesses = np.array(vitesses, dtype=float, ndmin=2)
+        if self.positions.shape != self.vitesses.shape:
+            raise ValueError("positions et vitesses doivent avoir la même forme (N, D)")
+        self.contamines = np.zeros(len(self.positions), dtype=bool)
+        # Côtés (D,) du domaine périodique, None pour des murs réfléchissants
+        self.boite = None
+        # Bassin de forme quelconque (bassin.Bassin), None pour la boîte [mins, maxs]
+        self.bassin = None
+        # Distance au plus proche voisin notée par les règles (N,), allouée par observables.SuiviObservables
+        self.plus_proche = None
+        # Tampon réutilisé à chaque pas pour éviter les allocations
+        self._tampon = np.empty_like(self.positions)
+
+    def __len__(self):
+        return self.positions.shape[0]
+
+    @property
+    def dimension(self):
+        """Dimension de l'espace (2 ou 3)."""
+        return self.positions.shape[1]
+
+    @classmethod
+    def aleatoire(cls, nb_poissons, mins, maxs, Vmin=-1, Vmax=1, generateur=None):
+        """Crée un banc avec des positions aléatoires dans [mins, maxs] et des vitesses dans [Vmin, Vmax]"""
+        generateur = np.random.default_rng(generateur)
+        mins = np.asarray(mins, dtype=float)
+        maxs = np.asarray(maxs, dtype=float)
+        positions = generateur.uniform(mins, maxs, size=(nb_poissons, len(mins)))
+        vitesses = generateur.uniform(Vmin, Vmax, size=(nb_poissons, len(mins)))
+        return cls(positions, vitesses)
+
+    @profilage.chronometre('deplacer')
+    def deplacer(self, Dt):
+        """Déplace tous les poissons en fonction de leur vitesse"""
+        np.multiply(self.vitesses, Dt, out=self._tampon)
+        self.positions += self._tampon
+
+    def rendre_periodique(self, mins, maxs):
+        """Fait du bassin [mins, maxs] un domaine périodique (tore) et y replie les positions."""
+        if self.bassin is not None:
+            raise ValueError("un bassin de forme quelconque n'est pas compatible avec un domaine périodique")
+        self.boite = np.asarray(maxs, dtype=float) - np.asarray(mins, dtype=float)
+        if np.any(self.boite <= 0):
+            raise ValueError("un domaine périodique doit avoir des côtés strictement positifs")
+        self.verifier_bords(mins, maxs)
+
+    def utiliser_bassin(self, bassin):
+        """Remplace les murs de la boîte par les parois d'un bassin.Bassin et y ramène les poissons."""
+        if self.boite is not None:
+            raise ValueError("un bassin de forme quelconque n'est pas compatible avec un domaine périodique")
+        self.bassin = bassin
+        bassin.verifier_bords(self)
+
+    @profilage.chronometre('bords')
+    def verifier_bords(self, mins, maxs, Vmax=None):
+        """
+        Gère les bords pour tous les poissons et tous les axes : rebonds sur les
+        murs, ou repliement dans [mins, mins + boite) si le bassin est périodique.
+        Avec un bassin de forme quelconque, mins et maxs sont ignorés et Vmax,
+        s'il est donné, limite la vitesse après l'évitement des parois.
+        """
+        if self.bassin is not None:
+            self.bassin.verifier_bords(self, Vmax)
+            return
+        if self.boite is not None:
+            np.subtract(self.positions, mins, out=self._tampon)
+            np.mod(self._tampon, self.boite, out=self._tampon)
+            # np.mod rend exactement boite pour un écart négatif infime
+            self._tampon[self._tampon >= self.boite] = 0.0
+            np.add(self._tampon, mins, out=self.positions)
+            return
+        sortis = (self.positions < mins) | (self.positions > maxs)
+        np.clip(self.positions, mins, maxs, out=self.positions)
+        np.negative(self.vitesses, out=self.vitesses, where=sortis)
+
+    def normes_vitesses(self):
+        """Retourne la vitesse totale de chaque poisson"""
+        return np.sqrt(np.einsum('ij,ij->i', self.vitesses, self.vitesses))
+
+    def limiter_vitesse(self, Vmax=1.5):
+        """Ramène à Vmax la norme des vitesses qui la dépassent"""
+        normes = self.normes_vitesses()
+        trop_rapides = normes > Vmax
+        self.vitesses[trop_rapides] *= (Vmax / normes[trop_rapides])[:, None]
+
+    def set_vitesses(self, v, Vmax=1.5):
+        """Met à jour les vitesses du banc avec une limitation de vitesse maximale."""
+        self.vitesses[...] = v
+        self.limiter_vitesse(Vmax)
+
+
+def composante(tableau, axe):
+    """Propriété qui lit et écrit une composante de la ligne du poisson dans le banc."""
+    def lire(self):
+        return float(getattr(self._banc, tableau)[self._i, axe])
+
+    def ecrire(self, valeur):
+        getattr(self._banc, tableau)[self._i, axe] = valeur
+
+    return property(lire, ecrire)
+
+
+def etat_contamine():
+    """Propriété qui lit et écrit l'état de contamination du poisson dans le banc."""
+    def lire(self):
+        return bool(self._banc.contamines[self._i])
+
+    def ecrire(self, valeur):
+        self._banc.contamines[self._i] = valeur
+
+    return property(lire, ecrire)
+
+
+def banc_commun(poissons):
+    """
+    Retourne le banc dont la liste de poissons couvre exactement toutes les lignes,
+    dans l'ordre, ou None si les poissons ne forment pas un banc unique.
+    """
+    if not poissons:
+        return None
+    banc = poissons[0]._banc
+    if len(banc) != len(poissons):
+        return None
+    for i, poisson in enumerate(poissons):
+        if poisson._banc is not banc or poisson._i != i:
+            return None
+    return banc
+
+
+def appliquer_sur_poissons(poissons, regle, *args, **kwargs):
+    """
+    Applique une règle vectorisée (fonction prenant un Banc) à une liste de poissons.
+
+    Si les poissons sont les vues d'un même banc, la règle agit directement sur
+    ce banc. Sinon leurs états sont rassemblés dans un banc temporaire puis les
+    vitesses et contaminations sont recopiées dans chaque poisson.
+    """
+    banc = banc_commun(poissons)
+    if banc is not None:
+        return regle(banc, *args, **kwargs)
+    if not poissons:
+        return None
+
+    banc = Banc([p.get_position() for p in poissons], [p.get_vitesse_np() for p in poissons])
+    banc.contamines[:] = [p.is_contaminated for p in poissons]
+    resultat = regle(banc, *args, **kwargs)
+    for poisson, vitesse, contamine in zip(poissons, banc.vitesses, banc.contamines):
+        poisson._banc.vitesses[poisson._i] = vitesse
+        poisson._banc.contamines[poisson._i] = contamine
+    return resultat
+
+
+if __name__ == '__main__':
+    # python -m banc run ... : simulation sans affichage (voir simulation.py)
+    from simulation import main
+    main()
@@ -0,0 +1,287 @@
+import abc
+import hashlib
+import itertools
+import json
+import os
+import numpy as np
+import profilage
+
+""" Bassins de forme quelconque (champ de distance signée)
+
+La géométrie d'un bassin est décrite une fois par des formes élémentaires
+dont la distance signée (négative à l'intérieur) se calcule sur un lot de
+points : Boite, Sphere (disque en 2D), Polygone (2D) et Extrusion d'une forme
+2D le long de z (cylindre, prisme polygonal). L'eau est l'intérieur de la
+forme du bassin privé des rochers.
+
+Bassin échantillonne cette distance signée et son gradient sur une grille
+régulière, une fois pour toutes : à chaque pas, une seule interpolation
+multilinéaire par poisson donne sa distance aux parois et la normale sortante,
+quelle que soit la complexité de la géométrie. La grille est mise en cache sur
+disque sous une clé calculée à partir de la géométrie et de la résolution :
+une seconde exécution ne refait pas la rastérisation.
+
+Après banc.utiliser_bassin(bassin), banc.verifier_bords fait fuir les
+poissons proches d'une paroi (distance_evitement, k_evitement), sans dépasser
+la vitesse maximale si elle est donnée, puis ramène
+sur la paroi ceux qui l'ont traversée et réfléchit leur vitesse.
+
+"""
+
+VERSION_CACHE = 1
+
+
+class Forme(abc.ABC):
+    """Forme élémentaire : distance signée sur un lot de points (M, D), négative à l'intérieur."""
+
+    def __init__(self, *parametres):
+        self.parametres = [np.asarray(p, dtype=float).tolist() for p in parametres]
+
+    @abc.abstractmethod
+    def distance(self, points):
+        """Distance signée (M,) des points (M, D) à la frontière de la forme."""
+
+    @abc.abstractmethod
+    def limites(self):
+        """Boîte englobante (mins, maxs) de la forme."""
+
+    def cle(self):
+        """Description JSON de la forme, utilisée dans la clé du cache."""
+        return [type(self).__name__] + self.parametres
+
+
+class Boite(Forme):
+
+    def __init__(self, mins, maxs):
+        super().__init__(mins, maxs)
+        self.mins = np.asarray(mins, dtype=float)
+        self.maxs = np.asarray(maxs, dtype=float)
+
+    def distance(self, points):
+        centre, demi = (self.mins + self.maxs) / 2, (self.maxs - self.mins) / 2
+        q = np.abs(points - centre) - demi
+        exterieur = np.sqrt(np.einsum('ij,ij->i', np.maximum(q, 0), np.maximum(q, 0)))
+        return exterieur + np.minimum(q.max(axis=1), 0)
+
+    def limites(self):
+        return self.mins, self.maxs
+
+
+class Sphere(Forme):
+    """Disque en 2D, sphère en 3D."""
+
+    def __init__(self, centre, rayon):
+        super().__init__(centre, rayon)
+        self.centre, self.rayon = np.asarray(centre, dtype=float), float(rayon)
+
+    def distance(self, points):
+        ecarts = points - self.centre
+        return np.sqrt(np.einsum('ij,ij->i', ecarts, ecarts)) - self.rayon
+
+    def limites(self):
+        return self.centre - self.rayon, self.centre + self.rayon
+
+
+class Polygone(Forme):
+    """Polygone simple 2D donné par ses sommets (K, 2), dans un sens quelconque."""
+
+    def __init__(self, sommets):
+        super().__init__(sommets)
+        self.sommets = np.array(sommets, dtype=float, ndmin=2)
+
+    def distance(self, points):
+        carres = np.full(len(points), np.inf)
+        interieur = np.zeros(len(points), dtype=bool)
+        for a, b in zip(self.sommets, np.roll(self.sommets, -1, axis=0)):
+            arete, w = b - a, points - a
+            t = np.clip(w @ arete / (arete @ arete), 0, 1)
+            projete = w - t[:, None] * arete
+            np.minimum(carres, np.einsum('ij,ij->i', projete, projete), out=carres)
+            # Test de parité : l'arête croise-t-elle la demi-droite horizontale issue du point ?
+            au_dessus_a, au_dessus_b = points[:, 1] >= a[1], points[:, 1] >= b[1]
+            gauche = arete[0] * w[:, 1] > arete[1] * w[:, 0]
+            interieur ^= (au_dessus_a & ~au_dessus_b & gauche) | (~au_dessus_a & au_dessus_b & ~gauche)
+        return np.where(interieur, -1.0, 1.0) * np.sqrt(carres)
+
+    def limites(self):
+        return self.sommets.min(axis=0), self.sommets.max(axis=0)
+
+
+class Extrusion(Forme):
+    """Forme 2D (dans le plan x, y) étirée entre zmin et zmax : cylindre, prisme polygonal."""
+
+    def __init__(self, forme, zmin, zmax):
+        super().__init__(zmin, zmax)
+        self.forme, self.zmin, self.zmax = forme, float(zmin), float(zmax)
+
+    def distance(self, points):
+        d_plan = self.forme.distance(points[:, :2])
+        d_z = np.abs(points[:, 2] - (self.zmin + self.zmax) / 2) - (self.zmax - self.zmin) / 2
+        exterieur = np.hypot(np.maximum(d_plan, 0), np.maximum(d_z, 0))
+        return exterieur + np.minimum(np.maximum(d_plan, d_z), 0)
+
+    def limites(self):
+        mins, maxs = self.forme.limites()
+        return np.append(mins, self.zmin), np.append(maxs, self.zmax)
+
+    def cle(self):
+        return super().cle() + [self.forme.cle()]
+
+
+def cylindre(centre, rayon, zmin, zmax):
+    """Cylindre d'axe vertical de centre (x, y) et de rayon donnés."""
+    return Extrusion(Sphere(centre, rayon), zmin, zmax)
+
+
+def _cle_cache(description):
+    """Empreinte stable d'une description JSON, utilisée comme nom de fichier du cache."""
+    texte = json.dumps(description, sort_keys=True)
+    return hashlib.sha1(texte.encode()).hexdigest()
+
+
+class Bassin:
+
+    def __init__(self, forme, rochers=(), resolution=None, distance_evitement=0.0, k_evitement=0.0,
+                 cache='bassin_cache'):
+        """
+        forme est l'intérieur du bassin et rochers des formes retirées de
+        l'eau. resolution est le pas de la grille (par défaut 1/256 du plus
+        grand côté en 2D, 1/64 en 3D). cache est le dossier du cache sur
+        disque, ou None pour toujours rastériser.
+        """
+        self.forme, self.rochers = forme, tuple(rochers)
+        self.distance_evitement, self.k_evitement = distance_evitement, k_evitement
+        mins, maxs = (np.asarray(borne, dtype=float) for borne in forme.limites())
+        self.dimension = len(mins)
+        if resolution is None:
+            resolution = float(np.max(maxs - mins)) / (256 if self.dimension == 2 else 64)
+        self.resolution = resolution
+        # Deux mailles de marge autour de la forme pour que la normale y reste définie
+        self.origine = mins - 2 * resolution
+        self.forme_grille = tuple(np.ceil((maxs - mins) / resolution).astype(int) + 5)
+
+        description = dict(version=VERSION_CACHE, forme=forme.cle(), rochers=[r.cle() for r in self.rochers],
+                           resolution=resolution)
+        chemin = None if cache is None else os.path.join(cache, _cle_cache(description) + '.npz')
+        if chemin is not None and os.path.exists(chemin):
+            with np.load(chemin) as donnees:
+                self.champ = donnees['champ']
+        else:
+            self.champ = self._rasteriser()
+            if chemin is not None:
+                os.makedirs(cache, exist_ok=True)
+                temporaire = chemin + f'.{os.getpid()}.tmp'
+                with open(temporaire, 'wb') as fichier:
+                    np.savez(fichier, champ=self.champ, description=json.dumps(description))
+                os.replace(temporaire, chemin)
+        # Une ligne (distance, gradient) par nœud : une seule lecture par coin de maille
+        self._champ_plat = self.champ.reshape(-1, self.dimension + 1)
+        # Décalage, dans le tableau à plat, du nœud de chaque coin de maille par rapport au coin inférieur
+        self._pas_noeuds = np.array(self.champ.strides[:-1]) // self.champ.strides[-2]
+        self._coins = list(itertools.product((0, 1), repeat=self.dimension))
+        self._decalages = [int(np.dot(coin, self._pas_noeuds)) for coin in self._coins]
+
+    def distance(self, points):
+        """Distance signée exacte à l'eau (négative dans l'eau, positive dans les parois et rochers)."""
+        distances = self.forme.distance(points)
+        for rocher in self.rochers:
+            np.maximum(distances, -rocher.distance(points), out=distances)
+        return distances
+
+    def axes_grille(self):
+        """Coordonnées des nœuds de la grille sur chaque axe (pour tracer le contour du bassin)."""
+        return [self.origine[k] + self.resolution * np.arange(n) for k, n in enumerate(self.forme_grille)]
+
+    @profilage.chronometre('bassin.rasterisation')
+    def _rasteriser(self):
+        noeuds = np.stack(np.meshgrid(*self.axes_grille(), indexing='ij'), axis=-1).reshape(-1, self.dimension)
+        distances = self.distance(noeuds).reshape(self.forme_grille)
+        gradients = np.gradient(distances, self.resolution)
+        return np.stack([distances] + list(gradients), axis=-1)
+
+    def echantillonner(self, positions):
+        """Interpolation multilinéaire de la distance signée (M,) et de son gradient (M, D)."""
+        x = (positions - self.origine) / self.resolution
+        base = np.clip(np.floor(x).astype(np.intp), 0, np.array(self.forme_grille) - 2)
+        t = np.clip(x - base, 0, 1)
+        noeuds = base @ self._pas_noeuds
+        valeurs = np.zeros((len(positions), self.dimension + 1))
+        for coin, decalage in zip(self._coins, self._decalages):
+            poids = np.ones(len(positions))
+            for axe, haut in enumerate(coin):
+                poids *= t[:, axe] if haut else 1 - t[:, axe]
+            valeurs += poids[:, None] * self._champ_plat[noeuds + decalage]
+        return valeurs[:, 0], valeurs[:, 1:]
+
+    def contient(self, positions):
+        """Indique pour chaque position si elle est dans l'eau."""
+        return self.echantillonner(positions)[0] < 0
+
+    def tirer_positions(self, nb, generateur=None):
+        """Tire nb positions uniformément dans l'eau (par rejet dans la boîte englobante)."""
+        generateur = np.random.default_rng(generateur)
+        mins, maxs = self.forme.limites()
+        tirees = np.empty((0, self.dimension))
+        while len(tirees) < nb:
+            candidates = generateur.uniform(mins, maxs, size=(max(2 * (nb - len(tirees)), 16), self.dimension))
+            tirees = np.concatenate((tirees, candidates[self.contient(candidates)]))
+        return tirees[:nb]
+
+    @profilage.chronometre('bassin')
+    def verifier_bords(self, banc, Vmax=None):
+        """
+        Évitement et réflexion sur les parois pour tout le banc, à partir d'une
+        seule interpolation par poisson. Si Vmax est donné, la vitesse des
+        poissons est limitée à Vmax après l'évitement.
+        """
+        distances, normales = self.echantillonner(banc.positions)
+        normes = np.sqrt(np.einsum('ij,ij->i', normales, normales))
+        normales /= np.where(normes > 0, normes, np.inf)[:, None]
+
+        if self.k_evitement > 0 and self.distance_evitement > 0:
+            # Force vers l'intérieur, d'autant plus forte que la paroi est proche
+            proches = distances > -self.distance_evitement
+            intensites = self.k_evitement * (1 + distances[proches] / self.distance_evitement)
+            banc.vitesses[proches] -= np.minimum(intensites, self.k_evitement)[:, None] * normales[proches]
+            if Vmax is not None:
+                banc.limiter_vitesse(Vmax)
+
+        sortis = np.flatnonzero(distances > 0)
+        if len(sortis):
+            normales_sortis = normales[sortis]
+            banc.positions[sortis] -= distances[sortis, None] * normales_sortis
+            # Réflexion de la composante de vitesse dirigée vers la paroi
+            composantes = np.maximum(np.einsum('ij,ij->i', banc.vitesses[sortis], normales_sortis), 0)
+            banc.vitesses[sortis] -= 2 * composantes[:, None] * normales_sortis
+        profilage.compter('bassin.reflexions', len(sortis))
+
+
+BASSINS = ('boite', 'disque', 'cylindre', 'polygone', 'rochers')
+
+
+def bassin_predefini(nom, mins, maxs, **options):
+    """
+    Bassin prédéfini inscrit dans [mins, maxs] : 'boite', 'disque' (sphère en
+    3D), 'cylindre' (3D), 'polygone' (hexagone, prisme hexagonal en 3D) ou
+    'rochers' (boîte contenant trois rochers sphériques).
+    """
+    mins, maxs = np.asarray(mins, dtype=float), np.asarray(maxs, dtype=float)
+    centre, rayon = (mins + maxs) / 2, float(np.min(maxs - mins)) / 2
+    dimension = len(mins)
+    if nom == 'boite':
+        return Bassin(Boite(mins, maxs), **options)
+    if nom == 'disque':
+        return Bassin(Sphere(centre, rayon), **options)
+    if nom == 'cylindre':
+        if dimension != 3:
+            raise ValueError("le bassin 'cylindre' n'existe qu'en 3D")
+        return Bassin(cylindre(centre[:2], rayon, mins[2], maxs[2]), **options)
+    if nom == 'polygone':
+        angles = np.linspace(0, 2 * np.pi, 6, endpoint=False)
+        hexagone = Polygone(centre[:2] + rayon * np.column_stack((np.cos(angles), np.sin(angles))))
+        return Bassin(hexagone if dimension == 2 else Extrusion(hexagone, mins[2], maxs[2]), **options)
+    if nom == 'rochers':
+        fractions = np.array([[0.3, 0.3, 0.5], [0.7, 0.4, 0.3], [0.45, 0.75, 0.7]])[:, :dimension]
+        rochers = [Sphere(mins + f * (maxs - mins), 0.1 * 2 * rayon) for f in fractions]
+        return Bassin(Boite(mins, maxs), rochers, **options)
+    raise ValueError(f"bassin inconnu : {nom} (choix : {', '.join(BASSINS)})")
@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from banc import Banc
+from contamination import contaminer_banc
+from noyaux import choisir_backend
+from poisson import Poisson
+from poisson_3D import Poisson3D
+from simulation import MODELES, parametres_modele
+
+""" Banc d'essai des modèles
+
+Mesure le nombre de pas par seconde de chaque modèle (mouvement aléatoire,
+contamination de la Partie 2, règles d'Aoki, plus proches voisins, influence
+visuelle) en 2D avec Poisson et en 3D avec Poisson3D, pour plusieurs tailles
+de banc à la densité des scripts PartieN.py, ainsi que la mémoire de pointe
+allouée pendant un pas (tracemalloc).
+
+Le temps d'un pas à la taille suivante est extrapolé à partir des tailles
+déjà mesurées (exposant de croissance, 2 par défaut) : les configurations qui
+dépasseraient le budget de temps sont ignorées, ce qui rend visibles les
+chemins en O(N²). Les résultats sont comparés à la référence JSON
+bench_reference.json du dépôt (machine, versions et date enregistrées dans
+sa clé 'environnement'), ou à celle donnée par --reference. Après un
+changement volontaire des performances ou de machine, la référence se
+régénère avec --sortie :
+
+    python bench_modeles.py                              # comparaison à bench_reference.json
+    python bench_modeles.py --sortie bench_reference.json --sans-reference
+
+"""
+
+TAILLES = (50, 1000, 10000, 100000)
+# Référence enregistrée dans le dépôt, utilisée par défaut
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_reference.json')
+
+
+def preparer(modele, dimension, n, graine=0):
+    """Crée un banc à la densité du script du modèle et retourne la fonction qui avance d'un pas."""
+    p = parametres_modele(modele, dimension, n)
+    generateur = np.random.default_rng(graine)
+    mins, maxs = np.zeros(dimension), np.full(dimension, float(p['taille']))
+    banc = Banc.aleatoire(n, mins, maxs, p['Vmin'], p['Vmax_initiale'], generateur)
+    classe = Poisson if dimension == 2 else Poisson3D
+    poissons = classe.depuis_banc(banc)
+    rayons = (p.get('rayon_repulsion'), p.get('rayon_alignement'), p.get('rayon_attraction'))
+    forces = (p.get('k_repulsion'), p.get('k_alignement'), p.get('k_attraction'))
+    if modele == 'contamination':
+        banc.contamines[generateur.integers(n)] = True
+
+    def regle():
+        if modele == 'contamination':
+            contaminer_banc(banc, p['distance_contamination'], p['pas_de_variation_norme'],
+                            p['variation_norme'], generateur=generateur)
+        elif modele == 'aoki':
+            classe.appliquer_regles_aoki(poissons, *rayons, *forces, p['vitesse_max'])
+        elif modele == 'voisins' and dimension == 2:
+            classe.appliquer_regles_aoki_six_voisins(poissons, *rayons, *forces, p['vitesse_max'], p['nb_voisins'])
+        elif modele == 'voisins':
+            classe.appliquer_regles_aoki_six_voisins(poissons, *forces, p['vitesse_max'], p['nb_voisins'],
+                                                     rayon_repulsion=rayons[0], rayon_alignement=rayons[1],
+                                                     rayon_attraction=rayons[2])
+        elif modele == 'vision':
+            classe.appliquer_regles_influence_visuelle(poissons, p['vision_angle'], *rayons, *forces,
+                                                       p['vitesse_max'])
+
+    def etape():
+        regle()
+        banc.deplacer(p['dt'])
+        banc.verifier_bords(mins, maxs)
+
+    return etape
+
+
+def mesurer(etape, nb_pas, budget):
+    """Exécute au plus nb_pas pas (au moins un) dans la limite de budget secondes, retourne le temps moyen d'un pas."""
+    etape()  # échauffement (compilation numba, caches)
+    nb, debut = 0, time.perf_counter()
+    while nb < nb_pas:
+        etape()
+        nb += 1
+        if time.perf_counter() - debut > budget:
+            break
+    return (time.perf_counter() - debut) / nb, nb
+
+
+def memoire_pointe(etape):
+    """Mémoire de pointe (en octets) allouée pendant un pas."""
+    tracemalloc.start()
+    try:
+        etape()
+        courante, pointe = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pointe
+
+
+def executer(modeles=MODELES, dimensions=(2, 3), tailles=TAILLES, nb_pas=20, budget=10.0, afficher=True):
+    """Mesure chaque configuration et retourne la liste des résultats."""
+    resultats = []
+    for modele in modeles:
+        for dimension in dimensions:
+            mesures = []  # (n, secondes par pas) déjà mesurés pour ce modèle
+            for n in sorted(tailles):
+                resultat = {'modele': modele, 'dimension': dimension, 'n': n}
+                exposant = 2.0
+                if len(mesures) >= 2:
+                    (n0, t0), (n1, t1) = mesures[-2:]
+                    exposant = float(np.clip(np.log(t1 / t0) / np.log(n1 / n0), 1.0, 2.0))
+                estimation = mesures[-1][1] * (n / mesures[-1][0]) ** exposant if mesures else 0.0
+                if estimation > budget:
+                    resultat.update(ignore=True, estimation_par_pas=estimation)
+                else:
+                    etape = preparer(modele, dimension, n)
+                    secondes, nb = mesurer(etape, nb_pas, budget)
+                    resultat.update(ignore=False, pas_par_seconde=1 / secondes, ms_par_pas=1e3 * secondes,
+                                    nb_pas=nb, memoire_pointe=memoire_pointe(etape))
+                    if mesures:
+                        n0, t0 = mesures[-1]
+                        resultat['exposant'] = float(np.log(secondes / t0) / np.log(n / n0))
+                    mesures.append((n, secondes))
+                resultats.append(resultat)
+                if afficher:
+                    print(ligne(resultat), flush=True)
+    return resultats
+
+
+def ligne(resultat, reference=None):
+    """Ligne de tableau d'un résultat, avec le rapport à la référence s'il y en a une."""
+    debut = f"{resultat['modele']:<14}{resultat['dimension']:>2}{resultat['n']:>8}"
+    if resultat['ignore']:
+        return debut + f"{'ignoré (~' + format(resultat['estimation_par_pas'], '.3g') + ' s/pas)':>40}"
+    texte = (debut + f"{resultat['pas_par_seconde']:>12.1f}{resultat['ms_par_pas']:>11.3f}"
+             + (f"{resultat['exposant']:>7.2f}" if 'exposant' in resultat else f"{'':>7}")
+             + f"{resultat['memoire_pointe'] / 2**20:>10.1f}")
+    if reference is not None and not reference['ignore']:
+        texte += f"{resultat['pas_par_seconde'] / reference['pas_par_seconde']:>8.2f}"
+    return texte
+
+
+def comparer(resultats, reference, tolerance=0.25, seuil_ms=1.0):
+    """
+    Retourne les configurations plus lentes que la référence de plus de
+    tolerance (fraction du nombre de pas par seconde de référence). Les
+    configurations dont le pas de référence dure moins de seuil_ms
+    millisecondes ne sont pas comparées : leur mesure est dominée par le bruit.
+    """
+    par_cle = {(r['modele'], r['dimension'], r['n']): r for r in reference['resultats']}
+    regressions = []
+    for resultat in resultats:
+        ancien = par_cle.get((resultat['modele'], resultat['dimension'], resultat['n']))
+        if ancien is None or ancien['ignore'] or resultat['ignore'] or ancien['ms_par_pas'] < seuil_ms:
+            continue
+        if resultat['pas_par_seconde'] < (1 - tolerance) * ancien['pas_par_seconde']:
+            regressions.append((resultat, ancien))
+    return regressions
+
+
+def version(module):
+    """Version d'un paquet, None s'il n'est pas installé."""
+    try:
+        return __import__(module).__version__
+    except ImportError:
+        return None
+
+
+def processeur():
+    """Modèle du processeur (platform.processor, ou /proc/cpuinfo sous Linux), None s'il est inconnu."""
+    if platform.processor():
+        return platform.processor()
+    try:
+        with open('/proc/cpuinfo') as fichier:
+            for ligne_cpu in fichier:
+                if ligne_cpu.startswith('model name'):
+                    return ligne_cpu.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return None
+
+
+def environnement():
+    """Versions et machine, enregistrées avec les résultats."""
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'scipy': version('scipy'),
+            'numba': version('numba'), 'backend': choisir_backend(), 'processeurs': os.cpu_count(),
+            'machine': platform.machine(), 'processeur': processeur(),
+            'systeme': platform.platform(), 'date': time.strftime('%Y-%m-%d')}
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des modèles en 2D et en 3D")
+    parser.add_argument('--modeles', nargs='+', choices=MODELES, default=list(MODELES))
+    parser.add_argument('--dimensions', nargs='+', type=int, choices=(2, 3), default=[2, 3])
+    parser.add_argument('--tailles', nargs='+', type=int, default=list(TAILLES))
+    parser.add_argument('--pas', type=int, default=20, help='nombre maximal de pas mesurés par configuration')
+    parser.add_argument('--budget', type=float, default=10.0,
+                        help='temps maximal (s) par configuration ; au-delà les tailles suivantes sont ignorées')
+    parser.add_argument('--sortie', default=None, help='écrit les résultats dans ce fichier JSON')
+    parser.add_argument('--reference', default=REFERENCE,
+                        help='fichier JSON de référence à comparer (bench_reference.json par défaut)')
+    parser.add_argument('--sans-reference', action='store_true', help='mesure sans comparer à une référence')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='ralentissement relatif toléré par rapport à la référence')
+    parser.add_argument('--seuil-ms', type=float, default=1.0,
+                        help='durée de pas de référence (ms) en dessous de laquelle une configuration '
+                             "n'est pas comparée (bruit de mesure)")
+    args = parser.parse_args(arguments)
+
+    reference = None
+    if not args.sans_reference:
+        with open(args.reference) as fichier:
+            reference = json.load(fichier)
+        machine = reference.get('environnement', {})
+        print(f"référence : {args.reference} ({machine.get('machine')}, "
+              f"{machine.get('processeurs')} processeur(s), python {machine.get('python')}, "
+              f"numpy {machine.get('numpy')}, backend {machine.get('backend')}, {machine.get('date')})")
+
+    print(f"{'modèle':<14}{'D':>2}{'N':>8}{'pas/s':>12}{'ms/pas':>11}{'expo.':>7}{'Mo':>10}"
+          + (f"{'/réf.':>8}" if reference else ''))
+    resultats = executer(args.modeles, args.dimensions, args.tailles, args.pas, args.budget,
+                         afficher=reference is None)
+
+    if reference is not None:
+        par_cle = {(r['modele'], r['dimension'], r['n']): r for r in reference['resultats']}
+        for resultat in resultats:
+            print(ligne(resultat, par_cle.get((resultat['modele'], resultat['dimension'], resultat['n']))))
+    if args.sortie is not None:
+        with open(args.sortie, 'w') as fichier:
+            json.dump({'environnement': environnement(), 'resultats': resultats}, fichier, indent=2)
+
+    if reference is not None:
+        regressions = comparer(resultats, reference, args.tolerance, args.seuil_ms)
+        for resultat, ancien in regressions:
+            print(f"régression : {resultat['modele']} {resultat['dimension']}D N={resultat['n']} "
+                  f"{resultat['pas_par_seconde']:.1f} pas/s contre {ancien['pas_par_seconde']:.1f}")
+        if regressions:
+            sys.exit(1)
+    return resultats
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import time
+import numpy as np
+from voisinage import IndexKDTree, GrilleCellules
+
+""" Comparaison des index de voisinage
+
+Mesure le temps d'une recherche de paires à distance <= rayon avec le KDTree de
+scipy et avec la grille de cellules, à densité constante (nombre moyen de
+voisins fixé), pour plusieurs tailles de banc en 2D et en 3D. Le gain est le
+rapport des temps KDTree / grille : il reste inférieur à 1 dans tous les cas
+(la grille NumPy ne bat jamais le KDTree, voir voisinage.GrilleCellules).
+
+    python bench_voisinage.py
+
+"""
+
+rayon = 5.0
+voisins_moyens = [5, 20, 80]    # Nombre moyen de voisins dans le rayon
+tailles = [1000, 10000, 100000]
+repetitions = 5
+
+
+def chronometrer(index, positions):
+    """Retourne le meilleur temps (en ms) de recherche des paires sur plusieurs répétitions."""
+    meilleur = np.inf
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        index.paires(positions, rayon)
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return 1000 * meilleur
+
+
+if __name__ == '__main__':
+    generateur = np.random.default_rng(0)
+    print(f"{'D':>2} {'N':>7} {'voisins':>8} {'KDTree (ms)':>12} {'grille (ms)':>12} {'gain':>6}")
+    for dimension in (2, 3):
+        volume_boule = np.pi * rayon**2 if dimension == 2 else 4 / 3 * np.pi * rayon**3
+        for n in tailles:
+            for voisins in voisins_moyens:
+                # Côté du bassin donnant le nombre moyen de voisins voulu
+                cote = (n * volume_boule / voisins) ** (1 / dimension)
+                positions = generateur.uniform(0, cote, size=(n, dimension))
+                t_kdtree = chronometrer(IndexKDTree(), positions)
+                t_grille = chronometrer(GrilleCellules(), positions)
+                print(f"{dimension:>2} {n:>7} {voisins:>8} {t_kdtree:>12.2f} {t_grille:>12.2f} "
+                      f"{t_kdtree / t_grille:>6.2f}")
@@ -0,0 +1,238 @@
+import numpy as np
+import profilage
+from voisinage import choisir_index, image_minimale
+
+""" Propagation vectorisée de la contamination (effet Trafalgar)
+
+L'état de contamination est le tableau booléen banc.contamines. À chaque pas,
+les paires (sain, contaminé) à distance < distance_contamination sont obtenues
+en une seule requête spatiale ; chaque poisson sain touché prend la vitesse de
+son contaminateur (celui de plus petit indice) avec une variation aléatoire,
+comme Poisson.contaminer. Les poissons contaminés pendant un pas ne
+contaminent leurs voisins qu'au pas suivant.
+
+Une Cascade passée à contaminer_banc note qui a contaminé qui et quand dans
+quelques tableaux de longueur N (pas de contamination, contaminateur, distance
+au contaminateur et distance à la source de la cascade) : chaque pas n'écrit
+que les lignes des poissons nouvellement contaminés. Les fonctions
+generations, statistiques_branchement, rayon_front et vitesse_front
+dépouillent ces tableaux sans boucle Python, pour un banc seul ou pour R
+répliques de N poissons rangées à la suite (ensemble.py), avec une valeur par
+réplique.
+
+"""
+
+def vitesses_contaminees(vitesses_sources, dV, norm=True, generateur=None):
+    """
+    Retourne les vitesses données aux poissons contaminés à partir de celles de
+    leurs contaminateurs.
+
+    Si norm est vrai, chaque composante reçoit une variation uniforme dans
+    [-dV, dV]. Sinon la direction est conservée et la norme est multipliée par
+    (1 + u), u uniforme dans [-dV, dV].
+    """
+    generateur = np.random.default_rng(generateur)
+    if norm:
+        return vitesses_sources + generateur.uniform(-dV, dV, size=vitesses_sources.shape)
+    facteurs = 1 + generateur.uniform(-dV, dV, size=len(vitesses_sources))
+    return vitesses_sources * facteurs[:, None]
+
+
+class Cascade:
+    """
+    Registre de la cascade de contamination d'un banc. Pour chaque poisson :
+    pas_contamination est le pas où il a été contaminé (0 pour les contaminés
+    du départ, -1 s'il est sain), contaminateurs l'indice de son contaminateur
+    (-1 pour une source), distances la distance qui les séparait et
+    distances_source sa distance (image minimale si le banc est périodique) à
+    la source de sa cascade au même instant. sources donne cette source.
+    """
+
+    def __init__(self, contamines):
+        contamines = np.asarray(contamines, dtype=bool)
+        n = len(contamines)
+        # Nombre d'appels à contaminer_banc, c'est-à-dire de pas de propagation
+        self.pas = 0
+        self.pas_contamination = np.where(contamines, 0, -1).astype(np.int32)
+        self.contaminateurs = np.full(n, -1, dtype=np.int32)
+        self.sources = np.where(contamines, np.arange(n), -1).astype(np.int32)
+        self.distances = np.where(contamines, 0.0, np.nan)
+        self.distances_source = self.distances.copy()
+
+    def __len__(self):
+        return len(self.pas_contamination)
+
+    def noter(self, cibles, contaminateurs, distances, positions, boite=None):
+        """Note les poissons cibles contaminés au pas courant par les poissons contaminateurs."""
+        if len(cibles) == 0:
+            return
+        sources = self.sources[contaminateurs]
+        self.pas_contamination[cibles] = self.pas
+        self.contaminateurs[cibles] = contaminateurs
+        self.sources[cibles] = sources
+        self.distances[cibles] = distances
+        ecarts = image_minimale(positions[cibles] - positions[sources], boite)
+        self.distances_source[cibles] = np.sqrt(np.einsum('ij,ij->i', ecarts, ecarts))
+
+    def tableaux(self):
+        """Tableaux de la cascade à sauvegarder (np.savez)."""
+        return {'pas_contamination': self.pas_contamination, 'contaminateurs': self.contaminateurs,
+                'sources': self.sources, 'distances_contamination': self.distances,
+                'distances_source': self.distances_source}
+
+
+def generations(contaminateurs, pas_contamination):
+    """
+    Génération de chaque poisson dans l'arbre de transmission : 0 pour une
+    source, 1 pour les poissons qu'elle a contaminés, etc., -1 pour un poisson
+    sain. Les ancêtres sont remontés par sauts doublés (O(N log profondeur)).
+    """
+    n = len(contaminateurs)
+    parents = np.where(contaminateurs >= 0, contaminateurs, np.arange(n))
+    profondeurs = (contaminateurs >= 0).astype(np.intp)
+    while True:
+        # parents[i] est l'ancêtre de i situé profondeurs[i] générations plus haut
+        grands_parents = parents[parents]
+        if np.array_equal(grands_parents, parents):
+            break
+        profondeurs += profondeurs[parents]
+        parents = grands_parents
+    profondeurs[pas_contamination < 0] = -1
+    return profondeurs
+
+
+def statistiques_branchement(contaminateurs, pas_contamination, nb_repliques=1):
+    """
+    Statistiques de branchement de chaque réplique (tableaux de longueur R) :
+    taille de chaque génération (R, G), profondeur de l'arbre, nombre de
+    reproduction de chaque génération g (taille g + 1 / taille g, forme
+    (R, G - 1)), R0 (celui de la génération 0), moyenne et variance du nombre
+    de poissons contaminés par chaque poisson contaminé.
+    """
+    n_total = len(contaminateurs)
+    n = n_total // nb_repliques
+    repliques = np.arange(n_total) // max(n, 1)
+    numeros = generations(contaminateurs, pas_contamination)
+    contamines = numeros >= 0
+    nb_generations = int(numeros.max()) + 1 if contamines.any() else 1
+    tailles = np.bincount(repliques[contamines] * nb_generations + numeros[contamines],
+                          minlength=nb_repliques * nb_generations).reshape(nb_repliques, nb_generations)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reproduction = tailles[:, 1:] / tailles[:, :-1]
+    reproduction[tailles[:, :-1] == 0] = np.nan
+
+    # Nombre de poissons contaminés par chaque poisson
+    descendants = np.bincount(contaminateurs[contaminateurs >= 0], minlength=n_total)
+    nb_contamines = np.bincount(repliques[contamines], minlength=nb_repliques)
+    effectifs = np.maximum(nb_contamines, 1)
+    moyennes = np.bincount(repliques[contamines], descendants[contamines], nb_repliques) / effectifs
+    carres = np.bincount(repliques[contamines], descendants[contamines] ** 2.0, nb_repliques) / effectifs
+    return {'tailles_generations': tailles,
+            'profondeur': (nb_generations - 1) - np.argmax(tailles[:, ::-1] > 0, axis=1),
+            'nombre_reproduction': reproduction,
+            'R0': reproduction[:, 0] if nb_generations > 1 else np.zeros(nb_repliques),
+            'descendants_moyens': moyennes,
+            'descendants_variance': np.maximum(carres - moyennes ** 2, 0.0)}
+
+
+def rayon_front(pas_contamination, distances_source, nb_repliques=1, nb_pas=None):
+    """
+    Rayon du front de contamination de chaque réplique après chaque pas
+    (R, nb_pas + 1) : plus grande distance à la source d'un poisson contaminé
+    jusqu'à ce pas.
+    """
+    n = len(pas_contamination) // nb_repliques
+    contamines = pas_contamination >= 0
+    if nb_pas is None:
+        nb_pas = int(pas_contamination.max()) if contamines.any() else 0
+    rayons = np.zeros((nb_repliques, nb_pas + 1))
+    repliques = np.arange(len(pas_contamination)) // max(n, 1)
+    np.maximum.at(rayons, (repliques[contamines], pas_contamination[contamines]), distances_source[contamines])
+    return np.maximum.accumulate(rayons, axis=1)
+
+
+def vitesse_front(pas_contamination, distances_source, dt=1.0, nb_repliques=1):
+    """
+    Vitesse du front de contamination de chaque réplique : pente de la droite
+    des moindres carrés de la distance à la source en fonction de l'instant de
+    contamination, sur tous les poissons contaminés. NaN si tous les poissons
+    d'une réplique ont été contaminés au même pas.
+    """
+    n = len(pas_contamination) // nb_repliques
+    contamines = pas_contamination >= 0
+    repliques = (np.arange(len(pas_contamination)) // max(n, 1))[contamines]
+    t = pas_contamination[contamines] * dt
+    d = distances_source[contamines]
+
+    def somme(poids=None):
+        return np.bincount(repliques, poids, nb_repliques)
+
+    effectifs, st, sd = somme(), somme(t), somme(d)
+    variance = effectifs * somme(t * t) - st * st
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(variance > 0, (effectifs * somme(t * d) - st * sd) / variance, np.nan)
+
+
+def bilan_cascade(cascade, nb_repliques=1, dt=1.0):
+    """Métriques de la cascade, une valeur par réplique : vitesse du front, profondeur et branchement."""
+    statistiques = statistiques_branchement(cascade.contaminateurs, cascade.pas_contamination, nb_repliques)
+    return {'vitesse_front': vitesse_front(cascade.pas_contamination, cascade.distances_source, dt,
+                                           nb_repliques),
+            'profondeur': statistiques['profondeur'],
+            'R0': statistiques['R0'],
+            'descendants_moyens': statistiques['descendants_moyens'],
+            'descendants_variance': statistiques['descendants_variance']}
+
+
+def resume_cascade(cascade, nb_repliques=1, dt=1.0):
+    """Moyennes sur les répliques des métriques de bilan_cascade, en ignorant les valeurs non définies (NaN)."""
+    resultat = {}
+    for nom, valeurs in bilan_cascade(cascade, nb_repliques, dt).items():
+        definies = valeurs[np.isfinite(valeurs)]
+        resultat[nom] = float(definies.mean()) if len(definies) else float('nan')
+    return resultat
+
+
+@profilage.chronometre('contamination')
+def contaminer_banc(banc, distance_contamination, dV=0.05, norm=True, index=None, generateur=None, cascade=None):
+    """
+    Fait un pas de propagation de la contamination dans le banc. Si une
+    Cascade est donnée, son compteur de pas avance et les contaminations du
+    pas y sont notées.
+
+    Retourne les indices des poissons nouvellement contaminés, ceux de leurs
+    contaminateurs et la distance qui les séparait.
+    """
+    if cascade is not None:
+        cascade.pas += 1
+    contamines = banc.contamines
+    if contamines.all() or not contamines.any():
+        vide = np.empty(0, dtype=np.intp)
+        return vide, vide, np.empty(0)
+
+    i, j = choisir_index(index).paires(banc.positions, distance_contamination, banc.boite)
+    exposees = ~contamines[i] & contamines[j]
+    i, j = i[exposees], j[exposees]
+    ecarts = image_minimale(banc.positions[i] - banc.positions[j], banc.boite)
+    distances = np.sqrt(np.einsum('ij,ij->i', ecarts, ecarts))
+    proches = distances < distance_contamination
+    i, j, distances = i[proches], j[proches], distances[proches]
+
+    # Un seul contaminateur par poisson : celui de plus petit indice
+    ordre = np.lexsort((j, i))
+    i, j, distances = i[ordre], j[ordre], distances[ordre]
+    premiers = np.r_[True, i[1:] != i[:-1]] if len(i) else np.empty(0, dtype=bool)
+    cibles, sources, distances = i[premiers], j[premiers], distances[premiers]
+
+    vitesses_sources = banc.vitesses[sources]
+    nouvelles = vitesses_contaminees(vitesses_sources, dV, norm, generateur)
+    if not norm:
+        # Sans direction à conserver, le poisson garde sa propre vitesse
+        nulles = ~vitesses_sources.any(axis=1)
+        nouvelles[nulles] = banc.vitesses[cibles[nulles]]
+    banc.vitesses[cibles] = nouvelles
+    contamines[cibles] = True
+    if cascade is not None:
+        cascade.noter(cibles, sources, distances, banc.positions, banc.boite)
+    profilage.compter('contaminations', len(cibles))
+    return cibles, sources, distances
@@ -0,0 +1,67 @@
+import numpy as np
+from observables import distances_plus_proche_voisin, polarisation, rayon_cohesion
+from voisinage import choisir_index
+
+""" Ensembles de répliques indépendantes
+
+R répliques de N poissons sont rangées à la suite dans un même Banc de R * N
+lignes : banc.positions.reshape(R, N, D) donne la vue (R, N, D). Chaque règle
+fait alors un seul pas vectorisé pour toutes les répliques. Pour que les
+poissons de répliques différentes ne se voient jamais, IndexEnsemble ajoute aux
+positions une coordonnée supplémentaire égale au numéro de la réplique
+multiplié par une séparation supérieure au rayon de recherche. Dans un
+domaine périodique, cette coordonnée est elle aussi périodique, de période
+R fois la séparation : deux répliques restent toujours séparées.
+
+"""
+
+class IndexEnsemble:
+    """Index de voisinage qui ne relie que des poissons d'une même réplique."""
+
+    def __init__(self, nb_repliques, n, index=None):
+        self.nb_repliques, self.n = nb_repliques, n
+        self.index = choisir_index(index)
+        self._etendues = np.empty((0, 0))
+        # Numéro de réplique de chaque poisson
+        self.repliques = np.repeat(np.arange(nb_repliques), n)
+
+    def _etendre(self, positions, separation):
+        """Copie les positions dans un tampon (R * N, D + 1) dont la dernière colonne sépare les répliques."""
+        forme = (positions.shape[0], positions.shape[1] + 1)
+        if self._etendues.shape != forme:
+            self._etendues = np.empty(forme)
+        self._etendues[:, :-1] = positions
+        np.multiply(self.repliques, separation, out=self._etendues[:, -1])
+        return self._etendues
+
+    def _boite(self, boite, separation):
+        """Domaine périodique étendu à la coordonnée des répliques."""
+        return None if boite is None else np.append(boite, self.nb_repliques * separation)
+
+    def paires(self, positions, rayon, boite=None):
+        """Retourne les paires orientées (i, j) d'une même réplique à distance <= rayon."""
+        separation = max(2 * rayon, 1.0)
+        return self.index.paires(self._etendre(positions, separation), rayon, self._boite(boite, separation))
+
+    def k_voisins(self, positions, nb_voisins=6, rayon=np.inf, boite=None):
+        """Retourne les paires reliant chaque poisson à ses plus proches voisins de la même réplique."""
+        if not np.isfinite(rayon):
+            raise ValueError("un ensemble de répliques nécessite un rayon de recherche fini")
+        separation = max(2 * rayon, 1.0)
+        return self.index.k_voisins(self._etendre(positions, separation), nb_voisins, rayon,
+                                    self._boite(boite, separation))
+
+
+def observables_repliques(banc, nb_repliques):
+    """Retourne les observables de chaque réplique sous forme de tableaux de longueur R."""
+    n, dimension = len(banc) // nb_repliques, banc.dimension
+    positions = banc.positions.reshape(nb_repliques, n, dimension)
+    vitesses = banc.vitesses.reshape(nb_repliques, n, dimension)
+
+    distances = distances_plus_proche_voisin(banc.positions, banc.boite, nb_repliques)
+
+    return {'polarisation': polarisation(vitesses),
+            'rayon_cohesion': rayon_cohesion(positions),
+            'distance_plus_proche_voisin': distances.reshape(nb_repliques, n).mean(axis=1)
+                                            if n > 1 else np.zeros(nb_repliques),
+            'fraction_contaminee': banc.contamines.reshape(nb_repliques, n).mean(axis=1)}
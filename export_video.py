@@ -0,0 +1,214 @@
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
+from banc import Banc
+from rendu import RenduFleches, RenduPoints3D
+from trajectoire import LecteurTrajectoire
+
+""" Export vidéo d'une trajectoire enregistrée
+
+Rend les images d'une trajectoire écrite par trajectoire.EnregistreurTrajectoire
+hors écran (backend Agg, sans pyplot ni fenêtre) sur un ProcessPoolExecutor :
+chaque processus ouvre la trajectoire en mémoire paginée et dessine un
+intervalle contigu d'images. Le fond de la figure (axes, plans 3D, titres) est
+dessiné une seule fois par processus, puis seuls les poissons et le texte sont
+redessinés à chaque image, avec le style des scripts PartieN.py (flèches en 2D,
+points en 3D, leader rouge, contaminés verts, sains bleus).
+
+Si ffmpeg est installé, chaque processus envoie ses images brutes à un
+encodeur ffmpeg par un tube et les segments sont ensuite concaténés sans
+réencodage ; sinon les images sont écrites en séquence PNG numérotée.
+
+    python export_video.py DOSSIER film.mp4 --workers 8 --fps 30 --saut 2
+
+"""
+
+def intervalles(nb_images, nb_morceaux):
+    """Découpe range(nb_images) en au plus nb_morceaux intervalles contigus (debut, fin) de tailles voisines."""
+    bornes = np.linspace(0, nb_images, max(1, nb_morceaux) + 1).round().astype(int)
+    return [(int(debut), int(fin)) for debut, fin in zip(bornes[:-1], bornes[1:]) if fin > debut]
+
+
+class VueHorsEcran:
+
+    def __init__(self, lecteur, dpi=100, max_points=None):
+
+        self.lecteur = lecteur
+        image = lecteur.image(0)
+        self.banc = Banc(image['positions'], image['vitesses'])
+        mins, maxs = lecteur.limites()
+        leader = lecteur.leader()
+        titre = lecteur.parametres.get('modele', 'trajectoire')
+
+        if lecteur.dimension == 2:
+            self.fig = Figure(figsize=(10, 10), facecolor='white', dpi=dpi)
+            ax = self.fig.add_subplot(111)
+            ax.set_facecolor('white')
+            for spine in ax.spines.values():
+                spine.set_visible(True)
+                spine.set_color('black')
+            self.rendu = RenduFleches(ax, self.banc, leader=leader)
+            artiste = self.rendu.fleches
+        else:
+            self.fig = Figure(figsize=(10, 8), dpi=dpi)
+            ax = self.fig.add_subplot(111, projection='3d')
+            ax.set_zlim(mins[2], maxs[2])
+            ax.set_zlabel('Z')
+            self.rendu = RenduPoints3D(ax, self.banc, leader=leader, max_points=max_points)
+            artiste = self.rendu.points
+        ax.set_xlim(mins[0], maxs[0])
+        ax.set_ylim(mins[1], maxs[1])
+        ax.set_xlabel('X')
+        ax.set_ylabel('Y')
+        ax.set_title(f"{titre} ({lecteur.dimension}D)")
+        self.texte = self.fig.text(0.02, 0.97, '')
+
+        # Le fond est dessiné une fois ; poissons et texte sont redessinés par-dessus à chaque image
+        self.artistes = (artiste, self.texte)
+        for artiste in self.artistes:
+            artiste.set_animated(True)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.canvas.draw()
+        self._fond = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.largeur, self.hauteur = self.canvas.get_width_height()
+
+    def dessiner(self, t):
+        """Dessine l'image t de la trajectoire et retourne ses pixels RGBA (hauteur, largeur, 4)."""
+        image = self.lecteur.image(t)
+        np.copyto(self.banc.positions, image['positions'])
+        np.copyto(self.banc.vitesses, image['vitesses'])
+        np.copyto(self.banc.contamines, image['contamines'])
+        self.rendu.mettre_a_jour()
+        nb_contamines = int(np.count_nonzero(self.banc.contamines))
+        self.texte.set_text(f"Pas {int(image['pas'])}  Poissons contaminés: {nb_contamines}/{len(self.banc)}")
+
+        self.canvas.restore_region(self._fond)
+        for artiste in self.artistes:
+            self.fig.draw_artist(artiste)
+        return np.asarray(self.canvas.buffer_rgba())
+
+
+def commande_ffmpeg(ffmpeg, largeur, hauteur, fps, sortie):
+    """Commande ffmpeg qui lit des images RGBA brutes sur l'entrée standard et les encode en H.264."""
+    return [ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{largeur}x{hauteur}', '-r', str(fps), '-i', '-',
+            # H.264 en yuv420p impose des dimensions paires
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-c:v', 'libx264', '-pix_fmt', 'yuv420p', sortie]
+
+
+def rendre_intervalle(dossier, images, premier, sortie, fps=30, dpi=100, max_points=None, ffmpeg=None):
+    """
+    Rend les images (indices dans la trajectoire) d'un intervalle. Avec ffmpeg,
+    sortie est le fichier vidéo du segment ; sinon c'est le dossier de la
+    séquence PNG, où l'image k de l'export s'appelle image_{premier + k}.png.
+    """
+    vue = VueHorsEcran(LecteurTrajectoire(dossier), dpi, max_points)
+    if ffmpeg is None:
+        for k, t in enumerate(images):
+            imsave(os.path.join(sortie, f'image_{premier + k:06d}.png'), vue.dessiner(t))
+        return len(images)
+
+    processus = subprocess.Popen(commande_ffmpeg(ffmpeg, vue.largeur, vue.hauteur, fps, sortie),
+                                 stdin=subprocess.PIPE)
+    try:
+        for t in images:
+            processus.stdin.write(vue.dessiner(t).tobytes())
+    finally:
+        processus.stdin.close()
+        code = processus.wait()
+    if code != 0:
+        raise RuntimeError(f"ffmpeg a échoué (code {code}) pour {sortie}")
+    return len(images)
+
+
+def concatener(ffmpeg, segments, sortie):
+    """Concatène des segments vidéo de mêmes paramètres sans réencodage."""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as liste:
+        for segment in segments:
+            liste.write(f"file '{os.path.abspath(segment)}'\n")
+    try:
+        subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                        '-i', liste.name, '-c', 'copy', sortie], check=True)
+    finally:
+        os.remove(liste.name)
+
+
+def exporter(dossier, sortie, workers=None, fps=30, dpi=100, debut=0, fin=None, saut=1,
+             max_points=None, encodeur=None):
+    """
+    Exporte les images debut:fin:saut de la trajectoire. encodeur vaut
+    'ffmpeg', 'png' ou None (ffmpeg s'il est installé, PNG sinon). Retourne
+    le chemin écrit : la vidéo, ou le dossier de la séquence PNG (sortie sans
+    extension si sortie est un nom de fichier vidéo).
+    """
+    images = range(len(LecteurTrajectoire(dossier)))[debut:fin:saut]
+    ffmpeg = shutil.which('ffmpeg') if encodeur != 'png' else None
+    if encodeur == 'ffmpeg' and ffmpeg is None:
+        raise RuntimeError("ffmpeg est introuvable ; utiliser encodeur='png'")
+    morceaux = intervalles(len(images), workers or os.cpu_count() or 1)
+
+    if ffmpeg is not None:
+        dossier_segments = tempfile.mkdtemp(prefix='segments_', dir=os.path.dirname(os.path.abspath(sortie)))
+        cibles = [os.path.join(dossier_segments, f'segment_{k:04d}.mp4') for k in range(len(morceaux))]
+    else:
+        racine, extension = os.path.splitext(sortie)
+        sortie = racine if extension else sortie
+        os.makedirs(sortie, exist_ok=True)
+        cibles = [sortie] * len(morceaux)
+
+    taches = [(dossier, images[a:b], a, cible, fps, dpi, max_points, ffmpeg)
+              for (a, b), cible in zip(morceaux, cibles)]
+    if len(taches) <= 1:
+        for tache in taches:
+            rendre_intervalle(*tache)
+    else:
+        with ProcessPoolExecutor(max_workers=len(taches)) as executeur:
+            for resultat in [executeur.submit(rendre_intervalle, *tache) for tache in taches]:
+                resultat.result()
+
+    if ffmpeg is not None:
+        try:
+            if len(cibles) == 1:
+                shutil.move(cibles[0], sortie)
+            elif cibles:
+                concatener(ffmpeg, cibles, sortie)
+        finally:
+            shutil.rmtree(dossier_segments)
+    return sortie
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Export vidéo d'une trajectoire enregistrée")
+    parser.add_argument('dossier', help='dossier de la trajectoire')
+    parser.add_argument('sortie', help='fichier vidéo (ffmpeg) ou dossier de la séquence PNG')
+    parser.add_argument('--workers', type=int, default=None, help='nombre de processus (tous les cœurs par défaut)')
+    parser.add_argument('--fps', type=int, default=30, help='images par seconde de la vidéo')
+    parser.add_argument('--dpi', type=int, default=100, help='résolution des images')
+    parser.add_argument('--debut', type=int, default=0, help='première image exportée')
+    parser.add_argument('--fin', type=int, default=None, help='image de fin (exclue)')
+    parser.add_argument('--saut', type=int, default=1, help='exporte une image sur SAUT')
+    parser.add_argument('--max-points', type=int, default=None,
+                        help='nombre maximal de poissons dessinés en 3D')
+    parser.add_argument('--encodeur', choices=('ffmpeg', 'png'), default=None,
+                        help='ffmpeg (par défaut s\'il est installé) ou séquence PNG')
+    args = parser.parse_args(arguments)
+
+    debut = time.perf_counter()
+    chemin = exporter(args.dossier, args.sortie, args.workers, args.fps, args.dpi, args.debut, args.fin,
+                      args.saut, args.max_points, args.encodeur)
+    nb_images = len(range(len(LecteurTrajectoire(args.dossier)))[args.debut:args.fin:args.saut])
+    duree = time.perf_counter() - debut
+    print(f"{nb_images} images exportées dans {chemin} en {duree:.1f} s ({nb_images / duree:.1f} images/s)")
+    return chemin
+
+
+if __name__ == '__main__':
+    main()
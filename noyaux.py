@@ -0,0 +1,280 @@
+import itertools
+import numpy as np
+import profilage
+from banc import Banc
+from ensemble import IndexEnsemble
+from voisinage import replier
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+""" Noyaux compilés (numba) des règles d'Aoki et d'influence visuelle
+
+Backend optionnel utilisé lorsque numba est importable. Un pas complet tient
+en une seule boucle parallèle (prange) sur les poissons : chaque poisson
+parcourt les cellules voisines de la sienne dans une grille de cellules,
+classe chaque voisin par zone (répulsion, alignement, attraction), applique le
+test du cône de vision si demandé, accumule ses forces dans des scalaires puis
+met à jour sa vitesse et, si dt est donné, sa position avec rebond sur les
+bords. Aucun tableau n'est alloué par paire ; les nouvelles positions et
+vitesses sont écrites dans des tampons séparés pour que la mise à jour reste
+simultanée, comme avec le backend NumPy (regles.py). La distance au plus
+proche voisin est notée dans banc.plus_proche s'il est alloué. Dans un banc
+périodique (banc.boite), la grille se referme sur elle-même, les écarts
+suivent l'image minimale et les positions sont repliées au lieu de rebondir.
+
+"""
+
+BACKENDS = ('numpy', 'numba')
+NUMBA_DISPONIBLE = njit is not None
+
+
+def choisir_backend(backend=None, index=None, rayon_attraction=None):
+    """
+    Retourne 'numba' ou 'numpy'. Le noyau numba cherche ses voisins dans sa
+    propre grille de cellules et n'accepte qu'un rayon d'attraction fini : None
+    choisit numba s'il est installé, si l'index est None ou un
+    ensemble.IndexEnsemble (dont seuls les numéros de réplique servent) et si
+    rayon_attraction est fini, numpy sinon. backend='numba' avec un autre index
+    ou un rayon infini lève ValueError.
+    """
+    compatible = index is None or isinstance(index, IndexEnsemble)
+    rayon_fini = rayon_attraction is None or np.isfinite(rayon_attraction)
+    if backend is None:
+        return 'numba' if NUMBA_DISPONIBLE and compatible and rayon_fini else 'numpy'
+    if backend not in BACKENDS:
+        raise ValueError(f"backend inconnu : {backend!r} (choix : {', '.join(BACKENDS)})")
+    if backend == 'numba':
+        if not NUMBA_DISPONIBLE:
+            raise ImportError("le backend 'numba' nécessite le paquet numba (pip install numba)")
+        if not compatible:
+            nom = index if isinstance(index, str) else type(index).__name__
+            raise ValueError(f"le backend numba construit sa propre grille de cellules et n'utilise pas "
+                             f"l'index {nom!r} : utiliser backend='numpy'")
+        if not rayon_fini:
+            raise ValueError("le backend numba nécessite un rayon d'attraction fini")
+    return backend
+
+
+if NUMBA_DISPONIBLE:
+
+    @njit(cache=True)
+    def _trier_par_cellule(cellules, nb_cellules):
+        """Tri par comptage : ordre des poissons par cellule et début de chaque cellule."""
+        debuts = np.zeros(nb_cellules + 1, dtype=np.intp)
+        for c in cellules:
+            debuts[c + 1] += 1
+        for c in range(nb_cellules):
+            debuts[c + 1] += debuts[c]
+        curseurs = debuts[:-1].copy()
+        ordre = np.empty(len(cellules), dtype=np.intp)
+        for i in range(len(cellules)):
+            c = cellules[i]
+            ordre[curseurs[c]] = i
+            curseurs[c] += 1
+        return ordre, debuts
+
+    @njit(parallel=True, cache=True)
+    def _pas(positions, vitesses, coords, repliques, pas_grille, forme, decalages, ordre, debuts,
+             rayon_repulsion, rayon_alignement, rayon_attraction, k_repulsion, k_alignement, k_attraction,
+             Vmax, vision, cos_demi_angle, deplacer, dt, mins, maxs, periodique, boite,
+             noter, plus_proche, nouvelles_positions, nouvelles_vitesses):
+        n, dimension = positions.shape
+        rayon_attraction2 = rayon_attraction * rayon_attraction
+        for i in prange(n):
+            px, py = positions[i, 0], positions[i, 1]
+            vx, vy = vitesses[i, 0], vitesses[i, 1]
+            pz = positions[i, 2] if dimension == 3 else 0.0
+            vz = vitesses[i, 2] if dimension == 3 else 0.0
+            norme_v = np.sqrt(vx * vx + vy * vy + vz * vz)
+            fx = fy = fz = 0.0
+            ax = ay = az = 0.0
+            nb_alignement = 0
+            d2_min = np.inf
+
+            for decalage in range(decalages.shape[0]):
+                # Cellule voisine (les répliques occupent des grilles disjointes)
+                cellule = repliques[i] * pas_grille[dimension]
+                dehors = False
+                for axe in range(dimension):
+                    c = coords[i, axe] + decalages[decalage, axe]
+                    if periodique:
+                        c %= forme[axe]
+                    elif c < 0 or c >= forme[axe]:
+                        dehors = True
+                        break
+                    cellule += c * pas_grille[axe]
+                if dehors:
+                    continue
+
+                for rang in range(debuts[cellule], debuts[cellule + 1]):
+                    j = ordre[rang]
+                    if j == i:
+                        continue
+                    ex, ey = px - positions[j, 0], py - positions[j, 1]
+                    ez = pz - positions[j, 2] if dimension == 3 else 0.0
+                    if periodique:
+                        # Image minimale
+                        ex -= boite[0] * np.floor(ex / boite[0] + 0.5)
+                        ey -= boite[1] * np.floor(ey / boite[1] + 0.5)
+                        if dimension == 3:
+                            ez -= boite[2] * np.floor(ez / boite[2] + 0.5)
+                    d2 = ex * ex + ey * ey + ez * ez
+                    if d2 >= rayon_attraction2:
+                        continue
+                    d2_min = min(d2_min, d2)
+                    d = np.sqrt(d2)
+                    if vision:
+                        # Le voisin doit être dans le cône de vision du poisson i
+                        if d == 0.0 or norme_v == 0.0:
+                            continue
+                        if -(vx * ex + vy * ey + vz * ez) < cos_demi_angle * norme_v * d:
+                            continue
+                    if d < rayon_repulsion:
+                        if d > 0.0:
+                            fx += k_repulsion * ex / d
+                            fy += k_repulsion * ey / d
+                            fz += k_repulsion * ez / d
+                    elif d < rayon_alignement:
+                        ax += vitesses[j, 0]
+                        ay += vitesses[j, 1]
+                        if dimension == 3:
+                            az += vitesses[j, 2]
+                        nb_alignement += 1
+                    elif d > 0.0:
+                        fx -= k_attraction * ex / d
+                        fy -= k_attraction * ey / d
+                        fz -= k_attraction * ez / d
+
+            if noter:
+                plus_proche[i] = np.sqrt(d2_min)
+            if nb_alignement > 0:
+                fx += k_alignement * ax / nb_alignement
+                fy += k_alignement * ay / nb_alignement
+                fz += k_alignement * az / nb_alignement
+            vx, vy, vz = vx + fx, vy + fy, vz + fz
+            norme = np.sqrt(vx * vx + vy * vy + vz * vz)
+            if norme > Vmax:
+                vx, vy, vz = vx * (Vmax / norme), vy * (Vmax / norme), vz * (Vmax / norme)
+            nouvelles_vitesses[i, 0], nouvelles_vitesses[i, 1] = vx, vy
+            if dimension == 3:
+                nouvelles_vitesses[i, 2] = vz
+
+            if deplacer:
+                # Déplacement puis rebond sur les bords ou repliement, comme Banc.verifier_bords
+                for axe in range(dimension):
+                    p = positions[i, axe] + nouvelles_vitesses[i, axe] * dt
+                    if periodique:
+                        p = (p - mins[axe]) % boite[axe]
+                        if p >= boite[axe]:
+                            p = 0.0
+                        p += mins[axe]
+                    elif p < mins[axe]:
+                        p = mins[axe]
+                        nouvelles_vitesses[i, axe] = -nouvelles_vitesses[i, axe]
+                    elif p > maxs[axe]:
+                        p = maxs[axe]
+                        nouvelles_vitesses[i, axe] = -nouvelles_vitesses[i, axe]
+                    nouvelles_positions[i, axe] = p
+
+
+def prechauffer(dimension=2):
+    """
+    Compile le noyau (ou le charge depuis le cache de numba) sur un banc de deux
+    poissons, pour que le temps de compilation ne soit pas compté dans le
+    premier pas chronométré d'une simulation. Tous les appels de pas_aoki ont
+    la même signature de types : un seul appel suffit.
+    """
+    if not NUMBA_DISPONIBLE:
+        return
+    banc = Banc(np.linspace(0.0, 1.0, 2 * dimension).reshape(2, dimension), np.zeros((2, dimension)))
+    pas_aoki(banc, dt=0.0, mins=np.zeros(dimension), maxs=np.ones(dimension))
+
+
+def _grille(positions, rayon, nb_repliques, boite=None):
+    """
+    Coordonnées de cellule (N, D) de côté au moins rayon, forme de la grille et
+    pas de la numérotation des cellules (le dernier sépare les répliques). Les
+    cellules sont agrandies si la grille dépasse max(4 N, 1024) cellules. Dans
+    un domaine périodique, les cellules pavent exactement la boîte.
+    """
+    if not np.isfinite(rayon):
+        raise ValueError("le backend numba nécessite un rayon d'attraction fini")
+    n, dimension = positions.shape
+    if boite is None:
+        origine = positions.min(axis=0)
+        etendue = positions.max(axis=0) - origine
+    else:
+        positions, origine, etendue = replier(positions, boite), 0.0, boite
+    limite = max(4 * n, 1024) // nb_repliques
+    taille = max(rayon, 1e-12)
+
+    def dimensions(taille):
+        if boite is None:
+            return np.floor(etendue / taille).astype(np.intp) + 1
+        return np.maximum(np.floor(boite / taille), 1).astype(np.intp)
+
+    forme = dimensions(taille)
+    while np.prod(forme.astype(float)) > limite:
+        taille *= 1.5
+        forme = dimensions(taille)
+    tailles = np.full(dimension, taille) if boite is None else boite / forme
+    coords = np.minimum(np.floor((positions - origine) / tailles).astype(np.intp), forme - 1)
+    pas_grille = np.ones(dimension + 1, dtype=np.intp)
+    for axe in range(dimension - 2, -1, -1):
+        pas_grille[axe] = pas_grille[axe + 1] * forme[axe + 1]
+    pas_grille[dimension] = pas_grille[0] * forme[0]
+    return coords, forme, pas_grille
+
+
+@profilage.chronometre('noyau')
+def pas_aoki(banc, rayon_repulsion=1.0, rayon_alignement=2.5, rayon_attraction=5.0,
+             k_repulsion=0.05, k_alignement=0.03, k_attraction=0.01, Vmax=1.5,
+             vision_angle=None, repliques=None, dt=None, mins=None, maxs=None):
+    """
+    Applique les règles d'Aoki au banc avec le noyau compilé, en restreignant
+    les voisins au cône de vision si vision_angle est donné. repliques donne le
+    numéro de réplique de chaque poisson (ensemble.IndexEnsemble) : seuls les
+    poissons d'une même réplique interagissent. Si dt est donné, les poissons
+    sont aussi déplacés et rebondissent sur les bords [mins, maxs] (ou y sont
+    repliés si le banc est périodique) dans la même passe.
+    """
+    n, dimension = banc.positions.shape
+    if n == 0:
+        return
+    if repliques is None:
+        repliques = np.zeros(n, dtype=np.intp)
+    nb_repliques = int(repliques.max()) + 1
+    periodique = banc.boite is not None
+    coords, forme, pas_grille = _grille(banc.positions, rayon_attraction, nb_repliques, banc.boite)
+    cellules = repliques * pas_grille[dimension] + coords @ pas_grille[:dimension]
+    ordre, debuts = _trier_par_cellule(cellules, nb_repliques * int(pas_grille[dimension]))
+    if periodique:
+        # Décalages distincts modulo la forme : une cellule voisine n'est jamais parcourue deux fois
+        decalages = np.array(list(itertools.product(*(np.unique(np.mod((-1, 0, 1), f)) for f in forme))),
+                             dtype=np.intp)
+    else:
+        decalages = np.array(list(itertools.product((-1, 0, 1), repeat=dimension)), dtype=np.intp)
+    boite = banc.boite if periodique else np.zeros(dimension)
+
+    deplacer = dt is not None
+    mins = np.zeros(dimension) if mins is None else np.asarray(mins, dtype=float)
+    maxs = np.zeros(dimension) if maxs is None else np.asarray(maxs, dtype=float)
+    vision = vision_angle is not None
+    cos_demi_angle = np.cos(np.deg2rad(vision_angle / 2)) if vision else 0.0
+    nouvelles_positions = np.empty_like(banc.positions) if deplacer else banc.positions
+    nouvelles_vitesses = np.empty_like(banc.vitesses)
+    noter = banc.plus_proche is not None
+    plus_proche = banc.plus_proche if noter else np.empty(0)
+
+    _pas(banc.positions, banc.vitesses, coords, repliques.astype(np.intp, copy=False), pas_grille, forme,
+         decalages, ordre, debuts, float(rayon_repulsion), float(rayon_alignement), float(rayon_attraction),
+         float(k_repulsion), float(k_alignement), float(k_attraction), float(Vmax), vision, cos_demi_angle,
+         deplacer, float(dt or 0.0), mins, maxs, periodique, np.asarray(boite, dtype=float),
+         noter, plus_proche, nouvelles_positions, nouvelles_vitesses)
+
+    banc.vitesses[...] = nouvelles_vitesses
+    if deplacer:
+        banc.positions[...] = nouvelles_positions
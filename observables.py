@@ -0,0 +1,315 @@
+import numpy as np
+from scipy.spatial import KDTree
+from voisinage import replier
+
+""" Observables d'ordre collectif
+
+Mesures calculées directement à partir des tableaux d'état d'un banc
+(positions et vitesses de forme (N, D)). polarisation, ordre_rotation,
+vitesse_centre_masse, rayon_cohesion et fraction_contaminee acceptent aussi
+des tableaux (R, N, D) (ou (R, N)) et rendent alors une valeur par réplique.
+
+SuiviObservables mesure toutes les observables tous les k pas pendant la
+simulation et n'en garde que des moyennes et variances courantes (algorithme
+de Welford) et un histogramme des distances au plus proche voisin : la
+mémoire reste constante quelle que soit la durée de la simulation, sans
+enregistrer de trajectoire. Les distances au plus proche voisin sont reprises
+des paires déjà trouvées par les règles d'Aoki et de vision (banc.plus_proche,
+mesuré au début du dernier pas) ; une requête KDTree n'est faite que pour les
+poissons sans voisin dans le rayon des règles, ou si aucune règle ne les a
+notées.
+
+"""
+
+OBSERVABLES = ('polarisation', 'ordre_rotation', 'vitesse_centre_masse', 'rayon_cohesion',
+               'distance_plus_proche_voisin', 'fraction_contaminee')
+
+
+def _scalaire(valeur):
+    """Rend un float pour un banc seul, un tableau pour des répliques."""
+    return float(valeur) if np.ndim(valeur) == 0 else valeur
+
+
+def _unitaires(vecteurs):
+    """Vecteurs (..., N, D) normalisés ; un vecteur nul reste nul."""
+    normes = np.sqrt(np.einsum('...i,...i->...', vecteurs, vecteurs))
+    return vecteurs / np.where(normes > 0, normes, 1)[..., None]
+
+
+def polarisation(vitesses):
+    """Norme de la moyenne des directions de nage : 1 si tous les poissons sont alignés, ~0 si désordre."""
+    normes = np.sqrt(np.einsum('...i,...i->...', vitesses, vitesses))
+    mobiles = normes > 0
+    directions = vitesses / np.where(mobiles, normes, 1)[..., None]
+    somme = directions.sum(axis=-2)
+    nb_mobiles = np.maximum(mobiles.sum(axis=-1), 1)
+    return _scalaire(np.linalg.norm(somme, axis=-1) / nb_mobiles)
+
+
+def ordre_rotation(positions, vitesses):
+    """
+    Ordre de rotation (milling) : norme de la moyenne des moments u_i x d_i, où
+    u_i est la direction du centre de masse au poisson et d_i sa direction de
+    nage. Vaut 1 si le banc tourne en anneau autour de son centre, ~0 sinon.
+    """
+    if positions.shape[-2] == 0:
+        return _scalaire(np.zeros(positions.shape[:-2]))
+    rayons = _unitaires(positions - positions.mean(axis=-2, keepdims=True))
+    directions = _unitaires(vitesses)
+    if positions.shape[-1] == 2:
+        moments = rayons[..., 0] * directions[..., 1] - rayons[..., 1] * directions[..., 0]
+        return _scalaire(np.abs(moments.mean(axis=-1)))
+    return _scalaire(np.linalg.norm(np.cross(rayons, directions).mean(axis=-2), axis=-1))
+
+
+def vitesse_centre_masse(vitesses):
+    """Norme de la vitesse du centre de masse du banc."""
+    if vitesses.shape[-2] == 0:
+        return _scalaire(np.zeros(vitesses.shape[:-2]))
+    return _scalaire(np.linalg.norm(vitesses.mean(axis=-2), axis=-1))
+
+
+def rayon_cohesion(positions):
+    """Distance moyenne des poissons au centre de masse du banc."""
+    if positions.shape[-2] == 0:
+        return _scalaire(np.zeros(positions.shape[:-2]))
+    ecarts = positions - positions.mean(axis=-2, keepdims=True)
+    return _scalaire(np.sqrt(np.einsum('...i,...i->...', ecarts, ecarts)).mean(axis=-1))
+
+
+def fraction_contaminee(contamines):
+    """Proportion de poissons contaminés."""
+    if contamines.shape[-1] == 0:
+        return _scalaire(np.zeros(contamines.shape[:-1]))
+    return _scalaire(contamines.mean(axis=-1))
+
+
+def distances_plus_proche_voisin(positions, boite=None, nb_repliques=1, indices=None):
+    """
+    Distance de chaque poisson (ou des seuls poissons indices) à son plus
+    proche voisin de la même réplique, selon l'image minimale si boite est donnée.
+    """
+    n = len(positions) // nb_repliques
+    if n < 2:
+        return np.empty(0)
+    if nb_repliques > 1:
+        # Une coordonnée supplémentaire éloigne les répliques de plus que l'étendue d'un banc
+        etendue = (np.ptp(positions, axis=0).sum() if boite is None else np.sum(boite)) + 1.0
+        positions = np.column_stack((positions, np.repeat(np.arange(nb_repliques) * 2 * etendue, n)))
+        if boite is not None:
+            boite = np.append(boite, nb_repliques * 2 * etendue)
+    if boite is None:
+        arbre = KDTree(positions)
+    else:
+        positions = replier(positions, boite)
+        arbre = KDTree(positions, boxsize=boite)
+    distances, _ = arbre.query(positions if indices is None else positions[indices], k=2, workers=-1)
+    return distances[:, 1]
+
+
+def resume(banc):
+    """Retourne les observables principales du banc dans un dictionnaire."""
+    distances = distances_plus_proche_voisin(banc.positions)
+    return {'polarisation': polarisation(banc.vitesses),
+            'rayon_cohesion': rayon_cohesion(banc.positions),
+            'distance_plus_proche_voisin': float(distances.mean()) if len(distances) else 0.0}
+
+
+class MoyenneCourante:
+    """
+    Moyenne et variance courantes (algorithme de Welford) en mémoire constante.
+    Les valeurs ajoutées peuvent être des tableaux (une statistique par réplique).
+    """
+
+    def __init__(self):
+
+        self.nb = 0
+        self.moyenne = 0.0
+        self._m2 = 0.0
+
+    def ajouter(self, valeur):
+        """Ajoute une mesure."""
+        self.nb += 1
+        delta = valeur - self.moyenne
+        self.moyenne = self.moyenne + delta / self.nb
+        self._m2 = self._m2 + delta * (valeur - self.moyenne)
+
+    def ajouter_lot(self, valeurs):
+        """Ajoute un lot de mesures scalaires en fusionnant ses moments avec les courants (Chan et al.)."""
+        nb = len(valeurs)
+        if nb == 0:
+            return
+        moyenne = float(np.mean(valeurs))
+        m2 = float(np.sum((valeurs - moyenne) ** 2))
+        total = self.nb + nb
+        delta = moyenne - self.moyenne
+        self.moyenne = self.moyenne + delta * nb / total
+        self._m2 = self._m2 + m2 + delta ** 2 * self.nb * nb / total
+        self.nb = total
+
+    @property
+    def variance(self):
+        """Variance non biaisée des mesures (0 avant deux mesures)."""
+        return self._m2 / (self.nb - 1) if self.nb > 1 else self._m2 * 0.0
+
+    @property
+    def ecart_type(self):
+        return np.sqrt(self.variance)
+
+
+class HistogrammeCourant:
+    """Histogramme cumulé sur des classes fixes, avec le nombre de valeurs au-delà de la dernière borne."""
+
+    def __init__(self, bornes):
+
+        self.bornes = np.asarray(bornes, dtype=float)
+        self.comptes = np.zeros(len(self.bornes) - 1, dtype=np.int64)
+        self.au_dela = 0
+
+    def ajouter(self, valeurs):
+        classes = np.searchsorted(self.bornes, valeurs, side='right') - 1
+        dedans = (classes >= 0) & (classes < len(self.comptes))
+        self.comptes += np.bincount(classes[dedans], minlength=len(self.comptes))
+        self.au_dela += int(np.count_nonzero(valeurs >= self.bornes[-1]))
+
+
+class SuiviObservables:
+
+    def __init__(self, tous_les=1, nb_repliques=1, bornes_distances=None, nb_classes=40):
+        """
+        Mesure les observables tous les tous_les pas. bornes_distances sont les
+        bornes de l'histogramme des distances au plus proche voisin ; par
+        défaut nb_classes classes de 0 à trois fois la distance moyenne de la
+        première mesure.
+        """
+        self.tous_les, self.nb_repliques, self.nb_classes = tous_les, nb_repliques, nb_classes
+        self.statistiques = {nom: MoyenneCourante() for nom in OBSERVABLES}
+        # Toutes les distances au plus proche voisin, poissons et mesures confondus
+        self.distances = MoyenneCourante()
+        self.histogramme = None if bornes_distances is None else HistogrammeCourant(bornes_distances)
+        self.dernieres = {}
+        self.nb_mesures = self.nb_reutilisations = 0
+        self._distances = self._notees = None
+
+    def distances_plus_proches(self, banc):
+        """
+        Distances au plus proche voisin de chaque poisson, reprises de
+        banc.plus_proche si les règles les y ont notées depuis la dernière mesure.
+        """
+        notees = banc.plus_proche
+        if len(banc) // self.nb_repliques < 2:
+            distances = np.empty(0)
+        elif notees is None or len(notees) != len(banc) or np.isnan(notees).any():
+            distances = distances_plus_proche_voisin(banc.positions, banc.boite, self.nb_repliques)
+        else:
+            if self._distances is None or len(self._distances) != len(banc):
+                self._distances = np.empty(len(banc))
+            distances = self._distances
+            np.copyto(distances, notees)
+            # Poissons sans voisin dans le rayon des règles : requête pour eux seuls
+            isoles = np.flatnonzero(np.isinf(distances))
+            if len(isoles):
+                distances[isoles] = distances_plus_proche_voisin(banc.positions, banc.boite,
+                                                                 self.nb_repliques, isoles)
+            self.nb_reutilisations += 1
+        if notees is not None:
+            notees.fill(np.nan)
+        return distances
+
+    def _demander_distances(self, banc, demander):
+        """Alloue banc.plus_proche pour que les règles y notent les distances du prochain pas, ou le retire."""
+        if not demander:
+            banc.plus_proche = None
+            return
+        if self._notees is None or len(self._notees) != len(banc):
+            self._notees = np.full(len(banc), np.nan)
+        banc.plus_proche = self._notees
+
+    def mesurer(self, banc):
+        """Mesure toutes les observables du banc (une valeur par réplique si nb_repliques > 1)."""
+        repliques = self.nb_repliques
+        n, dimension = len(banc) // repliques, banc.dimension
+        positions, vitesses, contamines = banc.positions, banc.vitesses, banc.contamines
+        if repliques > 1:
+            # Vues (R, n, D) sur les tableaux du banc, sans copie
+            positions = positions.reshape(repliques, n, dimension)
+            vitesses = vitesses.reshape(repliques, n, dimension)
+            contamines = contamines.reshape(repliques, n)
+        distances = self.distances_plus_proches(banc)
+        if not len(distances):
+            distance_moyenne = _scalaire(np.zeros(positions.shape[:-2]))
+        else:
+            distance_moyenne = _scalaire(distances.reshape(repliques, n).mean(axis=1)) if repliques > 1 \
+                else float(distances.mean())
+        valeurs = {'polarisation': polarisation(vitesses),
+                   'ordre_rotation': ordre_rotation(positions, vitesses),
+                   'vitesse_centre_masse': vitesse_centre_masse(vitesses),
+                   'rayon_cohesion': rayon_cohesion(positions),
+                   'distance_plus_proche_voisin': distance_moyenne,
+                   'fraction_contaminee': fraction_contaminee(contamines)}
+        return valeurs, distances
+
+    def mettre_a_jour(self, pas, banc):
+        """Mesure le banc si pas est un multiple de tous_les ; retourne les valeurs mesurées ou None."""
+        if pas % self.tous_les:
+            # Les règles ne notent les distances qu'au pas qui précède une mesure
+            self._demander_distances(banc, (pas + 1) % self.tous_les == 0)
+            return None
+        valeurs, distances = self.mesurer(banc)
+        self._demander_distances(banc, self.tous_les == 1)
+        for nom, valeur in valeurs.items():
+            self.statistiques[nom].ajouter(valeur)
+        self.distances.ajouter_lot(distances)
+        if len(distances):
+            if self.histogramme is None:
+                self.histogramme = HistogrammeCourant(np.linspace(0, 3 * distances.mean(), self.nb_classes + 1))
+            self.histogramme.ajouter(distances)
+        self.dernieres = valeurs
+        self.nb_mesures += 1
+        return valeurs
+
+    def bilan(self):
+        """Moyenne et écart-type de chaque observable et distribution des distances au plus proche voisin."""
+        resultat = {'nb_mesures': self.nb_mesures, 'tous_les': self.tous_les,
+                    'reutilisations_voisins': self.nb_reutilisations}
+        for nom, statistique in self.statistiques.items():
+            resultat[nom + '_moyenne'] = np.asarray(statistique.moyenne).tolist()
+            resultat[nom + '_ecart_type'] = np.asarray(statistique.ecart_type).tolist()
+        resultat['distances_plus_proche_voisin'] = {
+            'moyenne': float(self.distances.moyenne), 'ecart_type': float(self.distances.ecart_type),
+            'bornes': [] if self.histogramme is None else self.histogramme.bornes.tolist(),
+            'comptes': [] if self.histogramme is None else self.histogramme.comptes.tolist(),
+            'au_dela': 0 if self.histogramme is None else self.histogramme.au_dela}
+        return resultat
+
+    def texte(self):
+        """Dernières valeurs et moyennes courantes (± écart-type), une ligne par observable."""
+        lignes = []
+        for nom in OBSERVABLES:
+            if nom in self.dernieres and np.ndim(self.dernieres[nom]) == 0:
+                statistique = self.statistiques[nom]
+                lignes.append(f"{nom:<28s}{self.dernieres[nom]:8.3f}  "
+                              f"(moy {float(statistique.moyenne):.3f} ± {float(statistique.ecart_type):.3f})")
+        return '\n'.join(lignes)
+
+
+def suivre_animation(ax, update, banc, suivi=None, tous_les=1):
+    """
+    Retourne une fonction update pour FuncAnimation qui mesure les observables
+    du banc toutes les tous_les images et les affiche dans le graphique avec
+    leurs moyennes courantes.
+    """
+    suivi = SuiviObservables(tous_les) if suivi is None else suivi
+    ecrire = getattr(ax, 'text2D', ax.text)
+    texte = ecrire(0.01, 0.01, '', transform=ax.transAxes, ha='left', va='bottom',
+                   family='monospace', fontsize=7, alpha=0.8)
+    nb_images = [0]
+
+    def update_observables(frame):
+        artistes = update(frame)
+        if suivi.mettre_a_jour(nb_images[0], banc) is not None:
+            texte.set_text(suivi.texte())
+        nb_images[0] += 1
+        return tuple(artistes or ()) + (texte,)
+
+    return update_observables
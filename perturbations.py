@@ -0,0 +1,138 @@
+import numpy as np
+from scipy.spatial import KDTree
+import profilage
+from banc import Banc
+from regles import sommer_par_poisson
+from voisinage import image_minimale, replier
+
+""" Perturbations externes : prédateurs et obstacles (Partie 4)
+
+Les prédateurs forment un petit Banc (positions et vitesses (P, D)) : chacun
+poursuit le poisson le plus proche, à une vitesse au plus vitesse_max. Les
+obstacles sont des points fixes (O, D). Prédateurs et obstacles sont traités
+ensemble comme des « répulseurs », chacun avec son rayon et sa force de fuite :
+un poisson à distance d <= rayon d'un répulseur reçoit la force k * (p - r) / d,
+qui l'en éloigne.
+
+À chaque pas, un seul KDTree est construit sur les positions du banc et
+interrogé en lot par toutes les positions des répulseurs (query_ball_point),
+puis par celles des prédateurs pour trouver leur proie (query k=1) : le coût
+est celui d'une construction d'arbre, même avec des centaines de prédateurs.
+Les forces sont réduites par poisson avec np.bincount comme dans regles.py.
+En bassin périodique (banc.boite), distances et directions suivent l'image
+minimale.
+
+"""
+
+def _par_element(valeur, n):
+    """Étend un scalaire ou une séquence à un tableau (n,) de flottants."""
+    return np.broadcast_to(np.asarray(valeur, dtype=float), (n,)).copy()
+
+
+class Perturbations:
+
+    def __init__(self, predateurs=None, obstacles=None, rayon_fuite=5.0, k_fuite=0.2,
+                 rayon_obstacles=3.0, k_obstacles=0.2, k_poursuite=0.1, vitesse_max=1.2):
+        """
+        predateurs est un Banc (ou None) ; obstacles un tableau (O, D) de positions
+        (ou None). rayon_fuite et k_fuite (prédateurs), rayon_obstacles et
+        k_obstacles (obstacles) sont des scalaires ou une valeur par élément.
+        """
+        self.predateurs = predateurs
+        self.obstacles = None if obstacles is None else np.array(obstacles, dtype=float, ndmin=2)
+        if self.predateurs is None and self.obstacles is None:
+            raise ValueError("il faut au moins des prédateurs ou des obstacles")
+        if predateurs is not None and self.obstacles is not None \
+                and predateurs.dimension != self.obstacles.shape[1]:
+            raise ValueError("prédateurs et obstacles doivent avoir la même dimension")
+        self.k_poursuite, self.vitesse_max = k_poursuite, vitesse_max
+
+        nb_predateurs, nb_obstacles = self.nb_predateurs, self.nb_obstacles
+        # Rayons et forces de fuite des répulseurs : les prédateurs d'abord, puis les obstacles
+        self.rayons = np.concatenate((_par_element(rayon_fuite, nb_predateurs),
+                                      _par_element(rayon_obstacles, nb_obstacles)))
+        self.forces = np.concatenate((_par_element(k_fuite, nb_predateurs),
+                                      _par_element(k_obstacles, nb_obstacles)))
+
+    @property
+    def nb_predateurs(self):
+        return 0 if self.predateurs is None else len(self.predateurs)
+
+    @property
+    def nb_obstacles(self):
+        return 0 if self.obstacles is None else len(self.obstacles)
+
+    @classmethod
+    def aleatoire(cls, nb_predateurs, nb_obstacles, mins, maxs, Vmin=-1, Vmax=1, generateur=None, **options):
+        """Place nb_predateurs prédateurs et nb_obstacles obstacles au hasard dans [mins, maxs]."""
+        generateur = np.random.default_rng(generateur)
+        mins = np.asarray(mins, dtype=float)
+        maxs = np.asarray(maxs, dtype=float)
+        predateurs = Banc.aleatoire(nb_predateurs, mins, maxs, Vmin, Vmax, generateur)
+        obstacles = generateur.uniform(mins, maxs, size=(nb_obstacles, len(mins)))
+        return cls(predateurs, obstacles, **options)
+
+    def rendre_periodique(self, mins, maxs):
+        """Fait du bassin [mins, maxs] un tore pour les prédateurs (voir Banc.rendre_periodique)."""
+        if self.predateurs is not None:
+            self.predateurs.rendre_periodique(mins, maxs)
+
+    def repulseurs(self):
+        """Positions (P + O, D) des prédateurs puis des obstacles."""
+        if self.obstacles is None:
+            return self.predateurs.positions
+        if self.predateurs is None:
+            return self.obstacles
+        return np.concatenate((self.predateurs.positions, self.obstacles))
+
+    @profilage.chronometre('perturbations')
+    def appliquer(self, banc, Vmax=None):
+        """
+        Fait fuir les poissons du banc devant les répulseurs proches et oriente
+        chaque prédateur vers le poisson le plus proche. Si Vmax est donné, la
+        vitesse des poissons est limitée à Vmax. Retourne le nombre de paires
+        (répulseur, poisson) en interaction.
+        """
+        if len(banc) == 0 or len(self.rayons) == 0:
+            return 0
+        repulseurs = self.repulseurs()
+        with profilage.phase('perturbations.requete'):
+            if banc.boite is None:
+                arbre = KDTree(banc.positions, balanced_tree=False, compact_nodes=False)
+                centres = repulseurs
+            else:
+                arbre = KDTree(replier(banc.positions, banc.boite), boxsize=banc.boite,
+                               balanced_tree=False, compact_nodes=False)
+                centres = replier(repulseurs, banc.boite)
+            voisins = arbre.query_ball_point(centres, self.rayons, return_sorted=False)
+
+        # Paires (répulseur r, poisson j) à plat
+        tailles = np.fromiter(map(len, voisins), dtype=np.intp, count=len(voisins))
+        r = np.repeat(np.arange(len(voisins)), tailles)
+        j = np.concatenate(voisins).astype(np.intp) if tailles.sum() else np.empty(0, dtype=np.intp)
+        profilage.compter('perturbations.paires', len(j))
+        if len(j):
+            ecarts = image_minimale(banc.positions[j] - repulseurs[r], banc.boite)
+            distances = np.sqrt(np.einsum('ij,ij->i', ecarts, ecarts))
+            coefficients = self.forces[r] / np.where(distances > 0, distances, np.inf)
+            vitesses = banc.vitesses + sommer_par_poisson(j, ecarts * coefficients[:, None], len(banc))
+            if Vmax is None:
+                banc.vitesses[...] = vitesses
+            else:
+                banc.set_vitesses(vitesses, Vmax)
+
+        if self.nb_predateurs:
+            # Chaque prédateur se dirige vers sa proie : le poisson le plus proche
+            _, proies = arbre.query(centres[:self.nb_predateurs], k=1)
+            directions = image_minimale(banc.positions[proies] - self.predateurs.positions, banc.boite)
+            normes = np.sqrt(np.einsum('ij,ij->i', directions, directions))
+            directions /= np.where(normes > 0, normes, np.inf)[:, None]
+            self.predateurs.set_vitesses(self.predateurs.vitesses + self.k_poursuite * directions,
+                                         self.vitesse_max)
+        return len(j)
+
+    def avancer(self, dt, mins, maxs):
+        """Déplace les prédateurs et gère leurs bords comme ceux du banc."""
+        if self.predateurs is not None:
+            self.predateurs.deplacer(dt)
+            self.predateurs.verifier_bords(mins, maxs, self.vitesse_max)
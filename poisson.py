@@ -1,318 +1,38 @@
-import numpy as np
-import random
-from scipy.spatial import KDTree
+from banc import composante, etat_contamine
+from poisson_base import PoissonBase
+
+class Poisson(PoissonBase):
+
+    # Chaque poisson est une vue sur la ligne _i des tableaux de son banc (poisson_base.py)
+    DIMENSION = 2
+    x, y = composante('positions', 0), composante('positions', 1)
+    Vx, Vy = composante('vitesses', 0), composante('vitesses', 1)
+    is_contaminated = etat_contamine()
 
-class Poisson:
-    
     def __init__(self, x, y, Vx, Vy, color='blue'):
-        
-        self.x, self.y = x, y    
-        self.Vx, self.Vy = Vx, Vy
-        self.is_contaminated = False 
-        self.color = color  
 
-    def deplacer(self, Dt):
-        """Déplace le poisson en fonction de sa vitesse"""
-        self.x += self.Vx * Dt
-        self.y += self.Vy * Dt
-    
+        super().__init__((x, y), (Vx, Vy), color)
+
     def verifier_bords(self, xmin, xmax, ymin, ymax):
         """Gère les rebonds sur les bords """
-        # l'axe des x 
-        if self.x < xmin:
-            self.x = xmin
-            self.Vx = -self.Vx  
-        elif self.x > xmax:
-            self.x = xmax
-            self.Vx = -self.Vx
-        # l'axe des y 
-        if self.y < ymin:
-            self.y = ymin
-            self.Vy = -self.Vy
-        elif self.y > ymax:
-            self.y = ymax
-            self.Vy = -self.Vy
-    
-    def contaminer(self, Vx, Vy, dV, norm=True):
+        self._verifier_bords((xmin, xmax, ymin, ymax))
+
+    def contaminer(self, Vx, Vy, dV, norm=True, generateur=None):
         """Contamine le poisson et modifie son etat"""
-        if not self.is_contaminated:
-            self.is_contaminated = True
-            self.color = 'green'
-            
-            if norm:
-                self.Vx = Vx + random.uniform(-dV, dV)
-                self.Vy = Vy + random.uniform(-dV, dV)
-            
-            else:
-                # Calcul du vecteur vitesse
-                vector = np.array([Vx, Vy])
-                
-                # Calcul de la norme (magnitude) actuelle
-                norm = np.linalg.norm(vector)
-                
-                
-                # Variation aléatoire de la norme
-                norm_variation = norm * (1 + random.uniform(-dV, dV))
-                
-                # Conserver la direction mais ajuster la norme
-                vector_normalized = vector / norm
-                new_vector = vector_normalized * norm_variation
-                
-                self.Vx = new_vector[0]
-                self.Vy = new_vector[1]
-            
-    
+        self._contaminer((Vx, Vy), dV, norm, generateur)
 
-    def get_position(self):
-        """Retourne la position du poisson ."""
-        return (self.x, self.y)
+    @classmethod
+    def creer_banc(cls, nb_poissons, xmin, xmax, ymin, ymax, Vmin=-1, Vmax=1, generateur=None):
+        """Crée un banc de poissons avec des positions et vitesses aléatoires dans [xmin, xmax] x [ymin, ymax]"""
+        return cls._creer_banc(nb_poissons, (xmin, xmax, ymin, ymax), Vmin, Vmax, generateur)
 
-    def get_vitesse(self):
-        """Calcule la vitesse totale du poisson"""
-        return np.sqrt(self.Vx**2 + self.Vy**2)
-    
-    def get_vitesse_np(self):
-        """Retourne le vecteur vitesse du poisson sous forme de numpy array [Vx, Vy]."""
-        return np.array([self.Vx, self.Vy])
-    
-    def set_vitesse(self, v, Vmax=1.5):
-        """
-        Met à jour la vitesse du poisson avec une limitation de vitesse maximale.
-        """
-        if not isinstance(v, np.ndarray):
-            v = np.array(v)
-        V = np.linalg.norm(v)
-        if V > Vmax:
-            v = (v / V) * Vmax
-        self.Vx = v[0]
-        self.Vy = v[1]
-    
-    @staticmethod
-    def distance_euclidienne(poisson1, poisson2):
-        """Calcule la distance euclidienne entre deux poissons."""
-        pos1 = np.array(poisson1.get_position())
-        pos2 = np.array(poisson2.get_position())
-        return np.linalg.norm(pos1 - pos2)
-    
-    @staticmethod
-    def creer_banc(nb_poissons, xmin, xmax, ymin, ymax, Vmin=-1, Vmax=1):
-        """Crée un banc de poissons avec des positions et vitesses aléatoires dans [-zone_limite, zone_limite]"""
-        poissons = []
-        for _ in range(nb_poissons):
-            x, y = np.random.uniform(xmin, xmax), np.random.uniform(ymin, ymax)
-            Vx, Vy = np.random.uniform(Vmin, Vmax), np.random.uniform(Vmin, Vmax)
-            poissons.append(Poisson(x, y, Vx, Vy))
-        return poissons
-    
-    @staticmethod
-    def calculer_force_repulsion(poisson, voisin, k_repulsion=0.05):
-        """Calcule la force de répulsion entre deux poissons."""
-        pos_i, pos_j  = np.array(poisson.get_position()), np.array(voisin.get_position())
-        vecteur_d = pos_i - pos_j
-        norme_d = np.linalg.norm(vecteur_d)
-        if norme_d > 0: 
-            return k_repulsion * (vecteur_d / norme_d)
-        else:
-            return np.zeros(2)
-    
-    @staticmethod
-    def calculer_force_alignement(poisson, voisins, k_alignement=0.03):
-        """Calcule la force d'alignement entre un poisson et ses voisins."""
-        if not voisins:
-            return np.zeros(2)
-        direction_moyenne = np.zeros(2)
-        for voisin in voisins:
-            direction_moyenne += voisin.get_vitesse_np()
-        
-        if len(voisins) > 0:
-            direction_moyenne = direction_moyenne / len(voisins)
-            
-        return k_alignement * direction_moyenne
-    
     @staticmethod
-    def calculer_force_attraction(poisson, voisin, k_attraction=0.01):
-        """Calcule la force d'attraction entre deux poissons."""
-        pos_i = np.array(poisson.get_position())
-        pos_j = np.array(voisin.get_position())
-        vecteur_d = pos_i - pos_j
-        norme_d = np.linalg.norm(vecteur_d)
-        
-        if norme_d > 0: 
-            return k_attraction * (-vecteur_d / norme_d)
-        else:
-            return np.zeros(2)
-    
-    @staticmethod
-    def appliquer_regles_aoki(poissons, rayon_repulsion=1.0, rayon_alignement=2.5, 
-                             rayon_attraction=5.0, k_repulsion=0.05, k_alignement=0.03, 
-                             k_attraction=0.01, Vmax=1.5):
-        """Applique les règles d'Aoki à l'ensemble du banc de poissons."""
-       
-        positions = np.array([[p.x, p.y] for p in poissons])
-        kdtree = KDTree(positions)
-        
-        for i, poisson in enumerate(poissons):
-            # Etat actuel du poisson
-            p_i = np.array(poisson.get_position())
-            v_i = np.array([poisson.Vx, poisson.Vy])
-            
-            # Initialisation des forces
-            F_repulsion = np.zeros(2)
-            F_alignement = np.zeros(2)
-            F_attraction = np.zeros(2)
-            
-            # Listes pour stocker les voisins dans chaque zone
-            voisins_repulsion = []
-            voisins_alignement = []
-            voisins_attraction = []
-            
-            # Trouver tous les voisins dans le rayon d'attraction
-            indices = kdtree.query_ball_point(p_i, rayon_attraction)
-            
-            for j in indices:
-                if i == j:  
-                    continue
-                    
-                voisin = poissons[j]
-                distance = Poisson.distance_euclidienne(poisson, voisin)
-                
-                # Classification des voisins selon leur distance
-                if distance < rayon_repulsion:
-                    voisins_repulsion.append(voisin)
-                elif distance < rayon_alignement:
-                    voisins_alignement.append(voisin)
-                elif distance < rayon_attraction:
-                    voisins_attraction.append(voisin)
-            
-            # Calcul des forces pour chaque type de voisin
-            for voisin in voisins_repulsion:
-                F_repulsion += Poisson.calculer_force_repulsion(poisson, voisin, k_repulsion)
-                
-            F_alignement = Poisson.calculer_force_alignement(poisson, voisins_alignement, k_alignement)
-            
-            for voisin in voisins_attraction:
-                F_attraction += Poisson.calculer_force_attraction(poisson, voisin, k_attraction)
-            # Mise à jour de la vitesse 
-            v = v_i + F_repulsion + F_alignement + F_attraction
-        
-            poisson.set_vitesse(v, Vmax)
-        
-    @staticmethod
-    def appliquer_regles_aoki_six_voisins(poissons,rayon_repulsion=1.0, rayon_alignement=2.5, 
-                             rayon_attraction=5.0, k_repulsion=0.05, k_alignement=0.03, 
-                                        k_attraction=0.01, Vmax=1.5):
+    def appliquer_regles_aoki_six_voisins(poissons, rayon_repulsion=1.0, rayon_alignement=2.5,
+                                          rayon_attraction=5.0, k_repulsion=0.05, k_alignement=0.03,
+                                          k_attraction=0.01, Vmax=1.5, nb_voisins=6):
         """
         Applique les règles d'Aoki à l'ensemble du banc de poissons,
-        mais en considérant uniquement les 6 plus proches voisins de chaque poisson.
-        """
-        positions = np.array([[p.x, p.y] for p in poissons])
-        kdtree = KDTree(positions)
-        
-        for i, poisson in enumerate(poissons):
-            # Etat actuel du poisson
-            p_i = np.array(poisson.get_position())
-            v_i = np.array([poisson.Vx, poisson.Vy])
-            
-            # Initialisation des forces
-            F_repulsion = np.zeros(2)
-            F_alignement = np.zeros(2)
-            F_attraction = np.zeros(2)
-            
-            # Recherche des 7 voisins les plus proches (le poisson lui-même inclus)
-            distances, indices = kdtree.query(p_i, k=7)  # k=7 car le premier est le poisson lui-même
-            
-            # Enlever le premier indice (le poisson lui-même)
-            indices = indices[1:] if len(indices) > 1 else []
-            
-            # Pour chaque voisin parmi les 6 plus proches
-            for j in indices:
-                voisin = poissons[j]
-                distance = Poisson.distance_euclidienne(poisson, voisin)
-                
-                # Appliquer toutes les forces en fonction de la distance
-                # Force de répulsion 
-                if distance < rayon_repulsion:  
-                    F_repulsion += Poisson.calculer_force_repulsion(poisson, voisin, k_repulsion)
-                
-                # Force d'alignement
-                elif distance < rayon_alignement:  
-                    F_alignement += Poisson.calculer_force_alignement(poisson, [voisin], k_alignement)
-                
-                # Force d'attraction 
-                elif distance < rayon_attraction: 
-                    F_attraction += Poisson.calculer_force_attraction(poisson, voisin, k_attraction)
-            
-            # Mise à jour de la vitesse
-            v = v_i + F_repulsion + F_alignement + F_attraction
-            
-            # Limitation de la vitesse maximale
-            poisson.set_vitesse(v, Vmax)
-        
-    
-
-    @staticmethod
-    def voisins_visibles(poisson, poissons, vision_angle=60, rayon_max=5.0):
-        """
-        Retourne la liste des poissons visibles dans le cône de vision de poisson.
-        """
-        visibles = []
-        p = np.array(poisson.get_position())
-        v = poisson.get_vitesse_np()
-        norme_v = np.linalg.norm(v)
-        
-        if norme_v == 0:
-            return visibles
-        
-        direction_poisson = v / norme_v
-        demi_angle = np.deg2rad(vision_angle / 2)
-        
-        for autre in poissons:
-            if autre is poisson:
-                continue
-            p_autre = np.array(autre.get_position())
-            d = p_autre - p
-            norme_d = np.linalg.norm(d)
-            
-            if norme_d == 0 or norme_d > rayon_max:
-                continue
-            
-            direction = d / norme_d
-            angle = np.arccos(np.clip(np.dot(direction_poisson, direction), -1, 1))
-            
-            if angle <= demi_angle:
-                visibles.append(autre)
-        return visibles
-   
-    @staticmethod
-    def appliquer_regles_influence_visuelle(poissons, vision_angle=60,
-                                            rayon_repulsion=1.0, rayon_alignement=2.5, rayon_attraction=5.0,
-                                            k_repulsion=0.05, k_alignement=0.03, k_attraction=0.01,
-                                            Vmax=1.5):
-        """
-        Applique les règles de comportement en utilisant uniquement les voisins visibles dans le cône de vision.
+        mais en considérant uniquement les nb_voisins (6 par défaut) plus proches voisins de chaque poisson.
         """
-        for poisson in poissons:
-            
-            visibles = Poisson.voisins_visibles(poisson, poissons, vision_angle, rayon_max=rayon_attraction)
-           
-            F_repulsion = np.zeros(2)
-            F_alignement = np.zeros(2)
-            F_attraction = np.zeros(2)
-           
-            voisins_alignement = []
-            for voisin in visibles:
-                
-                distance = Poisson.distance_euclidienne(poisson, voisin)
-                
-                if distance < rayon_repulsion:
-                    F_repulsion += Poisson.calculer_force_repulsion(poisson, voisin, k_repulsion)
-                
-                elif distance < rayon_alignement:
-                    voisins_alignement.append(voisin)
-                
-                elif distance < rayon_attraction:
-                    F_attraction += Poisson.calculer_force_attraction(poisson, voisin, k_attraction)
-           
-            F_alignement = Poisson.calculer_force_alignement(poisson, voisins_alignement, k_alignement)
-            v = poisson.get_vitesse_np() + F_repulsion + F_alignement + F_attraction
-            poisson.set_vitesse(v, Vmax)
\ No newline at end of file
+        PoissonBase._appliquer_regles_k_voisins(poissons, nb_voisins, rayon_repulsion, rayon_alignement,
+                                                rayon_attraction, k_repulsion, k_alignement, k_attraction, Vmax)
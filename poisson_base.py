@@ -0,0 +1,182 @@
+import numpy as np
+from banc import Banc, appliquer_sur_poissons, banc_commun
+from contamination import vitesses_contaminees
+from regles import indices_visibles, regles_aoki, regles_influence_visuelle, regles_k_voisins
+
+""" Poisson indépendant de la dimension
+
+PoissonBase regroupe tout le comportement commun à Poisson (2D) et Poisson3D :
+un poisson est une vue sur la ligne _i des tableaux (N, D) de son banc, et les
+règles collectives délèguent aux règles vectorisées de regles.py, écrites une
+seule fois pour D = 2 et D = 3. Les classes Poisson et Poisson3D ne font que
+fixer DIMENSION, nommer les composantes (x, y, z, Vx, Vy, Vz) et garder les
+signatures historiques qui énumèrent ces composantes.
+
+"""
+
+class PoissonBase:
+
+    DIMENSION = None
+
+    def __init__(self, position, vitesse, color='blue'):
+
+        self._banc, self._i = Banc([position], [vitesse]), 0
+        self.color = color
+
+    @classmethod
+    def vue(cls, banc, i, color='blue'):
+        """Crée un poisson qui lit et écrit directement la ligne i du banc."""
+        poisson = cls.__new__(cls)
+        poisson._banc, poisson._i = banc, i
+        poisson.color = color
+        return poisson
+
+    @classmethod
+    def depuis_banc(cls, banc):
+        """Retourne la liste des poissons du banc, chacun étant une vue sur sa ligne."""
+        return [cls.vue(banc, i) for i in range(len(banc))]
+
+    @classmethod
+    def _creer_banc(cls, nb_poissons, bornes, Vmin=-1, Vmax=1, generateur=None):
+        """Crée un banc aléatoire ; bornes = (min_x, max_x, min_y, max_y, ...)."""
+        banc = Banc.aleatoire(nb_poissons, bornes[0::2], bornes[1::2], Vmin, Vmax, generateur)
+        return cls.depuis_banc(banc)
+
+    @property
+    def banc(self):
+        """Banc dont le poisson est une vue."""
+        return self._banc
+
+    @property
+    def _position(self):
+        return self._banc.positions[self._i]
+
+    @property
+    def _vitesse(self):
+        return self._banc.vitesses[self._i]
+
+    def deplacer(self, Dt):
+        """Déplace le poisson en fonction de sa vitesse"""
+        self._position[...] += self._vitesse * Dt
+
+    def _verifier_bords(self, bornes):
+        """Gère les rebonds sur les bords ; bornes = (min_x, max_x, min_y, max_y, ...)."""
+        mins, maxs = np.asarray(bornes[0::2], dtype=float), np.asarray(bornes[1::2], dtype=float)
+        position, vitesse = self._position, self._vitesse
+        sortis = (position < mins) | (position > maxs)
+        np.clip(position, mins, maxs, out=position)
+        np.negative(vitesse, out=vitesse, where=sortis)
+
+    def _contaminer(self, vitesse_source, dV, norm=True, generateur=None):
+        """
+        Contamine le poisson : il prend la vitesse source avec une variation
+        aléatoire (contamination.vitesses_contaminees). Si la variation porte
+        sur la norme et que la vitesse source est nulle, le poisson garde sa
+        propre vitesse.
+        """
+        if self.is_contaminated:
+            return
+        self.is_contaminated = True
+        self.color = 'green'
+        vitesse_source = np.asarray(vitesse_source, dtype=float)
+        if not norm and not vitesse_source.any():
+            return
+        self._vitesse[...] = vitesses_contaminees(vitesse_source[None, :], dV, norm, generateur)[0]
+
+    def get_position(self):
+        """Retourne la position du poisson."""
+        return tuple(float(c) for c in self._position)
+
+    def get_vitesse(self):
+        """Calcule la vitesse totale du poisson"""
+        return float(np.linalg.norm(self._vitesse))
+
+    def get_vitesse_np(self):
+        """Retourne le vecteur vitesse du poisson sous forme de numpy array."""
+        return self._vitesse.copy()
+
+    def set_vitesse(self, v, Vmax=1.5):
+        """
+        Met à jour la vitesse du poisson avec une limitation de vitesse maximale.
+        """
+        v = np.asarray(v, dtype=float)
+        V = np.linalg.norm(v)
+        if V > Vmax:
+            v = (v / V) * Vmax
+        self._vitesse[...] = v
+
+    @staticmethod
+    def distance_euclidienne(poisson1, poisson2):
+        """Calcule la distance euclidienne entre deux poissons."""
+        pos1 = np.array(poisson1.get_position())
+        pos2 = np.array(poisson2.get_position())
+        return np.linalg.norm(pos1 - pos2)
+
+    @staticmethod
+    def calculer_force_repulsion(poisson, voisin, k_repulsion=0.05):
+        """Calcule la force de répulsion entre deux poissons."""
+        vecteur_d = np.array(poisson.get_position()) - np.array(voisin.get_position())
+        norme_d = np.linalg.norm(vecteur_d)
+        if norme_d > 0:
+            return k_repulsion * (vecteur_d / norme_d)
+        return np.zeros(len(vecteur_d))
+
+    @staticmethod
+    def calculer_force_alignement(poisson, voisins, k_alignement=0.03):
+        """Calcule la force d'alignement entre un poisson et ses voisins."""
+        if not voisins:
+            return np.zeros(len(poisson.get_position()))
+        direction_moyenne = np.mean([voisin.get_vitesse_np() for voisin in voisins], axis=0)
+        return k_alignement * direction_moyenne
+
+    @staticmethod
+    def calculer_force_attraction(poisson, voisin, k_attraction=0.01):
+        """Calcule la force d'attraction entre deux poissons."""
+        vecteur_d = np.array(poisson.get_position()) - np.array(voisin.get_position())
+        norme_d = np.linalg.norm(vecteur_d)
+        if norme_d > 0:
+            return k_attraction * (-vecteur_d / norme_d)
+        return np.zeros(len(vecteur_d))
+
+    @staticmethod
+    def appliquer_regles_aoki(poissons, rayon_repulsion=1.0, rayon_alignement=2.5,
+                              rayon_attraction=5.0, k_repulsion=0.05, k_alignement=0.03,
+                              k_attraction=0.01, Vmax=1.5):
+        """Applique les règles d'Aoki à l'ensemble du banc de poissons."""
+        # Version vectorisée (regles.regles_aoki) : toutes les vitesses sont mises à jour simultanément
+        appliquer_sur_poissons(poissons, regles_aoki, rayon_repulsion, rayon_alignement,
+                               rayon_attraction, k_repulsion, k_alignement, k_attraction, Vmax)
+
+    @staticmethod
+    def _appliquer_regles_k_voisins(poissons, nb_voisins, rayon_repulsion, rayon_alignement, rayon_attraction,
+                                    k_repulsion, k_alignement, k_attraction, Vmax):
+        # Une seule requête de voisinage pour tout le banc (regles.regles_k_voisins)
+        appliquer_sur_poissons(poissons, regles_k_voisins, nb_voisins, rayon_repulsion, rayon_alignement,
+                               rayon_attraction, k_repulsion, k_alignement, k_attraction, Vmax)
+
+    @staticmethod
+    def voisins_visibles(poisson, poissons, vision_angle=60, rayon_max=5.0):
+        """
+        Retourne la liste des poissons visibles dans le cône de vision de poisson.
+        """
+        banc = banc_commun(poissons)
+        if banc is not None:
+            positions = banc.positions
+        else:
+            positions = np.array([p.get_position() for p in poissons])
+        indices = indices_visibles(poisson.get_position(), poisson.get_vitesse_np(), positions,
+                                   vision_angle, rayon_max)
+        return [poissons[j] for j in indices]
+
+    @staticmethod
+    def appliquer_regles_influence_visuelle(poissons, vision_angle=60,
+                                            rayon_repulsion=1.0, rayon_alignement=2.5, rayon_attraction=5.0,
+                                            k_repulsion=0.05, k_alignement=0.03, k_attraction=0.01,
+                                            Vmax=1.5):
+        """
+        Applique les règles de comportement en utilisant uniquement les voisins visibles dans le cône de vision.
+        """
+        # Voisins trouvés par une requête de voisinage puis filtrés par le test du cône (regles.dans_cone)
+        appliquer_sur_poissons(poissons, regles_influence_visuelle, vision_angle,
+                               rayon_repulsion, rayon_alignement, rayon_attraction,
+                               k_repulsion, k_alignement, k_attraction, Vmax)
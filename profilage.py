@@ -0,0 +1,205 @@
+import contextlib
+import functools
+import json
+import time
+import numpy as np
+
+""" Chronométrage des phases d'un pas de simulation
+
+Les modules du projet entourent chaque phase d'un pas (construction de l'index,
+requête de voisinage, forces, contamination, déplacement, rebonds) par
+profilage.phase(nom) ou le décorateur chronometre(nom), et comptent leurs
+événements avec profilage.compter(nom, valeur) (paires de voisins examinées,
+contaminations). Tant qu'aucun Profileur n'est activé, phase rend un contexte
+vide partagé, compter ne fait rien et les fonctions décorées sont appelées
+directement : le coût se limite à un appel de fonction.
+
+    profileur = profilage.activer()
+    simulation.executer(1000)
+    profileur.ecrire_rapport('profil.json')
+
+Dans une animation, instrumenter_animation mesure aussi la mise à jour et le
+dessin matplotlib et affiche les statistiques sur le graphique.
+
+"""
+
+_NUL = contextlib.nullcontext()
+_actif = None
+
+
+class Serie:
+    """Nombre, somme et dernières valeurs (tampon circulaire) d'une mesure."""
+
+    def __init__(self, capacite=10000):
+        self.valeurs = np.empty(capacite)
+        self.nb = 0
+        self.total = 0.0
+
+    def ajouter(self, valeur):
+        self.valeurs[self.nb % len(self.valeurs)] = valeur
+        self.nb += 1
+        self.total += valeur
+
+    def statistiques(self):
+        """Nombre, total, moyenne, médiane, 99e centile et maximum (centiles sur les dernières valeurs)."""
+        if self.nb == 0:
+            return {'nb': 0, 'total': 0.0, 'moyenne': 0.0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+        recentes = self.valeurs[:min(self.nb, len(self.valeurs))]
+        p50, p99 = np.percentile(recentes, (50, 99))
+        return {'nb': self.nb, 'total': self.total, 'moyenne': self.total / self.nb,
+                'p50': float(p50), 'p99': float(p99), 'max': float(recentes.max())}
+
+
+class _Chrono:
+
+    __slots__ = ('serie', 'debut')
+
+    def __init__(self, serie):
+        self.serie = serie
+
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.serie.ajouter(time.perf_counter() - self.debut)
+
+
+class Profileur:
+    """
+    Durées de chaque phase (en secondes) et compteurs cumulés par pas. Les
+    centiles portent sur les capacite dernières mesures de chaque série.
+    """
+
+    def __init__(self, capacite=10000):
+        self.capacite = capacite
+        self.phases = {}
+        self.compteurs = {}
+        self._compteurs_pas = {}
+        self.nb_pas = 0
+
+    def _serie(self, series, nom):
+        serie = series.get(nom)
+        if serie is None:
+            serie = series[nom] = Serie(self.capacite)
+        return serie
+
+    def phase(self, nom):
+        """Contexte qui chronomètre une occurrence de la phase nom."""
+        return _Chrono(self._serie(self.phases, nom))
+
+    def ajouter_duree(self, nom, duree):
+        """Enregistre une durée mesurée ailleurs pour la phase nom."""
+        self._serie(self.phases, nom).ajouter(duree)
+
+    def compter(self, nom, valeur=1):
+        """Ajoute valeur au compteur nom du pas en cours."""
+        self._compteurs_pas[nom] = self._compteurs_pas.get(nom, 0) + valeur
+
+    def fin_pas(self):
+        """Termine le pas en cours : ses compteurs deviennent une mesure de chaque série."""
+        for nom in self.compteurs.keys() | self._compteurs_pas.keys():
+            self._serie(self.compteurs, nom).ajouter(self._compteurs_pas.get(nom, 0))
+        self._compteurs_pas.clear()
+        self.nb_pas += 1
+
+    def rapport(self):
+        """Statistiques de toutes les phases et de tous les compteurs (valeurs par pas)."""
+        return {'nb_pas': self.nb_pas,
+                'phases': {nom: serie.statistiques() for nom, serie in sorted(self.phases.items())},
+                'compteurs': {nom: serie.statistiques() for nom, serie in sorted(self.compteurs.items())}}
+
+    def ecrire_rapport(self, chemin):
+        """Écrit le rapport au format JSON."""
+        with open(chemin, 'w') as fichier:
+            json.dump(self.rapport(), fichier, indent=2)
+
+    def texte(self):
+        """Résumé d'une ligne par phase et par compteur, pour l'affichage."""
+        lignes = [f"{'phase':<20}{'moy':>9}{'p50':>9}{'p99':>9}  (ms)"]
+        for nom, serie in sorted(self.phases.items()):
+            s = serie.statistiques()
+            lignes.append(f"{nom:<20}{1e3 * s['moyenne']:>9.3f}{1e3 * s['p50']:>9.3f}{1e3 * s['p99']:>9.3f}")
+        for nom, serie in sorted(self.compteurs.items()):
+            s = serie.statistiques()
+            lignes.append(f"{nom:<20}{s['moyenne']:>9.1f}{s['p50']:>9.1f}{s['p99']:>9.1f}  par pas")
+        return '\n'.join(lignes)
+
+
+def activer(profileur=None):
+    """Active un profileur (nouveau si aucun n'est donné) et le retourne."""
+    global _actif
+    _actif = profileur if profileur is not None else Profileur()
+    return _actif
+
+
+def desactiver():
+    """Désactive le profilage et retourne le profileur qui était actif."""
+    global _actif
+    profileur, _actif = _actif, None
+    return profileur
+
+
+def profileur_actif():
+    """Profileur actif ou None."""
+    return _actif
+
+
+def phase(nom):
+    """Chronomètre la phase nom si un profileur est actif."""
+    if _actif is None:
+        return _NUL
+    return _actif.phase(nom)
+
+
+def compter(nom, valeur=1):
+    """Ajoute valeur au compteur nom si un profileur est actif."""
+    if _actif is not None:
+        _actif.compter(nom, valeur)
+
+
+def fin_pas():
+    """Termine le pas en cours du profileur actif."""
+    if _actif is not None:
+        _actif.fin_pas()
+
+
+def chronometre(nom):
+    """Décorateur qui chronomètre chaque appel de la fonction comme une occurrence de la phase nom."""
+    def decorateur(fonction):
+        @functools.wraps(fonction)
+        def fonction_chronometree(*args, **kwargs):
+            if _actif is None:
+                return fonction(*args, **kwargs)
+            with _actif.phase(nom):
+                return fonction(*args, **kwargs)
+        return fonction_chronometree
+    return decorateur
+
+
+def instrumenter_animation(ax, update, profileur=None, tous_les=10):
+    """
+    Retourne une fonction update pour FuncAnimation qui active le profilage,
+    chronomètre update ('image.mise_a_jour') et le temps passé entre deux
+    images ('image.affichage' : dessin matplotlib et boucle d'événements), et
+    affiche les statistiques dans le graphique toutes les tous_les images.
+    """
+    profileur = activer(profileur)
+    ecrire = getattr(ax, 'text2D', ax.text)
+    texte = ecrire(0.99, 0.01, '', transform=ax.transAxes, ha='right', va='bottom',
+                   family='monospace', fontsize=7, alpha=0.8)
+    fin_precedente = [None]
+
+    def update_profile(frame):
+        debut = time.perf_counter()
+        if fin_precedente[0] is not None:
+            profileur.ajouter_duree('image.affichage', debut - fin_precedente[0])
+        artistes = update(frame)
+        profileur.ajouter_duree('image.mise_a_jour', time.perf_counter() - debut)
+        profileur.fin_pas()
+        if profileur.nb_pas % tous_les == 0:
+            texte.set_text(profileur.texte())
+        fin_precedente[0] = time.perf_counter()
+        return tuple(artistes or ()) + (texte,)
+
+    return update_profile
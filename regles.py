@@ -0,0 +1,179 @@
+import numpy as np
+import profilage
+from noyaux import choisir_backend, pas_aoki
+from voisinage import choisir_index, image_minimale
+
+""" Règles comportementales vectorisées
+
+Les règles agissent sur un Banc entier : les voisins sont obtenus en une seule
+requête à un index de voisinage (voisinage.py, KDTree par défaut ou grille de
+cellules) sous forme de paires orientées (i, j), où le poisson i subit
+l'influence du poisson j, puis les forces sont réduites par poisson avec
+np.bincount. Toutes les vitesses sont mises à jour simultanément. Si le banc
+est périodique (banc.boite), voisins et écarts suivent l'image minimale.
+
+regles_aoki et regles_influence_visuelle acceptent backend='numpy' ou 'numba'
+(noyaux.py). Le backend numba construit sa propre grille de cellules : par
+défaut il n'est utilisé que s'il est installé, sans index (ou avec un
+ensemble.IndexEnsemble, qui ne sert qu'à séparer les répliques) et avec un
+rayon d'attraction fini ; un index donné (KDTree, grille, liste de Verlet)
+impose numpy.
+
+Si un suivi d'observables l'a demandé (banc.plus_proche alloué), les règles y
+notent au passage la distance de chaque poisson à son plus proche voisin parmi
+les paires trouvées, pour que les observables n'aient pas à refaire de requête.
+
+"""
+
+def ecarts_paires(positions, i, j, boite=None):
+    """Retourne les vecteurs p_i - p_j (image minimale si boite est donnée) et leurs normes pour chaque paire."""
+    ecarts = image_minimale(positions[i] - positions[j], boite)
+    distances = np.sqrt(np.einsum('ij,ij->i', ecarts, ecarts))
+    return ecarts, distances
+
+
+def sommer_par_poisson(indices, valeurs, n):
+    """Somme les lignes de valeurs (M, D) ayant le même indice de poisson, renvoie (n, D)."""
+    somme = np.empty((n, valeurs.shape[1]))
+    for axe in range(valeurs.shape[1]):
+        somme[:, axe] = np.bincount(indices, weights=valeurs[:, axe], minlength=n)
+    return somme
+
+
+def noter_plus_proches(banc, i, distances):
+    """Note dans banc.plus_proche, s'il est alloué, la plus petite distance de chaque poisson i (inf sans paire)."""
+    if banc.plus_proche is None:
+        return
+    banc.plus_proche.fill(np.inf)
+    np.minimum.at(banc.plus_proche, i, distances)
+
+
+@profilage.chronometre('forces')
+def forces_aoki(vitesses, i, j, ecarts, distances,
+                rayon_repulsion=1.0, rayon_alignement=2.5, rayon_attraction=5.0,
+                k_repulsion=0.05, k_alignement=0.03, k_attraction=0.01,
+                alignement_moyen=True):
+    """
+    Calcule la somme des forces d'Aoki subies par chaque poisson.
+
+    Les paires (i, j) sont classées par zone selon leur distance :
+    répulsion si d < rayon_repulsion, sinon alignement si d < rayon_alignement,
+    sinon attraction si d < rayon_attraction. Si alignement_moyen est vrai, la
+    force d'alignement utilise la vitesse moyenne des voisins, sinon leur somme.
+    """
+    n = len(vitesses)
+    profilage.compter('paires_examinees', len(i))
+    repulsion = distances < rayon_repulsion
+    alignement = ~repulsion & (distances < rayon_alignement)
+    attraction = ~repulsion & ~alignement & (distances < rayon_attraction)
+
+    # Répulsion et attraction : coefficient signé sur le vecteur unitaire p_i - p_j
+    coefficients = np.where(repulsion, k_repulsion, 0.0) - np.where(attraction, k_attraction, 0.0)
+    coefficients /= np.where(distances > 0, distances, np.inf)
+    forces = sommer_par_poisson(i, ecarts * coefficients[:, None], n)
+
+    # Alignement : vitesse moyenne (ou somme) des voisins de la zone
+    i_alignement = i[alignement]
+    direction = sommer_par_poisson(i_alignement, vitesses[j[alignement]], n)
+    if alignement_moyen:
+        nb_voisins = np.bincount(i_alignement, minlength=n)
+        direction /= np.maximum(nb_voisins, 1)[:, None]
+    forces += k_alignement * direction
+    return forces
+
+
+@profilage.chronometre('regles.aoki')
+def regles_aoki(banc, rayon_repulsion=1.0, rayon_alignement=2.5, rayon_attraction=5.0,
+                k_repulsion=0.05, k_alignement=0.03, k_attraction=0.01, Vmax=1.5, index=None,
+                backend=None):
+    """
+    Applique les règles d'Aoki à tout le banc en une passe vectorisée.
+    index est un index de voisinage ou son nom ('kdtree' par défaut, 'grille').
+    """
+    if len(banc) == 0:
+        return
+    if choisir_backend(backend, index, rayon_attraction) == 'numba':
+        pas_aoki(banc, rayon_repulsion, rayon_alignement, rayon_attraction,
+                 k_repulsion, k_alignement, k_attraction, Vmax, repliques=getattr(index, 'repliques', None))
+        return
+    i, j = choisir_index(index).paires(banc.positions, rayon_attraction, banc.boite)
+    ecarts, distances = ecarts_paires(banc.positions, i, j, banc.boite)
+    noter_plus_proches(banc, i, distances)
+    forces = forces_aoki(banc.vitesses, i, j, ecarts, distances,
+                         rayon_repulsion, rayon_alignement, rayon_attraction,
+                         k_repulsion, k_alignement, k_attraction)
+    banc.set_vitesses(banc.vitesses + forces, Vmax)
+
+
+@profilage.chronometre('regles.k_voisins')
+def regles_k_voisins(banc, nb_voisins=6, rayon_repulsion=1.0, rayon_alignement=2.5, rayon_attraction=5.0,
+                     k_repulsion=0.05, k_alignement=0.03, k_attraction=0.01, Vmax=1.5, index=None):
+    """
+    Applique les règles d'Aoki en ne considérant que les nb_voisins plus proches
+    voisins de chaque poisson (voisinage topologique). La force d'alignement est
+    la somme des contributions de chaque voisin de la zone d'alignement.
+
+    Les voisins au-delà de rayon_attraction n'exercent aucune force, la recherche
+    des plus proches voisins est donc limitée à ce rayon.
+    """
+    if len(banc) == 0:
+        return
+    i, j = choisir_index(index).k_voisins(banc.positions, nb_voisins, rayon_attraction, banc.boite)
+    ecarts, distances = ecarts_paires(banc.positions, i, j, banc.boite)
+    noter_plus_proches(banc, i, distances)
+    forces = forces_aoki(banc.vitesses, i, j, ecarts, distances,
+                         rayon_repulsion, rayon_alignement, rayon_attraction,
+                         k_repulsion, k_alignement, k_attraction, alignement_moyen=False)
+    banc.set_vitesses(banc.vitesses + forces, Vmax)
+
+
+def dans_cone(vitesses, ecarts, distances, vision_angle=60):
+    """
+    Indique pour chaque paire si le voisin est dans le cône de vision du poisson.
+
+    vitesses sont les vitesses des poissons qui regardent et ecarts les vecteurs
+    p_i - p_j. Le voisin j est visible si l'angle entre v_i et p_j - p_i est au
+    plus vision_angle / 2, ce qu'on teste sans arccos :
+    v_i . (p_j - p_i) >= cos(vision_angle / 2) * |v_i| * |p_j - p_i|.
+    """
+    cos_demi_angle = np.cos(np.deg2rad(vision_angle / 2))
+    normes_v = np.sqrt(np.einsum('ij,ij->i', vitesses, vitesses))
+    produits = -np.einsum('ij,ij->i', vitesses, ecarts)
+    return (distances > 0) & (normes_v > 0) & (produits >= cos_demi_angle * normes_v * distances)
+
+
+def indices_visibles(position, vitesse, positions, vision_angle=60, rayon_max=5.0):
+    """Retourne les indices des positions visibles depuis un poisson (position, vitesse)."""
+    ecarts = np.asarray(position, dtype=float) - positions
+    distances = np.sqrt(np.einsum('ij,ij->i', ecarts, ecarts))
+    vitesses = np.broadcast_to(np.asarray(vitesse, dtype=float), ecarts.shape)
+    visibles = dans_cone(vitesses, ecarts, distances, vision_angle) & (distances <= rayon_max)
+    return np.flatnonzero(visibles)
+
+
+@profilage.chronometre('regles.vision')
+def regles_influence_visuelle(banc, vision_angle=60,
+                              rayon_repulsion=1.0, rayon_alignement=2.5, rayon_attraction=5.0,
+                              k_repulsion=0.05, k_alignement=0.03, k_attraction=0.01, Vmax=1.5,
+                              index=None, backend=None):
+    """
+    Applique les règles d'Aoki en ne gardant, pour chaque poisson, que les voisins
+    situés dans son cône de vision et à distance au plus rayon_attraction.
+    """
+    if len(banc) == 0:
+        return
+    if choisir_backend(backend, index, rayon_attraction) == 'numba':
+        pas_aoki(banc, rayon_repulsion, rayon_alignement, rayon_attraction,
+                 k_repulsion, k_alignement, k_attraction, Vmax, vision_angle,
+                 repliques=getattr(index, 'repliques', None))
+        return
+    i, j = choisir_index(index).paires(banc.positions, rayon_attraction, banc.boite)
+    ecarts, distances = ecarts_paires(banc.positions, i, j, banc.boite)
+    noter_plus_proches(banc, i, distances)
+    with profilage.phase('vision.cone'):
+        visibles = dans_cone(banc.vitesses[i], ecarts, distances, vision_angle)
+    i, j, ecarts, distances = i[visibles], j[visibles], ecarts[visibles], distances[visibles]
+    forces = forces_aoki(banc.vitesses, i, j, ecarts, distances,
+                         rayon_repulsion, rayon_alignement, rayon_attraction,
+                         k_repulsion, k_alignement, k_attraction)
+    banc.set_vitesses(banc.vitesses + forces, Vmax)
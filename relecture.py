@@ -0,0 +1,146 @@
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+from matplotlib.widgets import Slider
+from banc import Banc
+from rendu import RenduFleches, RenduPoints3D
+from trajectoire import LecteurTrajectoire
+
+""" Relecture d'une trajectoire enregistrée
+
+Rejoue une trajectoire écrite par trajectoire.EnregistreurTrajectoire sans
+refaire la simulation : vue 2D en flèches (comme Partie1 à Partie5) ou vue 3D
+en points (comme les scripts *_3D.py). Chaque image est recopiée dans un Banc
+affiché par rendu.RenduFleches ou rendu.RenduPoints3D, comme dans
+export_video.py : couleurs par état (palette) et points 3D projetés dans des
+tampons préalloués, sans liste Python par image.
+
+    python relecture.py DOSSIER [--saut K] [--vitesse X] [--debut T] [--max-points M]
+
+Commandes : espace = pause, flèches gauche/droite = reculer/avancer de 10
+images, +/- = accélérer/ralentir ; le curseur permet d'aller à une image.
+
+"""
+
+class Relecture:
+
+    def __init__(self, dossier, saut=1, vitesse=1.0, debut=0, intervalle=20, max_points=None):
+
+        self.lecteur = LecteurTrajectoire(dossier)
+        if len(self.lecteur) == 0:
+            raise ValueError(f"la trajectoire {dossier} ne contient aucune image")
+        self.saut, self.vitesse, self.intervalle = saut, vitesse, intervalle
+        self.t = debut % len(self.lecteur)
+        self.en_pause = False
+
+        # Le leader est le seul poisson contaminé de la première image
+        self.leader = self.lecteur.leader()
+        # Banc dans lequel chaque image est recopiée avant d'être dessinée
+        image = self.lecteur.image(self.t)
+        self.banc = Banc(image['positions'], image['vitesses'])
+        np.copyto(self.banc.contamines, image['contamines'])
+
+        if self.lecteur.dimension == 2:
+            self._creer_vue_2d()
+        else:
+            self._creer_vue_3d(max_points)
+
+        # Curseur de recherche d'image
+        axe_curseur = self.fig.add_axes([0.15, 0.02, 0.7, 0.02])
+        self.curseur = Slider(axe_curseur, 'Image', 0, len(self.lecteur) - 1,
+                              valinit=self.t, valstep=1)
+        self.curseur.on_changed(self._aller_a)
+        self.texte = self.fig.text(0.02, 0.97, '')
+        self.fig.canvas.mpl_connect('key_press_event', self._touche)
+        self.fig.canvas.mpl_connect('motion_notify_event', self._tourner)
+
+        self.animation = FuncAnimation(self.fig, self._avancer, interval=self._intervalle(),
+                                       cache_frame_data=False)
+
+    def _creer_vue_2d(self):
+        mins, maxs = self.lecteur.limites()
+        self.fig, self.ax = plt.subplots(figsize=(10, 10), facecolor='white')
+        self.ax.set_xlim(mins[0], maxs[0])
+        self.ax.set_ylim(mins[1], maxs[1])
+        self.ax.set_title(f"Relecture : {self.lecteur.parametres.get('modele', 'trajectoire')}")
+        self.ax.set_xlabel('X')
+        self.ax.set_ylabel('Y')
+        self.ax.set_facecolor('white')
+        for spine in self.ax.spines.values():
+            spine.set_visible(True)
+            spine.set_color('black')
+        # Flèches colorées selon l'état (leader=rouge, contaminés=vert, non-contaminés=bleu)
+        self.rendu = RenduFleches(self.ax, self.banc, leader=self.leader)
+
+    def _creer_vue_3d(self, max_points=None):
+        mins, maxs = self.lecteur.limites()
+        self.fig = plt.figure(figsize=(10, 8))
+        self.ax = self.fig.add_subplot(111, projection='3d')
+        self.ax.set_xlim(mins[0], maxs[0])
+        self.ax.set_ylim(mins[1], maxs[1])
+        self.ax.set_zlim(mins[2], maxs[2])
+        self.ax.set_title(f"Relecture 3D : {self.lecteur.parametres.get('modele', 'trajectoire')}")
+        self.ax.set_xlabel('X')
+        self.ax.set_ylabel('Y')
+        self.ax.set_zlabel('Z')
+        # Points projetés avec la matrice de vue de l'axe, même palette qu'en 2D
+        self.rendu = RenduPoints3D(self.ax, self.banc, leader=self.leader, max_points=max_points)
+
+    def _intervalle(self):
+        return max(1, int(self.intervalle / self.vitesse))
+
+    def afficher_image(self, t):
+        """Met à jour les objets graphiques avec l'image t."""
+        self.t = int(t) % len(self.lecteur)
+        image = self.lecteur.image(self.t)
+        np.copyto(self.banc.positions, image['positions'])
+        np.copyto(self.banc.vitesses, image['vitesses'])
+        np.copyto(self.banc.contamines, image['contamines'])
+        self.rendu.mettre_a_jour()
+        nb_contamines = int(np.count_nonzero(self.banc.contamines))
+        self.texte.set_text(f"Pas {int(image['pas'])}  (image {self.t + 1}/{len(self.lecteur)}, "
+                            f"x{self.vitesse:g})  Poissons contaminés: {nb_contamines}/{self.lecteur.n}")
+
+    def _avancer(self, _):
+        if not self.en_pause:
+            # Met à jour le curseur, qui appelle afficher_image
+            self.curseur.set_val((self.t + self.saut) % len(self.lecteur))
+
+    def _aller_a(self, valeur):
+        self.afficher_image(valeur)
+        self.fig.canvas.draw_idle()
+
+    def _tourner(self, evenement):
+        # En pause, les points 3D sont reprojetés quand la vue est tournée à la souris
+        if self.en_pause and self.lecteur.dimension == 3 and evenement.button is not None:
+            self.rendu.mettre_a_jour()
+
+    def _touche(self, evenement):
+        if evenement.key == ' ':
+            self.en_pause = not self.en_pause
+        elif evenement.key in ('right', 'left'):
+            decalage = 10 * self.saut if evenement.key == 'right' else -10 * self.saut
+            self.curseur.set_val((self.t + decalage) % len(self.lecteur))
+        elif evenement.key in ('+', '-'):
+            self.vitesse = self.vitesse * 2 if evenement.key == '+' else self.vitesse / 2
+            self.animation.event_source.interval = self._intervalle()
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Relecture d'une trajectoire enregistrée")
+    parser.add_argument('dossier', help='dossier de la trajectoire')
+    parser.add_argument('--saut', type=int, default=1, help="nombre d'images avancées à chaque affichage")
+    parser.add_argument('--vitesse', type=float, default=1.0, help='facteur de vitesse de lecture')
+    parser.add_argument('--debut', type=int, default=0, help='première image affichée')
+    parser.add_argument('--max-points', type=int, default=None,
+                        help='nombre maximal de poissons dessinés en 3D (le leader est toujours affiché)')
+    args = parser.parse_args(arguments)
+
+    relecture = Relecture(args.dossier, args.saut, args.vitesse, args.debut, max_points=args.max_points)
+    plt.show()
+    return relecture
+
+
+if __name__ == '__main__':
+    main()
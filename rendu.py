@@ -0,0 +1,158 @@
+import numpy as np
+import matplotlib as mpl
+from matplotlib.collections import PathCollection
+from matplotlib.colors import ListedColormap, Normalize, to_rgba_array
+from matplotlib.markers import MarkerStyle
+from matplotlib.transforms import IdentityTransform
+
+""" Rendu des animations
+
+RenduFleches dessine un banc 2D sous forme de flèches (quiver) en lisant
+directement les tableaux du Banc : les directions normalisées et les états de
+couleur sont calculés dans des tampons préalloués, sans liste Python ni
+tableau temporaire par image. La couleur de chaque poisson est un état entier
+(0 sain, 1 contaminé, 2 leader) converti par une palette (colormap).
+
+RenduPoints3D dessine un banc 3D sans redessiner les axes 3D à chaque image :
+les positions sont projetées avec la matrice de vue de l'axe (ax.get_proj())
+et affichées par un nuage de points 2D déjà projeté, compatible avec
+blit=True. Le tri par profondeur et l'atténuation des points éloignés
+reproduisent l'aspect de ax.scatter ; max_points limite le nombre de points
+dessinés pour les très grands bancs (le leader est toujours affiché).
+
+Les scripts PartieN.py font sous_pas pas de simulation par image affichée,
+pour que les grands bancs restent fluides.
+
+"""
+
+SAIN, CONTAMINE, LEADER = 0, 1, 2
+COULEURS = ('blue', 'green', 'red')
+
+
+class RenduFleches:
+
+    def __init__(self, ax, banc, leader=None, couleurs=COULEURS, **options):
+
+        self.banc = banc
+        self.leader = leader
+        n = len(banc)
+        self._normes = np.empty(n)
+        self._directions = np.empty((n, 2))
+        self.etats = np.zeros(n)
+        self._calculer()
+        options = dict(dict(width=0.005, scale=30, pivot='mid'), **options)
+        self.fleches = ax.quiver(banc.positions[:, 0], banc.positions[:, 1],
+                                 self._directions[:, 0], self._directions[:, 1], self.etats,
+                                 cmap=ListedColormap(couleurs), norm=Normalize(-0.5, len(couleurs) - 0.5),
+                                 **options)
+
+    def _calculer(self):
+        """Directions normalisées et états de couleur, écrits dans les tampons."""
+        vitesses = self.banc.vitesses
+        np.einsum('ij,ij->i', vitesses, vitesses, out=self._normes)
+        np.sqrt(self._normes, out=self._normes)
+        # Une vitesse nulle donne une direction nulle
+        np.maximum(self._normes, np.finfo(float).tiny, out=self._normes)
+        np.divide(vitesses, self._normes[:, None], out=self._directions)
+        np.copyto(self.etats, self.banc.contamines)
+        if self.leader is not None:
+            self.etats[self.leader] = LEADER
+
+    def mettre_a_jour(self):
+        """Recopie l'état courant du banc dans les flèches et les retourne."""
+        self._calculer()
+        self.fleches.set_offsets(self.banc.positions)
+        self.fleches.set_UVC(self._directions[:, 0], self._directions[:, 1], self.etats)
+        return self.fleches
+
+
+def indices_affiches(n, max_points=None, leader=None):
+    """
+    Indices des poissons dessinés : None (tous) si n <= max_points, sinon
+    max_points indices régulièrement espacés auxquels s'ajoute le leader.
+    """
+    if max_points is None or n <= max_points:
+        return None
+    indices = np.linspace(0, n - 1, max_points).round().astype(np.intp)
+    if leader is not None:
+        indices = np.append(indices, leader)
+    return np.unique(indices)
+
+
+class _PointsProjetes(PathCollection):
+    """Nuage de points 2D déjà projetés, ajouté à un axe 3D qui n'a qu'à lire leur profondeur."""
+
+    profondeur = 0.0
+
+    def do_3d_projection(self):
+        return self.profondeur
+
+
+class RenduPoints3D:
+
+    def __init__(self, ax, banc, leader=None, couleurs=COULEURS, max_points=None, ombrage=True,
+                 marker='o', s=50, **options):
+
+        self.ax, self.banc, self.ombrage = ax, banc, ombrage
+        self.indices = indices_affiches(len(banc), max_points, leader)
+        if self.indices is None:
+            m, self.leader = len(banc), leader
+        else:
+            m = len(self.indices)
+            self.leader = None if leader is None else int(np.searchsorted(self.indices, leader))
+            self._positions = np.empty((m, 3))
+            self._contamines = np.empty(m, dtype=bool)
+        self._palette = to_rgba_array(couleurs)
+        self._projetes = np.empty((m, 4))  # x, y, profondeur, w
+        self._etats = np.empty(m, dtype=np.intp)
+        self._couleurs = np.empty((m, 4))
+        self._alpha = np.empty(m)
+
+        style = MarkerStyle(marker)
+        options = dict(dict(edgecolors='face', linewidths=mpl.rcParams['lines.linewidth']), **options)
+        self.points = _PointsProjetes((style.get_path().transformed(style.get_transform()),), sizes=(s,),
+                                     offsets=np.empty((0, 2)), offset_transform=ax.transData, **options)
+        self.points.set_transform(IdentityTransform())
+        ax.add_collection(self.points, autolim=False)
+        self.mettre_a_jour()
+
+    def _calculer(self):
+        """Projection des positions et couleurs des points dessinés, dans les tampons."""
+        if self.indices is None:
+            positions = self.banc.positions
+            np.copyto(self._etats, self.banc.contamines)
+        else:
+            positions = np.take(self.banc.positions, self.indices, axis=0, out=self._positions)
+            np.copyto(self._etats, np.take(self.banc.contamines, self.indices, out=self._contamines))
+        if self.leader is not None:
+            self._etats[self.leader] = LEADER
+
+        # Coordonnées homogènes projetées : (x, y, z, w) = M @ (position, 1)
+        M = self.ax.get_proj()
+        np.matmul(positions, M[:, :3].T, out=self._projetes)
+        self._projetes += M[:, 3]
+        self._projetes[:, :3] /= self._projetes[:, 3:]
+
+        np.take(self._palette, self._etats, axis=0, out=self._couleurs)
+        if self.ombrage and len(self._projetes):
+            # Comme ax.scatter(depthshade=True) : les points éloignés deviennent transparents
+            xyz = self._projetes[:, :3]
+            echelle = np.sqrt(np.sum(np.ptp(xyz, axis=0) ** 2))
+            if echelle > 0:
+                profondeur = self._projetes[:, 2]
+                np.subtract(profondeur, profondeur.min(), out=self._alpha)
+                self._alpha /= -echelle
+                self._alpha += 1
+                np.clip(self._alpha, 0.3, 1, out=self._alpha)
+                self._couleurs[:, 3] *= self._alpha
+
+    def mettre_a_jour(self):
+        """Reprojette l'état courant du banc et retourne le nuage de points."""
+        self._calculer()
+        # Les points les plus éloignés sont dessinés en premier
+        ordre = np.argsort(self._projetes[:, 2])[::-1]
+        self.points.set_offsets(self._projetes[ordre, :2])
+        self.points.set_facecolor(self._couleurs[ordre])
+        if len(ordre):
+            self.points.profondeur = self._projetes[ordre[-1], 2]
+        return self.points
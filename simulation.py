@@ -0,0 +1,374 @@
+import argparse
+import json
+import time
+import numpy as np
+import profilage
+from banc import Banc
+from bassin import BASSINS, bassin_predefini
+from contamination import Cascade, bilan_cascade, contaminer_banc, resume_cascade
+from ensemble import IndexEnsemble, observables_repliques
+from observables import SuiviObservables
+from noyaux import BACKENDS, choisir_backend, pas_aoki, prechauffer
+from perturbations import Perturbations
+from trajectoire import EnregistreurTrajectoire
+from regles import regles_aoki, regles_influence_visuelle, regles_k_voisins
+from voisinage import INDEX, ListeVerlet, choisir_index
+
+""" Simulation sans affichage
+
+Fait avancer l'un des cinq modèles (Parties 1 à 5) en 2D ou en 3D sans importer
+matplotlib, puis écrit l'état final sur disque. Exemple :
+
+    python -m banc run --modele aoki --n 100000 --pas 5000 --sortie aoki.npz
+
+"""
+
+MODELES = ('aleatoire', 'contamination', 'aoki', 'voisins', 'vision')
+
+# Paramètres par défaut repris des scripts PartieN.py (2D) et PartieN_3D.py (3D)
+PARAMETRES_DEFAUT = {
+    ('aleatoire', 2): dict(n=20, taille=10.0, dt=0.05, Vmin=-1, Vmax_initiale=1),
+    ('aleatoire', 3): dict(n=20, taille=100.0, dt=0.1, Vmin=-10, Vmax_initiale=10),
+    ('contamination', 2): dict(n=20, taille=10.0, dt=0.05, Vmin=-1, Vmax_initiale=1,
+                               distance_contamination=0.7, variation_norme=True,
+                               pas_de_variation_norme=0.05),
+    ('contamination', 3): dict(n=20, taille=100.0, dt=0.1, Vmin=-10, Vmax_initiale=10,
+                               distance_contamination=25.0, variation_norme=True,
+                               pas_de_variation_norme=0.05),
+    ('aoki', 2): dict(n=50, taille=100.0, dt=0.05, Vmin=-0.5, Vmax_initiale=0.5,
+                      rayon_repulsion=1.5, rayon_alignement=3.5, rayon_attraction=5.0,
+                      k_repulsion=0.05, k_alignement=0.03, k_attraction=0.01, vitesse_max=1.5),
+    ('aoki', 3): dict(n=50, taille=100.0, dt=0.1, Vmin=-15, Vmax_initiale=15,
+                      rayon_repulsion=30.0, rayon_alignement=70.0, rayon_attraction=200.0,
+                      k_repulsion=0.05, k_alignement=0.03, k_attraction=0.01, vitesse_max=20.0),
+    ('voisins', 2): dict(n=50, taille=20.0, dt=0.05, Vmin=-0.5, Vmax_initiale=0.5, nb_voisins=6,
+                         rayon_repulsion=1.0, rayon_alignement=2.5, rayon_attraction=5.0,
+                         k_repulsion=0.05, k_alignement=0.03, k_attraction=0.01, vitesse_max=1.5),
+    ('voisins', 3): dict(n=50, taille=200.0, dt=0.1, Vmin=-5, Vmax_initiale=5, nb_voisins=6,
+                         rayon_repulsion=10.0, rayon_alignement=25.0, rayon_attraction=50.0,
+                         k_repulsion=0.05, k_alignement=0.03, k_attraction=0.01, vitesse_max=15.0),
+    ('vision', 2): dict(n=30, taille=20.0, dt=0.05, Vmin=-1.5, Vmax_initiale=1.5, vision_angle=60,
+                        rayon_repulsion=1.0, rayon_alignement=2.5, rayon_attraction=5.0,
+                        k_repulsion=0.05, k_alignement=0.09, k_attraction=0.01, vitesse_max=1.5),
+    ('vision', 3): dict(n=50, taille=50.0, dt=0.1, Vmin=-5, Vmax_initiale=5, vision_angle=60,
+                        rayon_repulsion=10.0, rayon_alignement=25.0, rayon_attraction=50.0,
+                        k_repulsion=0.05, k_alignement=0.10, k_attraction=0.01, vitesse_max=20.0),
+}
+
+# Paramètres des prédateurs et obstacles (perturbations.py), ajoutés à ceux du modèle s'il y en a
+PARAMETRES_PERTURBATIONS = {
+    2: dict(rayon_fuite=5.0, k_fuite=0.2, rayon_obstacles=3.0, k_obstacles=0.2,
+            k_poursuite=0.1, vitesse_max_predateurs=1.2),
+    3: dict(rayon_fuite=50.0, k_fuite=2.0, rayon_obstacles=30.0, k_obstacles=2.0,
+            k_poursuite=1.0, vitesse_max_predateurs=12.0),
+}
+
+# Évitement des parois d'un bassin de forme quelconque (bassin.py)
+PARAMETRES_BASSIN = {
+    2: dict(distance_evitement=1.0, k_evitement=0.1),
+    3: dict(distance_evitement=10.0, k_evitement=1.0),
+}
+
+
+def parametres_modele(modele, dimension=2, n=None, **parametres):
+    """
+    Retourne les paramètres complets d'un modèle.
+
+    Si n est donné sans taille de bassin, le côté du bassin est agrandi d'un
+    facteur (n / n_script) ** (1 / dimension) pour garder la densité du script
+    d'origine.
+    """
+    if (modele, dimension) not in PARAMETRES_DEFAUT:
+        raise ValueError(f"modèle inconnu : {modele} en dimension {dimension}")
+    resultat = dict(PARAMETRES_DEFAUT[(modele, dimension)])
+    if n is not None:
+        if 'taille' not in parametres:
+            resultat['taille'] *= (n / resultat['n']) ** (1 / dimension)
+        resultat['n'] = n
+    resultat.update(parametres)
+    resultat['modele'], resultat['dimension'] = modele, dimension
+    return resultat
+
+
+class Simulation:
+    """
+    Simulation sans affichage d'un modèle. Avec repliques = R > 1, R bancs
+    indépendants de n poissons sont simulés ensemble (voir ensemble.py) :
+    le banc contient alors R * n lignes, une réplique après l'autre. Avec
+    verlet = peau, les paires de voisins sont gardées d'un pas à l'autre dans
+    une liste de Verlet (voisinage.ListeVerlet). Avec periodique = True, le
+    bassin est un tore (Banc.rendre_periodique) au lieu d'avoir des murs.
+    predateurs et obstacles ajoutent des perturbations externes placées au
+    hasard (perturbations.py) ; elles ne sont possibles qu'avec une réplique.
+    bassin est le nom d'un bassin de forme quelconque inscrit dans la boîte
+    (bassin.bassin_predefini : 'disque', 'cylindre', 'polygone', 'rochers'...).
+    Le modèle contamination note sa cascade (qui a contaminé qui et quand) dans
+    self.cascade (contamination.Cascade).
+    """
+
+    def __init__(self, modele='aoki', dimension=2, n=None, index=None, repliques=1, graine=None,
+                 backend=None, verlet=None, periodique=False, predateurs=0, obstacles=0, bassin=None, **parametres):
+
+        if predateurs or obstacles:
+            if repliques > 1:
+                raise ValueError("les prédateurs et obstacles ne sont possibles qu'avec une seule réplique")
+            parametres = dict(PARAMETRES_PERTURBATIONS[dimension], **parametres)
+        if bassin is not None:
+            if periodique:
+                raise ValueError("un bassin de forme quelconque n'est pas compatible avec un domaine périodique")
+            parametres = dict(PARAMETRES_BASSIN[dimension], **parametres)
+        self.parametres = parametres_modele(modele, dimension, n, **parametres)
+        self.modele, self.dimension = modele, dimension
+        self.repliques, self.periodique, self.bassin = repliques, periodique, bassin
+        # Générateur unique de la simulation : graine entière, SeedSequence ou Generator
+        self.generateur = np.random.default_rng(graine)
+        p = self.parametres
+        # Index de voisinage conservé d'un pas à l'autre ('kdtree' par défaut, ou 'grille')
+        self.index = choisir_index(index)
+        if repliques > 1:
+            self.index = IndexEnsemble(repliques, p['n'], self.index)
+        if verlet is not None:
+            self.index = ListeVerlet(verlet, self.index)
+        # Noyau compilé des modèles aoki et vision : il cherche ses voisins lui-même, il n'est donc
+        # pris par défaut que si ni index ni liste de Verlet n'est demandé (noyaux.choisir_backend)
+        index_demande = index if verlet is None else self.index
+        self.backend = choisir_backend(backend, index_demande, p.get('rayon_attraction'))
+        if modele not in ('aoki', 'vision'):
+            self.backend = 'numpy'
+        if self.backend == 'numba':
+            # Compilation (ou chargement du cache) hors du temps mesuré par executer
+            prechauffer(dimension)
+        # Index transmis aux règles : le noyau numba ne se sert que des répliques d'un IndexEnsemble
+        self._index_regles = self.index if self.backend == 'numpy' or repliques > 1 else None
+        self.mins = np.zeros(dimension)
+        self.maxs = np.full(dimension, float(p['taille']))
+        self.banc = Banc.aleatoire(repliques * p['n'], self.mins, self.maxs, p['Vmin'], p['Vmax_initiale'],
+                                   self.generateur)
+        if periodique:
+            self.banc.rendre_periodique(self.mins, self.maxs)
+        if bassin is not None:
+            # Grille de distance signée lue dans le cache si elle a déjà été calculée
+            forme = bassin_predefini(bassin, self.mins, self.maxs, distance_evitement=p['distance_evitement'],
+                                     k_evitement=p['k_evitement'])
+            self.banc.positions[...] = forme.tirer_positions(len(self.banc), self.generateur)
+            self.banc.utiliser_bassin(forme)
+        self.perturbations = None
+        if predateurs or obstacles:
+            self.perturbations = Perturbations.aleatoire(
+                predateurs, obstacles, self.mins, self.maxs, p['Vmin'], p['Vmax_initiale'], self.generateur,
+                rayon_fuite=p['rayon_fuite'], k_fuite=p['k_fuite'], rayon_obstacles=p['rayon_obstacles'],
+                k_obstacles=p['k_obstacles'], k_poursuite=p['k_poursuite'],
+                vitesse_max=p['vitesse_max_predateurs'])
+            if periodique:
+                self.perturbations.rendre_periodique(self.mins, self.maxs)
+            if bassin is not None:
+                self.perturbations.predateurs.utiliser_bassin(self.banc.bassin)
+        self.pas = 0
+
+        self.leader = None
+        self.cascade = None
+        if modele == 'contamination':
+            # Sélection aléatoire du leader de chaque réplique
+            self.leader = np.arange(repliques) * p['n'] + self.generateur.integers(p['n'], size=repliques)
+            if repliques == 1:
+                self.leader = int(self.leader[0])
+            self.banc.contamines[self.leader] = True
+            self.cascade = Cascade(self.banc.contamines)
+
+    def etape(self):
+        """Avance la simulation d'un pas de temps."""
+        with profilage.phase('pas'):
+            self._avancer()
+        self.pas += 1
+        profilage.fin_pas()
+
+    def _avancer(self):
+        p = self.parametres
+        if self.perturbations is not None:
+            # Fuite des poissons et poursuite calculées sur les positions du début du pas
+            self.perturbations.appliquer(self.banc, p.get('vitesse_max'))
+            self.perturbations.avancer(p['dt'], self.mins, self.maxs)
+        if self.backend == 'numba' and self.modele in ('aoki', 'vision') and self.bassin is None:
+            # Règles, déplacement et rebonds en une seule passe compilée
+            pas_aoki(self.banc, p['rayon_repulsion'], p['rayon_alignement'], p['rayon_attraction'],
+                     p['k_repulsion'], p['k_alignement'], p['k_attraction'], p['vitesse_max'],
+                     p['vision_angle'] if self.modele == 'vision' else None,
+                     getattr(self.index, 'repliques', None), p['dt'], self.mins, self.maxs)
+            return
+        if self.modele == 'contamination':
+            contaminer_banc(self.banc, p['distance_contamination'], p['pas_de_variation_norme'],
+                            p['variation_norme'], index=self.index, generateur=self.generateur,
+                            cascade=self.cascade)
+        elif self.modele == 'aoki':
+            regles_aoki(self.banc, p['rayon_repulsion'], p['rayon_alignement'], p['rayon_attraction'],
+                        p['k_repulsion'], p['k_alignement'], p['k_attraction'], p['vitesse_max'],
+                        index=self._index_regles, backend=self.backend)
+        elif self.modele == 'voisins':
+            regles_k_voisins(self.banc, p['nb_voisins'],
+                             p['rayon_repulsion'], p['rayon_alignement'], p['rayon_attraction'],
+                             p['k_repulsion'], p['k_alignement'], p['k_attraction'], p['vitesse_max'],
+                             index=self.index)
+        elif self.modele == 'vision':
+            regles_influence_visuelle(self.banc, p['vision_angle'],
+                                      p['rayon_repulsion'], p['rayon_alignement'], p['rayon_attraction'],
+                                      p['k_repulsion'], p['k_alignement'], p['k_attraction'], p['vitesse_max'],
+                                      index=self._index_regles, backend=self.backend)
+
+        self.banc.deplacer(p['dt'])
+        self.banc.verifier_bords(self.mins, self.maxs, p.get('vitesse_max'))
+
+    def executer(self, nb_pas, enregistreur=None, suivi=None):
+        """
+        Fait nb_pas pas de temps et retourne la durée écoulée en secondes.
+        Si un enregistreur de trajectoire est donné, l'état initial puis l'état
+        après chaque pas lui sont transmis. Si un suivi d'observables est donné
+        (observables.SuiviObservables), il mesure le banc après chaque pas
+        multiple de son intervalle. Le noyau numba étant compilé dès le
+        constructeur, la durée ne comprend pas ce temps de compilation.
+        """
+        debut = time.perf_counter()
+        if enregistreur is not None and self.pas == 0:
+            enregistreur.enregistrer(self.pas, self.banc)
+        for _ in range(nb_pas):
+            self.etape()
+            if enregistreur is not None:
+                enregistreur.enregistrer(self.pas, self.banc)
+            if suivi is not None:
+                with profilage.phase('observables'):
+                    suivi.mettre_a_jour(self.pas, self.banc)
+        return time.perf_counter() - debut
+
+    @property
+    def nom_index(self):
+        """Nom de l'index de voisinage réellement utilisé ('numba' : grille de cellules du noyau compilé)."""
+        if self.backend == 'numba':
+            return 'numba'
+        index = self.index
+        while isinstance(index, (IndexEnsemble, ListeVerlet)):
+            index = index.index
+        return next((nom for nom, classe in INDEX.items() if isinstance(index, classe)), type(index).__name__)
+
+    def observables(self):
+        """Observables de chaque réplique (tableaux de longueur repliques)."""
+        return observables_repliques(self.banc, self.repliques)
+
+    def bilan_cascade(self):
+        """Métriques de la cascade de contamination de chaque réplique (vitesse du front, branchement)."""
+        return bilan_cascade(self.cascade, self.repliques, self.parametres['dt'])
+
+    def suivi(self, tous_les=1, **options):
+        """Crée un suivi des observables en continu adapté à cette simulation (une valeur par réplique)."""
+        return SuiviObservables(tous_les, self.repliques, **options)
+
+    def enregistreur(self, dossier, tous_les=1, **options):
+        """Crée un enregistreur de trajectoire adapté à cette simulation."""
+        return EnregistreurTrajectoire(dossier, len(self.banc), self.dimension, self.parametres['dt'],
+                                       tous_les, dict(self.parametres, repliques=self.repliques,
+                                                      periodique=self.periodique, bassin=self.bassin),
+                                       **options)
+
+    def sauvegarder(self, chemin):
+        """Écrit l'état courant du banc, les paramètres et la cascade de contamination dans un fichier .npz."""
+        cascade = self.cascade.tableaux() if self.cascade is not None else {}
+        np.savez(chemin, positions=self.banc.positions, vitesses=self.banc.vitesses,
+                 contamines=self.banc.contamines, pas=self.pas, repliques=self.repliques,
+                 periodique=self.periodique, bassin=self.bassin or '', parametres=json.dumps(self.parametres),
+                 **self._etat_perturbations(), **cascade)
+
+    def _etat_perturbations(self):
+        """Positions et vitesses des prédateurs et positions des obstacles à sauvegarder."""
+        etat = {}
+        if self.perturbations is not None and self.perturbations.predateurs is not None:
+            etat['predateurs_positions'] = self.perturbations.predateurs.positions
+            etat['predateurs_vitesses'] = self.perturbations.predateurs.vitesses
+        if self.perturbations is not None and self.perturbations.obstacles is not None:
+            etat['obstacles'] = self.perturbations.obstacles
+        return etat
+
+
+def _valeur(texte):
+    """Convertit la valeur d'un --param cle=valeur en nombre ou booléen si possible."""
+    try:
+        return json.loads(texte)
+    except ValueError:
+        return texte
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog='python -m banc',
+                                     description='Simulation de banc de poissons sans affichage')
+    commandes = parser.add_subparsers(dest='commande', required=True)
+
+    run = commandes.add_parser('run', help='exécute un modèle et écrit le résultat sur disque')
+    run.add_argument('--modele', '--model', choices=MODELES, default='aoki')
+    run.add_argument('--dimension', '--dim', type=int, choices=(2, 3), default=2)
+    run.add_argument('--n', type=int, default=None, help='nombre de poissons')
+    run.add_argument('--index', choices=tuple(INDEX), default=None,
+                     help='index de voisinage (kdtree par défaut ; impose le backend numpy aux modèles aoki '
+                          'et vision)')
+    run.add_argument('--backend', choices=BACKENDS, default=None,
+                     help='noyaux des modèles aoki et vision (numba par défaut s\'il est installé et '
+                          'qu\'aucun index ni liste de Verlet n\'est demandé)')
+    run.add_argument('--verlet', type=float, default=None, metavar='PEAU',
+                     help='garde les paires de voisins dans une liste de Verlet de peau PEAU')
+    run.add_argument('--periodique', action='store_true',
+                     help='bassin périodique (tore) au lieu de murs réfléchissants')
+    run.add_argument('--bassin', choices=BASSINS, default=None,
+                     help='bassin de forme quelconque inscrit dans la boîte (murs de la boîte par défaut)')
+    run.add_argument('--predateurs', type=int, default=0, help='nombre de prédateurs qui poursuivent le banc')
+    run.add_argument('--obstacles', type=int, default=0, help='nombre d\'obstacles fixes que le banc évite')
+    run.add_argument('--repliques', type=int, default=1, help='nombre de bancs indépendants simulés ensemble')
+    run.add_argument('--pas', '--steps', type=int, default=500, help='nombre de pas de temps')
+    run.add_argument('--graine', '--seed', type=int, default=None)
+    run.add_argument('--param', action='append', default=[], metavar='CLE=VALEUR',
+                     help='remplace un paramètre du modèle (ex. k_alignement=0.05)')
+    run.add_argument('--sortie', '--output', default='simulation.npz')
+    run.add_argument('--trajectoire', default=None, metavar='DOSSIER',
+                     help='enregistre la trajectoire dans ce dossier')
+    run.add_argument('--profil', default=None, metavar='FICHIER',
+                     help='chronomètre chaque phase du pas et écrit le rapport JSON dans ce fichier')
+    run.add_argument('--observables', type=int, default=None, metavar='K',
+                     help='mesure les observables tous les K pas et en résume moyennes, écarts-types '
+                          'et distribution des distances au plus proche voisin')
+    run.add_argument('--tous-les', type=int, default=1, metavar='K',
+                     help='enregistre une image tous les K pas')
+    args = parser.parse_args(arguments)
+
+    parametres = dict(texte.split('=', 1) for texte in args.param)
+    parametres = {cle: _valeur(valeur) for cle, valeur in parametres.items()}
+
+    simulation = Simulation(args.modele, args.dimension, args.n, args.index, args.repliques, args.graine,
+                            args.backend, args.verlet, args.periodique, args.predateurs, args.obstacles,
+                            args.bassin, **parametres)
+    suivi = simulation.suivi(args.observables) if args.observables is not None else None
+    if args.profil is not None:
+        profilage.activer()
+    if args.trajectoire is not None:
+        with simulation.enregistreur(args.trajectoire, args.tous_les) as enregistreur:
+            duree = simulation.executer(args.pas, enregistreur, suivi)
+    else:
+        duree = simulation.executer(args.pas, suivi=suivi)
+    simulation.sauvegarder(args.sortie)
+    if args.profil is not None:
+        profilage.desactiver().ecrire_rapport(args.profil)
+
+    resume = {'modele': args.modele, 'dimension': args.dimension, 'n': simulation.parametres['n'],
+              'index': simulation.nom_index, 'backend': simulation.backend, 'periodique': args.periodique,
+              'bassin': args.bassin,
+              'pas': simulation.pas, 'duree': duree,
+              'pas_par_seconde': simulation.pas / duree if duree > 0 else float('inf'),
+              'sortie': args.sortie}
+    if simulation.perturbations is not None:
+        resume['predateurs'], resume['obstacles'] = args.predateurs, args.obstacles
+    if args.verlet is not None:
+        resume['verlet'] = simulation.index.statistiques()
+    if suivi is not None:
+        resume['observables'] = suivi.bilan()
+    if simulation.cascade is not None:
+        resume['cascade'] = resume_cascade(simulation.cascade, simulation.repliques, simulation.parametres['dt'])
+    if args.repliques > 1:
+        observables = simulation.observables()
+        resume['repliques'] = args.repliques
+        resume.update({nom + '_moyenne': float(valeurs.mean()) for nom, valeurs in observables.items()})
+    print(json.dumps(resume))
+    return resume
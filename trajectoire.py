@@ -0,0 +1,213 @@
+import json
+import os
+import queue
+import threading
+import numpy as np
+import profilage
+
+""" Enregistrement des trajectoires sur disque
+
+Une trajectoire est un dossier contenant :
+- entete.json : N, D, dt, tous_les (une image tous les k pas), paramètres du
+  modèle, nombre d'images écrites et taille des morceaux ;
+- des morceaux positions_00000.npy, vitesses_00000.npy, contamines_00000.npy,
+  pas_00000.npy, chacun préalloué pour images_par_morceau images et rempli
+  via np.memmap.
+
+L'enregistreur copie l'état du banc dans un tampon puis un fil d'exécution
+séparé l'écrit sur disque, pour ne pas bloquer la boucle de simulation. Le
+lecteur ouvre les morceaux en mémoire paginée : seules les images demandées
+sont lues.
+
+"""
+
+CHAMPS = ('positions', 'vitesses', 'contamines', 'pas')
+
+
+def _nom_morceau(champ, numero):
+    return f'{champ}_{numero:05d}.npy'
+
+
+class EnregistreurTrajectoire:
+
+    def __init__(self, dossier, n, dimension, dt, tous_les=1, parametres=None,
+                 images_par_morceau=1024, dtype=np.float64, asynchrone=True, taille_file=8):
+
+        self.dossier = dossier
+        self.n, self.dimension, self.tous_les = n, dimension, tous_les
+        self.images_par_morceau = images_par_morceau
+        self.dtype = np.dtype(dtype)
+        self.nb_images = 0
+        self._morceaux = None
+        self._erreur = None
+        os.makedirs(dossier, exist_ok=True)
+        self.entete = {'n': n, 'dimension': dimension, 'dt': dt, 'tous_les': tous_les,
+                       'dtype': self.dtype.name, 'images_par_morceau': images_par_morceau,
+                       'nb_images': 0, 'parametres': parametres or {}}
+        self._ecrire_entete()
+
+        # Tampons préalloués circulant entre la boucle de simulation et le fil d'écriture
+        self.asynchrone = asynchrone
+        if asynchrone:
+            self._libres = queue.Queue()
+            for _ in range(taille_file):
+                self._libres.put(self._nouveau_tampon())
+            self._a_ecrire = queue.Queue()
+            self._fil = threading.Thread(target=self._boucle_ecriture, daemon=True)
+            self._fil.start()
+        else:
+            self._tampon = self._nouveau_tampon()
+
+    def _nouveau_tampon(self):
+        return {'positions': np.empty((self.n, self.dimension), dtype=self.dtype),
+                'vitesses': np.empty((self.n, self.dimension), dtype=self.dtype),
+                'contamines': np.empty(self.n, dtype=bool),
+                'pas': np.zeros((), dtype=np.int64)}
+
+    def _ecrire_entete(self):
+        chemin = os.path.join(self.dossier, 'entete.json')
+        with open(chemin + '.tmp', 'w') as fichier:
+            json.dump(self.entete, fichier, indent=2)
+        os.replace(chemin + '.tmp', chemin)
+
+    def _ouvrir_morceau(self, numero):
+        """Préalloue les fichiers du morceau numero et les ouvre en mémoire paginée."""
+        formes = {'positions': ((self.images_par_morceau, self.n, self.dimension), self.dtype),
+                  'vitesses': ((self.images_par_morceau, self.n, self.dimension), self.dtype),
+                  'contamines': ((self.images_par_morceau, self.n), bool),
+                  'pas': ((self.images_par_morceau,), np.int64)}
+        self._morceaux = {champ: np.lib.format.open_memmap(
+                              os.path.join(self.dossier, _nom_morceau(champ, numero)),
+                              mode='w+', dtype=dtype, shape=forme)
+                          for champ, (forme, dtype) in formes.items()}
+
+    def _ecrire(self, tampon):
+        """Écrit un tampon comme image suivante de la trajectoire."""
+        numero, rang = divmod(self.nb_images, self.images_par_morceau)
+        if rang == 0:
+            self._fermer_morceau()
+            self._ouvrir_morceau(numero)
+        for champ in CHAMPS:
+            self._morceaux[champ][rang] = tampon[champ]
+        self.nb_images += 1
+
+    def _fermer_morceau(self):
+        if self._morceaux is not None:
+            for tableau in self._morceaux.values():
+                tableau.flush()
+            self._morceaux = None
+            self.entete['nb_images'] = self.nb_images
+            self._ecrire_entete()
+
+    def _boucle_ecriture(self):
+        while True:
+            tampon = self._a_ecrire.get()
+            if tampon is None:
+                return
+            try:
+                if self._erreur is None:
+                    self._ecrire(tampon)
+            except Exception as erreur:
+                self._erreur = erreur
+            finally:
+                self._libres.put(tampon)
+
+    def _verifier(self):
+        if self._erreur is not None:
+            raise RuntimeError("échec de l'écriture de la trajectoire") from self._erreur
+
+    @profilage.chronometre('enregistrement')
+    def enregistrer(self, pas, banc):
+        """Enregistre l'état du banc si pas est un multiple de tous_les."""
+        if pas % self.tous_les != 0:
+            return
+        self._verifier()
+        tampon = self._libres.get() if self.asynchrone else self._tampon
+        tampon['positions'][...] = banc.positions
+        tampon['vitesses'][...] = banc.vitesses
+        tampon['contamines'][...] = banc.contamines
+        tampon['pas'][...] = pas
+        if self.asynchrone:
+            self._a_ecrire.put(tampon)
+        else:
+            self._ecrire(tampon)
+
+    def fermer(self):
+        """Attend la fin des écritures et met à jour l'en-tête."""
+        if self.asynchrone and self._fil.is_alive():
+            self._a_ecrire.put(None)
+            self._fil.join()
+        self._fermer_morceau()
+        self.entete['nb_images'] = self.nb_images
+        self._ecrire_entete()
+        self._verifier()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.fermer()
+
+
+class LecteurTrajectoire:
+
+    def __init__(self, dossier):
+
+        self.dossier = dossier
+        with open(os.path.join(dossier, 'entete.json')) as fichier:
+            self.entete = json.load(fichier)
+        self.n, self.dimension = self.entete['n'], self.entete['dimension']
+        self.dt, self.tous_les = self.entete['dt'], self.entete['tous_les']
+        self.parametres = self.entete['parametres']
+        self.images_par_morceau = self.entete['images_par_morceau']
+        self._ouverts = {}
+
+    def __len__(self):
+        return self.entete['nb_images']
+
+    def _morceau(self, champ, numero):
+        """Ouvre (une seule fois) un morceau en mémoire paginée, sans le charger."""
+        cle = (champ, numero)
+        if cle not in self._ouverts:
+            chemin = os.path.join(self.dossier, _nom_morceau(champ, numero))
+            self._ouverts[cle] = np.load(chemin, mmap_mode='r')
+        return self._ouverts[cle]
+
+    def image(self, t):
+        """Retourne l'image t sous forme de dictionnaire (positions, vitesses, contamines, pas)."""
+        if t < 0:
+            t += len(self)
+        if not 0 <= t < len(self):
+            raise IndexError(f"image {t} hors de la trajectoire ({len(self)} images)")
+        numero, rang = divmod(t, self.images_par_morceau)
+        return {champ: self._morceau(champ, numero)[rang] for champ in CHAMPS}
+
+    def __getitem__(self, t):
+        return self.image(t)
+
+    def limites(self):
+        """Bornes du bassin : paramètre taille du modèle ou étendue de la première image."""
+        taille = self.parametres.get('taille')
+        if taille is not None:
+            return np.zeros(self.dimension), np.full(self.dimension, float(taille))
+        positions = np.asarray(self.image(0)['positions'])
+        return positions.min(axis=0), positions.max(axis=0)
+
+    def leader(self):
+        """Indice du leader, seul poisson contaminé de la première image (None s'il n'y en a pas)."""
+        contamines = np.asarray(self.image(0)['contamines'])
+        return int(np.flatnonzero(contamines)[0]) if contamines.sum() == 1 else None
+
+    def __iter__(self):
+        for t in range(len(self)):
+            yield self.image(t)
+
+    def champ(self, nom, debut=0, fin=None, pas=1):
+        """Lit un champ pour les images debut:fin:pas et le retourne en un seul tableau."""
+        indices = np.arange(len(self))[debut:fin:pas]
+        numeros, rangs = np.divmod(indices, self.images_par_morceau)
+        morceaux = [self._morceau(nom, numero)[rangs[numeros == numero]]
+                    for numero in np.unique(numeros)]
+        if not morceaux:
+            return np.empty(0)
+        return np.concatenate(morceaux)
@@ -0,0 +1,349 @@
+import itertools
+import numpy as np
+from scipy.spatial import KDTree
+import profilage
+
+""" Index de voisinage
+
+Les règles obtiennent leurs voisins auprès d'un index qui fournit :
+- paires(positions, rayon, boite=None) : paires orientées (i, j), i != j, à
+  distance <= rayon ;
+- k_voisins(positions, nb_voisins, rayon, boite=None) : paires orientées
+  reliant chaque poisson à ses nb_voisins plus proches voisins situés à
+  distance <= rayon.
+Si boite (côtés (D,) du domaine) est donnée, le domaine est périodique et les
+distances sont celles de l'image minimale : KDTree périodique (boxsize) ou
+grille de cellules dont les bords se rejoignent.
+
+Deux index sont disponibles : IndexKDTree (scipy.spatial.KDTree reconstruit à
+chaque appel) et GrilleCellules (liste de cellules de côté égal au plus grand
+rayon d'interaction, construite par tri par comptage). ListeVerlet enveloppe
+l'un ou l'autre et garde ses paires d'un pas à l'autre.
+
+"""
+
+def _vide():
+    vide = np.empty(0, dtype=np.intp)
+    return vide, vide
+
+
+def replier(positions, boite):
+    """Retourne les positions ramenées dans [0, boite) sur chaque axe."""
+    repliees = np.mod(positions, boite)
+    # np.mod rend exactement boite pour une valeur négative infime
+    repliees[repliees >= boite] = 0.0
+    return repliees
+
+
+def image_minimale(ecarts, boite=None):
+    """Remplace sur place les écarts p_i - p_j par leur plus courte image dans le domaine périodique boite."""
+    if boite is not None:
+        ecarts -= boite * np.round(ecarts / boite)
+    return ecarts
+
+
+def _garder_plus_proches(i, j, distances, nb_voisins):
+    """Garde, pour chaque poisson i, les nb_voisins paires de plus petite distance."""
+    ordre = np.lexsort((distances, i))
+    i, j = i[ordre], j[ordre]
+    # Rang de chaque paire dans le groupe de son poisson i
+    debut_groupe = np.flatnonzero(np.r_[True, i[1:] != i[:-1]])
+    tailles = np.diff(np.r_[debut_groupe, len(i)])
+    rangs = np.arange(len(i)) - np.repeat(debut_groupe, tailles)
+    garder = rangs < nb_voisins
+    return i[garder], j[garder]
+
+
+class IndexKDTree:
+    """Index reposant sur scipy.spatial.KDTree, reconstruit à chaque requête."""
+
+    @staticmethod
+    def _arbre(positions, boite=None):
+        if boite is None:
+            return KDTree(positions)
+        return KDTree(replier(positions, boite), boxsize=boite)
+
+    def paires(self, positions, rayon, boite=None):
+        """Retourne les paires orientées (i, j), i != j, de poissons à distance <= rayon."""
+        with profilage.phase('index.construction'):
+            arbre = self._arbre(positions, boite)
+        with profilage.phase('index.requete'):
+            paires = arbre.query_pairs(rayon, output_type='ndarray')
+        i, j = paires[:, 0], paires[:, 1]
+        return np.concatenate((i, j)), np.concatenate((j, i))
+
+    def k_voisins(self, positions, nb_voisins=6, rayon=np.inf, boite=None):
+        """Retourne les paires orientées reliant chaque poisson à ses nb_voisins plus proches voisins."""
+        n = len(positions)
+        k = min(nb_voisins, n - 1)
+        if k <= 0:
+            return _vide()
+        # k + 1 car le poisson lui-même est parmi les voisins trouvés, pas forcément
+        # en premier si d'autres poissons sont à la même position
+        with profilage.phase('index.construction'):
+            arbre = self._arbre(positions, boite)
+        with profilage.phase('index.requete'):
+            _, indices = arbre.query(arbre.data, k=k + 1, distance_upper_bound=rayon, workers=-1)
+        j = indices.reshape(n, k + 1)
+        i = np.repeat(np.arange(n), k + 1).reshape(n, k + 1)
+        # Les voisins absents (au-delà de rayon) ont l'indice n ; on garde les k
+        # premiers voisins restants de chaque ligne
+        trouves = (j < n) & (j != i)
+        trouves &= np.cumsum(trouves, axis=1) <= k
+        return i[trouves], j[trouves]
+
+
+def tri_par_comptage(cles, nb_cles):
+    """
+    Permutation stable qui trie des clés entières de [0, nb_cles) en O(N) : tri
+    par base 2^16 en partant des chiffres de poids faible, chaque passe étant un
+    tri par comptage (np.argsort stable d'entiers de 16 bits, tri par base de
+    numpy). Une seule passe suffit si nb_cles <= 65536.
+    """
+    ordre = np.argsort((cles & 0xFFFF).astype(np.uint16), kind='stable')
+    decalage = 16
+    while (nb_cles - 1) >> decalage:
+        chiffres = ((cles[ordre] >> decalage) & 0xFFFF).astype(np.uint16)
+        ordre = ordre[np.argsort(chiffres, kind='stable')]
+        decalage += 16
+    return ordre
+
+
+class GrilleCellules:
+    """
+    Liste de cellules (hachage spatial) : l'espace est découpé en cellules de côté
+    taille_cellule et les poissons sont triés par cellule. Les voisins d'un poisson
+    sont cherchés dans les cellules adjacentes seulement. Les tableaux de travail
+    sont conservés d'un pas à l'autre. Dans un domaine périodique, les cellules
+    (de côté au moins taille_cellule) pavent exactement la boîte et les cellules
+    adjacentes se prolongent d'un bord à l'autre.
+
+    En NumPy, la grille ne bat le KDTree de scipy dans aucun des cas mesurés par
+    bench_voisinage.py (2D et 3D, 1 000 à 1 000 000 poissons, 0,5 à 80 voisins
+    en moyenne) : elle est 1,2 à 4 fois plus lente et au mieux à égalité pour
+    un banc très grand et très dilué. Elle reste une alternative sans arbre ;
+    pour la vitesse, le KDTree (par défaut) ou le noyau numba, qui parcourt une
+    grille de cellules en code compilé, sont préférables.
+    """
+
+    def __init__(self, taille_cellule=None):
+        # Par défaut le côté des cellules est le rayon de la première requête
+        self.taille_cellule = taille_cellule
+        self._coords = np.empty((0, 0), dtype=np.intp)
+        self._ids = np.empty(0, dtype=np.intp)
+        self._comptes = np.empty(0, dtype=np.intp)
+
+    def construire(self, positions, rayon, boite=None):
+        """Range les poissons par cellule."""
+        if self.taille_cellule is None:
+            self.taille_cellule = float(rayon)
+        n, dimension = positions.shape
+        if self._coords.shape != (n, dimension):
+            self._coords = np.empty((n, dimension), dtype=np.intp)
+            self._ids = np.empty(n, dtype=np.intp)
+
+        # Coordonnées entières des cellules
+        if boite is None:
+            origine = positions.min(axis=0)
+            self._tailles = np.full(dimension, self.taille_cellule)
+            np.floor_divide(positions - origine, self.taille_cellule, out=self._coords, casting='unsafe')
+            self._dims = self._coords.max(axis=0) + 1
+        else:
+            self._dims = np.maximum(np.floor(boite / self.taille_cellule), 1).astype(np.intp)
+            self._tailles = boite / self._dims
+            np.floor_divide(replier(positions, boite), self._tailles, out=self._coords, casting='unsafe')
+            np.minimum(self._coords, self._dims - 1, out=self._coords)
+        np.copyto(self._ids, np.ravel_multi_index(tuple(self._coords.T), self._dims))
+
+        # Tri par comptage : effectif de chaque cellule, puis début de chaque cellule
+        # dans l'ordre trié. Si la grille est trop vaste par rapport au nombre de
+        # poissons, seules les cellules occupées sont conservées.
+        nb_cellules = int(np.prod(self._dims))
+        self.ordre = tri_par_comptage(self._ids, nb_cellules)
+        self._dense = nb_cellules <= max(4 * n, 1024)
+        if self._dense:
+            if len(self._comptes) < nb_cellules:
+                self._comptes = np.empty(nb_cellules, dtype=np.intp)
+            comptes = self._comptes[:nb_cellules]
+            comptes[:] = np.bincount(self._ids, minlength=nb_cellules)
+            self._debuts = np.cumsum(comptes) - comptes
+        else:
+            ids_tries = self._ids[self.ordre]
+            premiers = np.flatnonzero(np.r_[True, ids_tries[1:] != ids_tries[:-1]])
+            self._occupees = ids_tries[premiers]
+            self._debuts = premiers
+            self._comptes_occupees = np.diff(np.r_[premiers, n])
+
+    def _cellules(self, coords):
+        """Retourne le début et l'effectif des cellules de coordonnées coords (0 hors grille)."""
+        dans_grille = np.all((coords >= 0) & (coords < self._dims), axis=1)
+        ids = np.ravel_multi_index(tuple(coords.T), self._dims, mode='clip')
+        if self._dense:
+            debuts, comptes = self._debuts[ids], self._comptes[ids]
+        else:
+            rang = np.minimum(np.searchsorted(self._occupees, ids), len(self._occupees) - 1)
+            trouvee = self._occupees[rang] == ids
+            debuts, comptes = self._debuts[rang], np.where(trouvee, self._comptes_occupees[rang], 0)
+        return debuts, np.where(dans_grille, comptes, 0)
+
+    def _decalages(self, rayon, periodique):
+        """Décalages de cellules à parcourir depuis la cellule de chaque poisson."""
+        portees = np.ceil(rayon / self._tailles).astype(int)
+        if not periodique:
+            # Demi-voisinage : chaque couple de cellules n'est parcouru qu'une fois
+            zero = (0,) * len(portees)
+            return [d for d in itertools.product(*(range(-p, p + 1) for p in portees)) if d >= zero]
+        # Décalages distincts modulo la taille de la grille (une grille de moins de
+        # trois cellules ne doit pas parcourir deux fois la même cellule voisine)
+        return list(itertools.product(*(np.unique(np.mod(np.arange(-p, p + 1), d)).tolist()
+                                        for p, d in zip(portees, self._dims))))
+
+    def paires(self, positions, rayon, boite=None):
+        """Retourne les paires orientées (i, j), i != j, de poissons à distance <= rayon."""
+        if len(positions) < 2:
+            return _vide()
+        with profilage.phase('index.construction'):
+            self.construire(positions, rayon, boite)
+        periodique = boite is not None
+        # On travaille dans l'ordre trié par cellule pour des accès mémoire contigus
+        coords = self._coords[self.ordre]
+        positions_triees = positions[self.ordre]
+        rangs = np.arange(len(positions))
+
+        morceaux_a, morceaux_b = [], []
+        with profilage.phase('index.requete'):
+            for decalage in self._decalages(rayon, periodique):
+                voisines = coords + decalage
+                if periodique:
+                    np.mod(voisines, self._dims, out=voisines)
+                debuts, comptes = self._cellules(voisines)
+                if not periodique and decalage == (0,) * len(decalage):
+                    # Même cellule : seulement les poissons suivants dans l'ordre trié
+                    comptes = debuts + comptes - rangs - 1
+                    debuts = rangs + 1
+                total = comptes.sum()
+                if total == 0:
+                    continue
+                # Une paire candidate pour chaque poisson de la cellule voisine
+                a = np.repeat(rangs, comptes)
+                b = np.repeat(debuts - np.cumsum(comptes) + comptes, comptes) + np.arange(total)
+                if periodique:
+                    # Chaque paire est vue depuis ses deux poissons : on n'en garde qu'une
+                    garder = a < b
+                    a, b = a[garder], b[garder]
+                ecarts = image_minimale(positions_triees[a] - positions_triees[b], boite)
+                proches = np.einsum('ij,ij->i', ecarts, ecarts) <= rayon * rayon
+                profilage.compter('paires_candidates', total)
+                morceaux_a.append(a[proches])
+                morceaux_b.append(b[proches])
+        if not morceaux_a:
+            return _vide()
+        a, b = self.ordre[np.concatenate(morceaux_a)], self.ordre[np.concatenate(morceaux_b)]
+        return np.concatenate((a, b)), np.concatenate((b, a))
+
+    def k_voisins(self, positions, nb_voisins=6, rayon=np.inf, boite=None):
+        """
+        Retourne les paires orientées reliant chaque poisson à ses nb_voisins plus
+        proches voisins parmi ceux situés à distance <= rayon (rayon fini requis).
+        """
+        if not np.isfinite(rayon):
+            raise ValueError("la grille de cellules nécessite un rayon de recherche fini")
+        i, j = self.paires(positions, rayon, boite)
+        ecarts = image_minimale(positions[i] - positions[j], boite)
+        return _garder_plus_proches(i, j, np.einsum('ij,ij->i', ecarts, ecarts), nb_voisins)
+
+
+class ListeVerlet:
+    """
+    Liste de Verlet : les paires à distance <= rayon + peau sont demandées à un
+    index sous-jacent puis conservées d'un pas à l'autre avec les positions de
+    référence. Tant que le plus grand déplacement depuis la construction ne
+    dépasse pas peau / 2, toute paire à distance <= rayon est parmi ces
+    candidates : il suffit de les filtrer par leur distance exacte, et le
+    résultat est celui d'une requête exacte. La liste est reconstruite sinon,
+    ou si le rayon demandé (ou le domaine périodique) change. Dans un domaine
+    périodique, les déplacements sont mesurés selon l'image minimale : un
+    poisson qui traverse un bord n'impose pas de reconstruction.
+    """
+
+    def __init__(self, peau, index=None):
+        self.peau = float(peau)
+        self.index = choisir_index(index)
+        # Numéros de réplique d'un ensemble.IndexEnsemble (utilisés par les noyaux numba)
+        self.repliques = getattr(self.index, 'repliques', None)
+        self.nb_requetes = self.nb_reconstructions = 0
+        self._rayon_liste = -np.inf
+        self._reference = np.empty((0, 0))
+        self._deplacements = np.empty((0, 0))
+        self._boite = None
+        self._i, self._j = _vide()
+
+    def _deplacement_max(self, positions):
+        """Plus grand déplacement d'un poisson depuis la construction de la liste."""
+        if len(positions) == 0:
+            return 0.0
+        np.subtract(positions, self._reference, out=self._deplacements)
+        image_minimale(self._deplacements, self._boite)
+        return float(np.sqrt(np.einsum('ij,ij->i', self._deplacements, self._deplacements).max()))
+
+    def _meme_boite(self, boite):
+        if boite is None or self._boite is None:
+            return boite is None and self._boite is None
+        return np.array_equal(boite, self._boite)
+
+    def construire(self, positions, rayon, boite=None):
+        """Reconstruit la liste des paires candidates (i < j) à distance <= rayon + peau."""
+        self._rayon_liste = rayon + self.peau
+        i, j = self.index.paires(positions, self._rayon_liste, boite)
+        garder = i < j
+        self._i, self._j = i[garder], j[garder]
+        self._reference = np.array(positions, dtype=float)
+        self._deplacements = np.empty_like(self._reference)
+        self._boite = None if boite is None else np.array(boite, dtype=float)
+        self.nb_reconstructions += 1
+        profilage.compter('verlet.reconstructions')
+
+    def paires(self, positions, rayon, boite=None):
+        """Retourne les paires orientées (i, j), i != j, de poissons à distance <= rayon."""
+        self.nb_requetes += 1
+        if (positions.shape != self._reference.shape or rayon > self._rayon_liste
+                or not self._meme_boite(boite)
+                or 2 * self._deplacement_max(positions) > self._rayon_liste - rayon):
+            self.construire(positions, rayon, boite)
+        with profilage.phase('verlet.filtre'):
+            ecarts = image_minimale(positions[self._i] - positions[self._j], boite)
+            proches = np.einsum('ij,ij->i', ecarts, ecarts) <= rayon * rayon
+            i, j = self._i[proches], self._j[proches]
+        profilage.compter('verlet.candidates', len(self._i))
+        return np.concatenate((i, j)), np.concatenate((j, i))
+
+    def k_voisins(self, positions, nb_voisins=6, rayon=np.inf, boite=None):
+        """
+        Retourne les paires orientées reliant chaque poisson à ses nb_voisins plus
+        proches voisins situés à distance <= rayon ; sans rayon fini, la requête
+        est transmise à l'index sous-jacent.
+        """
+        if not np.isfinite(rayon):
+            return self.index.k_voisins(positions, nb_voisins, rayon, boite)
+        i, j = self.paires(positions, rayon, boite)
+        ecarts = image_minimale(positions[i] - positions[j], boite)
+        return _garder_plus_proches(i, j, np.einsum('ij,ij->i', ecarts, ecarts), nb_voisins)
+
+    def statistiques(self):
+        """Nombre de requêtes, de reconstructions et fraction des requêtes ayant reconstruit la liste."""
+        return {'peau': self.peau, 'requetes': self.nb_requetes, 'reconstructions': self.nb_reconstructions,
+                'frequence_reconstruction': self.nb_reconstructions / max(self.nb_requetes, 1)}
+
+
+INDEX = {'kdtree': IndexKDTree, 'grille': GrilleCellules}
+
+
+def choisir_index(index=None):
+    """Retourne un index de voisinage à partir de son nom ('kdtree', 'grille') ou l'index donné."""
+    if index is None:
+        return IndexKDTree()
+    if isinstance(index, str):
+        if index not in INDEX:
+            raise ValueError(f"index de voisinage inconnu : {index} (choix : {', '.join(INDEX)})")
+        return INDEX[index]()
+    return index